@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+from loot_table import Item
+from media_cache import assets_fingerprint
+from render_profiles import PROFILE_FORMATS, PROFILES, RenderProfile
+
+# Bump when the renderer output changes so every cached animation is re-rendered.
+RENDER_VERSION = 4
+
+
+@dataclass(frozen=True)
+class AnimationBank:
+    """Pre-rendered spin animations, per profile one per item; the reel in each file stops on that item.
+
+    `paths` maps profile name -> item_id -> file. `reel` is the `reel_fingerprint`
+    the files were rendered for.
+    """
+
+    paths: dict[str, dict[str, Path]]
+    reel: str
+
+    def files(self) -> list[Path]:
+        return [path for by_item in self.paths.values() for path in by_item.values()]
+
+
+@dataclass(frozen=True)
+class AnimationPolicy:
+    """Which profiles are rendered and which one a spin is sent with.
+
+    Under load (at least `busy_pending` spins waiting for their result) every chat
+    gets `busy_profile`; otherwise the chat type decides, then `default`.
+    """
+
+    profiles: dict[str, RenderProfile] = field(default_factory=lambda: dict(PROFILES))
+    render: tuple[str, ...] = ("full", "lite", "preview")
+    default: str = "full"
+    per_chat_type: dict[str, str] = field(default_factory=lambda: {"group": "lite", "supergroup": "lite"})
+    busy_pending: int = 20
+    busy_profile: str = "preview"
+
+    def __post_init__(self) -> None:
+        unknown = [name for name in self.render if name not in self.profiles]
+        if unknown:
+            raise ValueError(f"unknown animation profiles: {', '.join(unknown)}")
+        chosen = {self.default, self.busy_profile, *self.per_chat_type.values()}
+        missing = sorted(chosen - set(self.render))
+        if missing:
+            raise ValueError(f"profiles chosen for spins but not rendered: {', '.join(missing)}")
+        for name in self.render:
+            if self.profiles[name].format not in PROFILE_FORMATS:
+                raise ValueError(f"profile {name}: format must be one of {', '.join(PROFILE_FORMATS)}")
+
+    def rendered(self) -> list[RenderProfile]:
+        return [self.profiles[name] for name in self.render]
+
+    def choose(self, chat_type: Optional[str], pending: int) -> RenderProfile:
+        if self.busy_pending > 0 and pending >= self.busy_pending:
+            return self.profiles[self.busy_profile]
+        return self.profiles[self.per_chat_type.get(chat_type or "", self.default)]
+
+    @classmethod
+    def load(cls, path: Path) -> "AnimationPolicy":
+        """Read the policy JSON; a missing file means the defaults.
+
+        `{"render": ["full", "lite", "preview"], "default": "full",
+          "chat_types": {"group": "lite"}, "busy": {"pending": 20, "profile": "preview"},
+          "profiles": {"tiny": {"width": 426, "height": 240, "fps": 12, "duration_seconds": 3}}}`
+        """
+        if not path.exists():
+            return cls()
+        defaults = cls()
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            profiles = dict(PROFILES)
+            for name, spec in data.get("profiles", {}).items():
+                base = asdict(profiles.get(name, PROFILES["full"]))
+                base.update(spec, name=name)
+                profiles[name] = RenderProfile(**base)
+            busy = data.get("busy", {})
+            return cls(
+                profiles=profiles,
+                render=tuple(data.get("render", defaults.render)),
+                default=str(data.get("default", defaults.default)),
+                per_chat_type={str(k): str(v) for k, v in data.get("chat_types", defaults.per_chat_type).items()},
+                busy_pending=int(busy.get("pending", defaults.busy_pending)),
+                busy_profile=str(busy.get("profile", defaults.busy_profile)),
+            )
+        except (json.JSONDecodeError, AttributeError, TypeError, ValueError) as exc:
+            raise ValueError(f"invalid animation policy {path}: {exc}") from exc
+
+
+def reel_fingerprint(items: list[Item], background_path: Path, frame_path: Path) -> str:
+    """Hash of every input that reaches the pixels: reel order, icons, background and frame."""
+    parts: list[tuple[str, Optional[Path]]] = [(f"item:{item.item_id}", item.icon_path) for item in items]
+    parts.append(("background", background_path))
+    parts.append(("frame", frame_path))
+    return assets_fingerprint(parts)
+
+
+def animation_key(reel: str, stop_index: int, profile: RenderProfile) -> str:
+    spec = json.dumps(asdict(profile), sort_keys=True)
+    return hashlib.sha256(f"v{RENDER_VERSION}:{reel}:{stop_index}:{spec}".encode("utf-8")).hexdigest()
+
+
+def _render_one(
+    items: list[Item],
+    outputs: dict[RenderProfile, Path],
+    background_path: Path,
+    frame_path: Path,
+    stop_index: int,
+    frame_workers: int = 1,
+) -> list[Path]:
+    # numpy, Pillow and imageio load only when something has to be rendered.
+    from roulette_animation import generate_spin_animations
+
+    # Per process, so two processes rendering the same file never write into one temp file.
+    tmp_paths = {profile: path.with_name(f"{path.stem}.{os.getpid()}.tmp{path.suffix}") for profile, path in outputs.items()}
+    generate_spin_animations(
+        items=items,
+        outputs=tmp_paths,
+        background_path=background_path,
+        frame_path=frame_path,
+        stop_index=stop_index,
+        workers=frame_workers,
+    )
+    for profile, path in outputs.items():
+        os.replace(tmp_paths[profile], path)
+    return list(outputs.values())
+
+
+def build_animation_bank(
+    items: Iterable[Item],
+    bank_dir: Path,
+    background_path: Path,
+    frame_path: Path,
+    profiles: Iterable[RenderProfile] = (PROFILES["full"],),
+    max_workers: Optional[int] = None,
+    prune: bool = True,
+) -> AnimationBank:
+    """Render missing per-item animations in parallel and, with `prune`, drop files no item points to.
+
+    Files are content-addressed (`{item_id}-{profile}-{key}.mp4`), so an unchanged
+    asset set renders nothing and a rename or reweight of items never triggers a
+    render. All missing profiles of one item come out of a single render pass.
+    With at least as many items to render as workers the pool runs one item per
+    process; otherwise items go one by one, each splitting its frames across the
+    workers. Only prune where no other process may still send from `bank_dir`.
+    """
+    item_list = list(items)
+    profile_list = list(profiles)
+    if not item_list:
+        raise ValueError("No items provided for animation bank")
+    bank_dir.mkdir(parents=True, exist_ok=True)
+
+    reel = reel_fingerprint(item_list, background_path, frame_path)
+    paths: dict[str, dict[str, Path]] = {profile.name: {} for profile in profile_list}
+    missing: dict[int, dict[RenderProfile, Path]] = {}
+    for idx, item in enumerate(item_list):
+        for profile in profile_list:
+            key = animation_key(reel, idx, profile)[:16]
+            path = bank_dir / f"{item.item_id}-{profile.name}-{key}{profile.suffix}"
+            paths[profile.name][item.item_id] = path
+            if not path.exists():
+                missing.setdefault(idx, {})[profile] = path
+
+    workers = max_workers or os.cpu_count() or 1
+    files = sum(len(outputs) for outputs in missing.values())
+    if len(missing) >= workers and workers > 1:
+        logging.info("Rendering %s spin animations for %s of %s items, %s in parallel", files, len(missing), len(item_list), workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_render_one, item_list, outputs, background_path, frame_path, idx)
+                for idx, outputs in missing.items()
+            ]
+            for future in as_completed(futures):
+                logging.info("Rendered spin animations: %s", ", ".join(path.name for path in future.result()))
+    elif missing:
+        logging.info("Rendering %s spin animations for %s of %s items, %s frame workers each", files, len(missing), len(item_list), workers)
+        for idx, outputs in missing.items():
+            _render_one(item_list, outputs, background_path, frame_path, idx, frame_workers=workers)
+    else:
+        logging.info("Animation bank is up to date: %s items x %s profiles", len(item_list), len(profile_list))
+
+    if prune:
+        live = {path for by_item in paths.values() for path in by_item.values()}
+        for suffix in PROFILE_FORMATS:
+            for stale in bank_dir.glob(f"*.{suffix}"):
+                if stale not in live:
+                    stale.unlink(missing_ok=True)
+
+    return AnimationBank(paths=paths, reel=reel)
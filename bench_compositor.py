@@ -0,0 +1,75 @@
+"""Compare the PIL and NumPy reel compositors: per-frame cost and pixel difference.
+
+    python bench_compositor.py                 # synthetic icons
+    python bench_compositor.py --icons assets/items --frames 96
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from loot_table import Item
+from roulette_animation import RenderTimings, _load_reel, _make_compositor
+
+
+def _synthetic_items(directory: Path, count: int) -> list[Item]:
+    rng = np.random.default_rng(0)
+    items: list[Item] = []
+    for idx in range(count):
+        pixels = rng.integers(0, 256, size=(160, 160, 4), dtype=np.uint8)
+        pixels[:20, :, 3] = 0
+        path = directory / f"{idx}.png"
+        Image.fromarray(pixels, "RGBA").save(path)
+        items.append(Item(item_id=str(idx), name=f"item {idx}", weight=0.5, icon_path=path))
+    return items
+
+
+def _icon_items(icons_dir: Path) -> list[Item]:
+    return [
+        Item(item_id=path.stem, name=path.stem, weight=0.5, icon_path=path)
+        for path in sorted(icons_dir.glob("*.png"))
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--icons", type=Path, help="directory of {id}.png icons (default: synthetic)")
+    parser.add_argument("--background", type=Path, default=Path("assets/background.png"))
+    parser.add_argument("--frame", type=Path, default=Path("assets/frame.png"))
+    parser.add_argument("--items", type=int, default=12, help="synthetic item count")
+    parser.add_argument("--frames", type=int, default=0, help="frames to render (default: whole animation)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        items = _icon_items(args.icons) if args.icons else _synthetic_items(Path(tmp), args.items)
+        reel = _load_reel(items, args.background, args.frame, stop_index=0)
+        frames = args.frames or reel.frames
+        compositors = {backend: _make_compositor(reel, backend) for backend in ("pil", "numpy")}
+
+        timings = {backend: RenderTimings() for backend in compositors}
+        max_diff = 0
+        differing = 0
+        for idx in range(frames):
+            reference = compositors["pil"].render(idx, timings["pil"])
+            candidate = compositors["numpy"].render(idx, timings["numpy"])
+            diff = np.abs(reference.astype(np.int16) - candidate.astype(np.int16))
+            max_diff = max(max_diff, int(diff.max()))
+            differing += int(np.count_nonzero(diff.max(axis=2)))
+
+    for backend, stage in timings.items():
+        per_frame = (stage.compose + stage.convert) / frames * 1000
+        print(
+            f"{backend:>5}: {per_frame:7.2f} ms/frame "
+            f"(compose {stage.compose / frames * 1000:.2f} ms, convert {stage.convert / frames * 1000:.2f} ms)"
+        )
+    speedup = (timings["pil"].compose + timings["pil"].convert) / max(1e-9, timings["numpy"].compose + timings["numpy"].convert)
+    print(f"speedup: {speedup:.2f}x")
+    print(f"max channel diff: {max_diff}, differing pixels: {differing / (frames * reel.background.width * reel.background.height):.4%}")
+
+
+if __name__ == "__main__":
+    main()
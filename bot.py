@@ -1,74 +1,248 @@
-codex/create-telegram-bot-with-long-polling-f8zdnd
 from __future__ import annotations
 
+from startup import StartupTimer
+
+# Started before the remaining imports so the startup report includes them.
+STARTUP = StartupTimer()
+
 import asyncio
-import json
 import logging
 import os
+import secrets
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
-from typing import Any
+from typing import Any, Awaitable, Callable, Optional
 
 from dotenv import load_dotenv
-from telegram import Message, Update
-from telegram.error import TelegramError
+from telegram import Bot, InputFile, InputMediaPhoto, Message, ReplyParameters, Update
+from telegram.error import BadRequest, TelegramError
 from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
 
-from fairness import FairnessEngine
-from loot_table import Item, LootTable, load_loot_table
-from roulette_animation import DURATION_SECONDS, generate_spin_animation
+from cooldowns import BoundedNonceMap, CooldownPolicy, CooldownWheel
+from fairness import FairnessEngine, FairnessSeason
+from fileio import DebouncedWriter
+from animation_bank import AnimationBank, AnimationPolicy, build_animation_bank, reel_fingerprint
+from loot_reload import TableDiff, diff_tables, source_fingerprint
+from loot_table import SAMPLER_ALIAS, Item, LootTable, load_loot_table, manifest_fingerprint, table_manifest
+from media_cache import MediaCache, is_stale_file_id_error, media_key
+from media_warmup import MEDIA_ANIMATION, MEDIA_PHOTO, sent_file_id, warm_up_media
+from metrics import (
+    ANIMATION_PROFILES,
+    COOLDOWN_REJECTIONS,
+    MEDIA_CACHE,
+    REGISTRY,
+    RELOADS,
+    SPIN_STAGE_SECONDS,
+    SPINS,
+    TELEGRAM_ERRORS,
+    UPDATES,
+    serve_metrics,
+)
+from photo_prep import prepare_result_photos
+from reveal_queue import PendingReveal, RevealScheduler
+from state_backend import LocalBackend, RespBackend, make_backend
+from update_processor import KeyedUpdateProcessor
+from state_store import SpinRecord, StateStore, read_open_season
+from workers import PeerLink, interrupt_on_sigterm, route_until_stopped, serve_worker, spawn_workers, stop_workers
+from spin_events import SpinEvent, SpinEventLog
+from spin_stats import SpinStats
+
+STARTUP.record("imports", STARTUP.origin)
 
 HELP_TEXT = "автор @HATE_death_ME"
 SPIN_ALIASES = {"спин", "сп", "рулетка"}
 COOLDOWN_SECONDS = 20
+# `/spin N` draws up to this many outcomes at once: the most photos one media group holds.
+MAX_MULTI_SPIN = 10
+CAPTION_LIMIT = 1024
+NONCE_CACHE_SIZE = 100_000
+STATE_MAPS_SWEEP_SECONDS = 60
+VERIFY_MAX_SEASONS = 5
+STATS_SAVE_SECONDS = 30
+# Updates of one user waiting to be handled; more are dropped so a flood cannot stall other users.
+MAX_QUEUED_PER_USER = 8
+# r -> item mapping for live spins; past seasons may be verified with loot_table.SAMPLER_PREFIX.
+SPIN_SAMPLER = SAMPLER_ALIAS
 
 BASE_DIR = Path(__file__).resolve().parent
-DATA_DIR = BASE_DIR / "data"
+# The DATA/LOGS and generated asset dirs are overridable from the process environment (not .env)
+# so load tests never touch live state.
+DATA_DIR = Path(os.getenv("BOT_DATA_DIR") or BASE_DIR / "data")
+LOGS_DIR = Path(os.getenv("BOT_LOGS_DIR") or BASE_DIR / "logs")
+SPIN_EVENTS_DIR = LOGS_DIR / "spins"
 ASSETS_DIR = BASE_DIR / "assets"
 ICONS_DIR = ASSETS_DIR / "items"
-GENERATED_SPIN_PATH = ASSETS_DIR / "generated" / "spin.mp4"
+GENERATED_DIR = ASSETS_DIR / "generated"
+ANIMATION_BANK_DIR = Path(os.getenv("BOT_ANIMATION_BANK_DIR") or GENERATED_DIR / "bank")
+RESULT_PHOTOS_DIR = Path(os.getenv("BOT_RESULT_PHOTOS_DIR") or GENERATED_DIR / "photos")
 BACKGROUND_PATH = ASSETS_DIR / "background.png"
 FRAME_PATH = ASSETS_DIR / "frame.png"
-ITEMS_XLSX_PATH = DATA_DIR / "items.xlsx"
-FILE_ID_CACHE_PATH = DATA_DIR / "file_id_cache.json"
+DEFAULT_ITEMS_PATH = DATA_DIR / "items.xlsx"
+WORKER_BASE_PORT = 8700
+# The worker that keeps the drop statistics and renders shared assets on /reload or a watched
+# change, then tells the others to reload; the router sends it every command below.
+OWNER_WORKER = 0
+OWNER_COMMANDS = ("stats", "top", "reload")
+# How long a stopping worker waits to hand its last peer messages over.
+PEER_CLOSE_SECONDS = 5.0
+STATE_DB_PATH = DATA_DIR / "state.sqlite3"
+COOLDOWN_POLICY_PATH = DATA_DIR / "cooldowns.json"
+ANIMATION_POLICY_PATH = DATA_DIR / "animation_profiles.json"
 
+# Every handler is a CommandHandler or a text MessageHandler: plain messages are all we need.
+ALLOWED_UPDATES = [Update.MESSAGE]
+MODE_POLLING = "polling"
+MODE_WEBHOOK = "webhook"
+
+
+def worker_index() -> int | None:
+    """Index of this process when it runs as one of several workers (set by the router)."""
+    value = os.getenv("BOT_WORKER_INDEX")
+    return int(value) if value else None
+
+
+def is_owner() -> bool:
+    """A single process, or the OWNER_WORKER of several."""
+    index = worker_index()
+    return index is None or index == OWNER_WORKER
+
+
+def prunes_assets() -> bool:
+    """Stale animations and photos are deleted only by a process no other process sends alongside:
+    a single bot, or the router before it starts the workers."""
+    return worker_index() is None
+
+
+def per_worker(path: Path) -> Path:
+    """Files only one process may write get a `.{worker}` infix in multi-worker mode."""
+    index = worker_index()
+    return path if index is None else path.with_name(f"{path.stem}.{index}{path.suffix}")
+
+
+SHARED_FILE_ID_CACHE_PATH = DATA_DIR / "file_id_cache.json"
+FILE_ID_CACHE_PATH = per_worker(SHARED_FILE_ID_CACHE_PATH)
+PENDING_REVEALS_PATH = per_worker(DATA_DIR / "pending_reveals.json")
+SPIN_STATS_PATH = DATA_DIR / "spin_stats.json"
+
+
+@dataclass(frozen=True)
+class WebhookConfig:
+    """Where Telegram posts updates (`url`) and where the local HTTP server listens."""
+
+    url: str
+    listen: str
+    port: int
+    path: str
+    secret_token: str
+
+
+@dataclass(frozen=True)
+class HttpConfig:
+    """Connection pool and timeouts (seconds) of the bot's outbound Bot API requests."""
+
+    pool_size: int
+    connect_timeout: float
+    read_timeout: float
+    write_timeout: float
+    media_write_timeout: float
+    pool_timeout: float
+
+
+@dataclass(frozen=True)
+class SpinSnapshot:
+    """Loot table and the animations rendered for it; replaced as a whole, never mutated.
+
+    `media_keys` holds the content-hash cache key of every sendable file, computed
+    off the event loop when the snapshot is built. `table_hash` identifies the
+    weights spins are drawn from; the manifest is stored under it for /verify.
+    `source_fingerprint` covers every input file, so an unchanged tree is not reloaded.
+    `animation_policy` picks the render profile each spin is sent with, and
+    `result_photos` maps item ids to the prepared photo posted as the result.
+    """
 
-@dataclass
-class BotState:
     loot_table: LootTable
-    fairness: FairnessEngine
-    file_id_cache: dict[str, str] = field(default_factory=dict)
-    cooldown_by_user: dict[int, float] = field(default_factory=dict)
+    animation_bank: AnimationBank
+    animation_policy: AnimationPolicy
+    result_photos: dict[str, Path]
+    media_keys: dict[Path, str]
+    table_manifest: list[list]
+    table_hash: str
+    source_fingerprint: str
 
+    def icon_keys(self) -> dict[str, str]:
+        return {item_id: self.media_keys[path] for item_id, path in self.result_photos.items()}
 
-STATE_LOCK = asyncio.Lock()
+    def warmup_media(self) -> list[tuple[str, Path, str]]:
+        """Every sendable file as (kind, path, cache key): result photos, then animations by profile."""
+        media = [(MEDIA_PHOTO, path, self.media_keys[path]) for path in dict.fromkeys(self.result_photos.values())]
+        media.extend((MEDIA_ANIMATION, path, self.media_keys[path]) for path in self.animation_bank.files())
+        return media
 
 
-def setup_logging() -> None:
-    logs_dir = BASE_DIR / "logs"
-import logging
-import os
-from pathlib import Path
+@dataclass
+class BotState:
+    """Shared bot state without locks.
+
+    Handlers only read or write it in synchronous stretches with no `await`
+    in between, which the event loop runs atomically. Nothing that talks to
+    Telegram can stall another chat's spin. Cooldowns and nonces live in
+    `backend`, which may be shared with other workers; `season_generation`
+    is the backend's season counter this process last adopted. `snapshot` is
+    None until the startup load finished and `snapshot_ready` is set.
+    `stats` holds per-user and per-chat drop aggregates for /stats and /top,
+    saved by `stats_writer` at most every STATS_SAVE_SECONDS. Only the
+    OWNER_WORKER keeps them; other workers hand their drops to it through
+    `owner_link`, and it tells them to reload through `worker_links`.
+    """
+
+    snapshot: Optional[SpinSnapshot]
+    fairness: FairnessEngine
+    media_cache: MediaCache
+    cache_writer: DebouncedWriter
+    store: StateStore
+    cooldown_policy: CooldownPolicy
+    events: SpinEventLog
+    backend: LocalBackend | RespBackend
+    stats: SpinStats
+    stats_writer: DebouncedWriter
+    owner_link: Optional[PeerLink] = None
+    worker_links: list[PeerLink] = field(default_factory=list)
+    season_generation: int = 0
+    reloading: bool = False
+    snapshot_loading: Optional[Future] = None
+    snapshot_ready: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+async def sync_season(state: BotState, generation: Optional[int] = None) -> None:
+    """Adopt the season another worker opened once the shared season generation moved on."""
+    if generation is None:
+        generation = await state.backend.season_generation()
+    if generation == state.season_generation:
+        return
+    season = await asyncio.to_thread(read_open_season, STATE_DB_PATH)
+    if season is not None and season != state.fairness.season:
+        state.fairness.season = season
+        logging.info("Adopted season %s opened by another worker", season.commit)
+    state.season_generation = generation
 
-from dotenv import load_dotenv
-from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
 
-HELP_TEXT = "автор @HATE_death_ME"
+async def maintain_state_maps(state: BotState) -> None:
+    while True:
+        await asyncio.sleep(STATE_MAPS_SWEEP_SECONDS)
+        state.backend.maintain(time.time())
 
 
 def setup_logging() -> None:
-    logs_dir = Path("logs")
-main
-    logs_dir.mkdir(parents=True, exist_ok=True)
+    LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
     formatter = logging.Formatter(
         "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
     )
 
-codex/create-telegram-bot-with-long-polling-f8zdnd
     root = logging.getLogger()
     root.setLevel(logging.INFO)
     root.handlers.clear()
@@ -76,18 +250,9 @@ codex/create-telegram-bot-with-long-polling-f8zdnd
     console = logging.StreamHandler()
     console.setFormatter(formatter)
 
-    root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
-    root_logger.handlers.clear()
-
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-main
-
-    file_handler = logging.FileHandler(logs_dir / "bot.log", encoding="utf-8")
+    file_handler = logging.FileHandler(LOGS_DIR / "bot.log", encoding="utf-8")
     file_handler.setFormatter(formatter)
 
-codex/create-telegram-bot-with-long-polling-f8zdnd
     root.addHandler(console)
     root.addHandler(file_handler)
 
@@ -97,16 +262,7 @@ def log_incoming(update: Update, action: str) -> None:
     chat = update.effective_chat
     user = update.effective_user
 
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
-
-
-def log_update(update: Update, action: str) -> None:
-    message = update.effective_message
-    chat = update.effective_chat
-    user = update.effective_user
-
-main
+    UPDATES.inc(action=action)
     logging.info(
         "incoming_message | chat_id=%s | user_id=%s | username=%s | text=%r | action=%s",
         chat.id if chat else None,
@@ -117,48 +273,10 @@ main
     )
 
 
-codex/create-telegram-bot-with-long-polling-f8zdnd
-def log_spin(
-    update: Update,
-    trigger: str,
-    nonce: int,
-    item: Item,
-    sum_weights: float,
-    commit: str,
-) -> None:
-    user = update.effective_user
-    chat = update.effective_chat
-    logging.info(
-        "spin_result | chat_id=%s | user_id=%s | username=%s | trigger=%s | nonce=%s | item_id=%s | item_name=%s | item_weight=%s | sum_weights=%s | commit=%s",
-        chat.id if chat else None,
-        user.id if user else None,
-        user.username if user else None,
-        trigger,
-        nonce,
-        item.item_id,
-        item.name,
-        item.weight,
-        sum_weights,
-        commit,
-    )
-
-
-def load_file_id_cache(path: Path) -> dict[str, str]:
-    if not path.exists():
-        return {}
-    try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
-        logging.warning("file_id cache is invalid JSON, reset cache")
-        return {}
-    if not isinstance(data, dict):
-        return {}
-    return {str(k): str(v) for k, v in data.items()}
-
-
-def save_file_id_cache(path: Path, cache: dict[str, str]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(cache, ensure_ascii=False, indent=2), encoding="utf-8")
+def log_dropped_update(update: object) -> None:
+    """A user already has MAX_QUEUED_PER_USER updates waiting; this one is not handled."""
+    if isinstance(update, Update):
+        log_incoming(update, "dropped_backlog")
 
 
 def build_client_seed(update: Update) -> str:
@@ -171,33 +289,171 @@ def build_client_seed(update: Update) -> str:
     return f"{user_id}:{chat_id}:{message_id}"
 
 
-def ensure_required_files() -> None:
-    if not ITEMS_XLSX_PATH.exists():
-        raise RuntimeError(f"Missing required Excel file: {ITEMS_XLSX_PATH}")
-
+def items_path() -> Path:
+    """Loot table source: `LOOT_TABLE_PATH` (.xlsx, .csv, .json or compiled .lootbin) or data/items.xlsx."""
+    configured = os.getenv("LOOT_TABLE_PATH")
+    return BASE_DIR / configured if configured else DEFAULT_ITEMS_PATH
 
-def build_state() -> BotState:
-    loot_table = load_loot_table(ITEMS_XLSX_PATH, ICONS_DIR)
-    fairness = FairnessEngine()
-    cache = load_file_id_cache(FILE_ID_CACHE_PATH)
-    logging.info("Fairness commit for current season: %s", fairness.commit)
-    return BotState(loot_table=loot_table, fairness=fairness, file_id_cache=cache)
 
+def ensure_required_files() -> None:
+    if not items_path().exists():
+        raise RuntimeError(f"Missing required loot table file: {items_path()}")
 
-def ensure_animation(state: BotState) -> None:
-    if GENERATED_SPIN_PATH.exists():
-        logging.info("Animation already exists: %s", GENERATED_SPIN_PATH)
-        return
 
-    logging.info("Generating roulette animation at startup: %s", GENERATED_SPIN_PATH)
-    generate_spin_animation(
-        items=state.loot_table.items,
-        output_path=GENERATED_SPIN_PATH,
+def ensure_animation_bank(loot_table: LootTable, policy: AnimationPolicy) -> AnimationBank:
+    return build_animation_bank(
+        items=loot_table.items,
+        bank_dir=ANIMATION_BANK_DIR,
         background_path=BACKGROUND_PATH,
         frame_path=FRAME_PATH,
+        profiles=policy.rendered(),
+        prune=prunes_assets(),
     )
 
 
+def load_snapshot(
+    previous: Optional[SpinSnapshot] = None,
+    timer: Optional[StartupTimer] = None,
+) -> tuple[SpinSnapshot, Optional[TableDiff]]:
+    """Parse the sheet, render missing animations and hash every asset; blocking, run off the loop.
+
+    With `previous`, unchanged sources return it as is (diff None), and the
+    animation bank is reused unless the reel itself changed. Result photos are
+    prepared in a second thread while the bank is checked or rendered.
+    """
+    timer = timer or StartupTimer()
+    with timer.stage("snapshot.fingerprint"):
+        fingerprint = source_fingerprint(items_path(), ICONS_DIR, (BACKGROUND_PATH, FRAME_PATH, ANIMATION_POLICY_PATH))
+    if previous is not None and previous.source_fingerprint == fingerprint:
+        return previous, None
+
+    with timer.stage("snapshot.table"):
+        loot_table = load_loot_table(items_path(), ICONS_DIR)
+        policy = AnimationPolicy.load(ANIMATION_POLICY_PATH)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-photos") as pool:
+        photos_started = time.perf_counter()
+        photos = pool.submit(prepare_result_photos, loot_table.items, RESULT_PHOTOS_DIR, prunes_assets())
+        photos.add_done_callback(lambda _: timer.record("snapshot.photos", photos_started))
+        with timer.stage("snapshot.animations"):
+            reusable_bank = (
+                previous is not None
+                and previous.animation_bank.reel == reel_fingerprint(loot_table.items, BACKGROUND_PATH, FRAME_PATH)
+                and previous.animation_policy.rendered() == policy.rendered()
+                and all(path.exists() for path in previous.animation_bank.files())
+            )
+            animation_bank = previous.animation_bank if reusable_bank else ensure_animation_bank(loot_table, policy)
+        result_photos = photos.result()
+    with timer.stage("snapshot.media_keys"):
+        media_keys = {path: media_key(MEDIA_PHOTO, path) for path in result_photos.values()}
+        media_keys.update({path: media_key(MEDIA_ANIMATION, path) for path in animation_bank.files()})
+    manifest = table_manifest(loot_table)
+    snapshot = SpinSnapshot(
+        loot_table=loot_table,
+        animation_bank=animation_bank,
+        animation_policy=policy,
+        result_photos=result_photos,
+        media_keys=media_keys,
+        table_manifest=manifest,
+        table_hash=manifest_fingerprint(manifest),
+        source_fingerprint=fingerprint,
+    )
+    if previous is None:
+        return snapshot, None
+    return snapshot, diff_tables(previous.loot_table, loot_table, previous.icon_keys(), snapshot.icon_keys())
+
+
+def _open_store(now: float) -> tuple[StateStore, FairnessEngine, CooldownWheel]:
+    store = StateStore(STATE_DB_PATH)
+    stored = store.load(now)
+    fairness = FairnessEngine(user_nonces=BoundedNonceMap(NONCE_CACHE_SIZE))
+    if stored.season is not None:
+        fairness.season = stored.season
+        logging.info("Resumed unrevealed season from state store")
+    else:
+        store.record_season_start(fairness.season, now)
+    store.start()
+    cooldowns = CooldownWheel()
+    for user_id, expires_at in stored.cooldowns.items():
+        cooldowns.set_expiry(user_id, expires_at)
+    return store, fairness, cooldowns
+
+
+def _load_media_cache() -> MediaCache:
+    cache = MediaCache.load(FILE_ID_CACHE_PATH)
+    if FILE_ID_CACHE_PATH != SHARED_FILE_ID_CACHE_PATH:
+        # The router warms the shared cache before the workers start.
+        adopted = cache.adopt(MediaCache.load(SHARED_FILE_ID_CACHE_PATH))
+        if adopted:
+            logging.info("file_id cache: adopted %s entries from the shared cache", adopted)
+    return cache
+
+
+def _start_events() -> SpinEventLog:
+    events = SpinEventLog(SPIN_EVENTS_DIR, file_tag="" if worker_index() is None else f"w{worker_index()}-")
+    events.start()
+    return events
+
+
+def build_state(timer: StartupTimer) -> BotState:
+    """Open the state store, caches and event log concurrently; the snapshot keeps loading in the background.
+
+    Commands that need no loot table work as soon as polling starts; spins and
+    reveals wait for `snapshot_ready` (see `finish_snapshot_load`).
+    """
+    now = time.time()
+    pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="startup")
+
+    def timed(name: str, fn: Callable, *args: Any) -> Future:
+        started = time.perf_counter()
+        future = pool.submit(fn, *args)
+        future.add_done_callback(lambda _: timer.record(name, started))
+        return future
+
+    loading = timed("snapshot", load_snapshot, None, timer)
+    store_future = timed("state_store", _open_store, now)
+    cache_future = timed("file_id_cache", _load_media_cache)
+    events_future = timed("spin_events", _start_events)
+    stats_future = timed("spin_stats", SpinStats.load, SPIN_STATS_PATH) if is_owner() else None
+    with timer.stage("cooldown_policy"):
+        cooldown_policy = CooldownPolicy.load(COOLDOWN_POLICY_PATH, COOLDOWN_SECONDS)
+    store, fairness, cooldowns = store_future.result()
+    cache = cache_future.result()
+    events = events_future.result()
+    stats = stats_future.result() if stats_future is not None else SpinStats()
+    # Lets the snapshot finish without holding up startup.
+    pool.shutdown(wait=False)
+
+    logging.info("Fairness commit for current season: %s", fairness.commit)
+    return BotState(
+        snapshot=None,
+        fairness=fairness,
+        media_cache=cache,
+        cache_writer=DebouncedWriter(FILE_ID_CACHE_PATH, cache.dumps),
+        store=store,
+        cooldown_policy=cooldown_policy,
+        events=events,
+        backend=make_backend(os.getenv("STATE_BACKEND_URL"), store, fairness, cooldowns),
+        stats=stats,
+        stats_writer=DebouncedWriter(SPIN_STATS_PATH, stats.snapshot, delay=STATS_SAVE_SECONDS, encode=stats.encode),
+        owner_link=None if is_owner() else PeerLink(OWNER_WORKER, WORKER_BASE_PORT + OWNER_WORKER),
+        worker_links=[
+            PeerLink(index, WORKER_BASE_PORT + index)
+            for index in range(get_worker_count())
+            if worker_index() is not None and is_owner() and index != OWNER_WORKER
+        ],
+        snapshot_loading=loading,
+    )
+
+
+def prune_media_cache(cache: MediaCache, snapshot: SpinSnapshot) -> int:
+    """Drop file_ids of assets the snapshot no longer sends; return how many were dropped."""
+    live_keys = set(snapshot.media_keys.values())
+    dropped = sum(cache.retain(kind, live_keys) for kind in (MEDIA_PHOTO, MEDIA_ANIMATION))
+    if dropped:
+        logging.info("file_id cache: dropped %s stale entries", dropped)
+    return dropped
+
+
 async def handle_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.effective_message.reply_text(HELP_TEXT)
     log_incoming(update, "handled_help_command")
@@ -210,16 +466,17 @@ async def handle_fair(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         return
 
     state: BotState = context.application.bot_data["state"]
-    async with STATE_LOCK:
-        nonce = state.fairness.current_nonce(user.id)
-        commit = state.fairness.commit
+    nonce = await state.backend.current_nonce(user.id)
+    await sync_season(state)
+    commit = state.fairness.commit
 
     text = (
         "Provably fair\n"
         f"commit: {commit}\n"
         f"your_nonce: {nonce}\n"
         "verify: r = HMAC_SHA256(server_seed, f\"client_seed:nonce\"); convert to [0,1), then weighted pick\n"
-        "server_seed hidden until /reveal_seed"
+        f"weighted pick: {SPIN_SAMPLER} (Vose alias table over items.xlsx rows: u=r*n, i=int(u), pick i if u-i<prob[i] else alias[i])\n"
+        "server_seed hidden until /reveal_seed; then /verify recomputes your spins"
     )
     await update.effective_message.reply_text(text)
     log_incoming(update, "handled_fair")
@@ -227,8 +484,15 @@ async def handle_fair(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 
 async def handle_reveal_seed(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     state: BotState = context.application.bot_data["state"]
-    async with STATE_LOCK:
-        old_seed, old_commit, new_commit = state.fairness.reveal_and_rotate_seed()
+    await sync_season(state)
+    old_season = state.fairness.season
+    old_seed, old_commit, new_commit = state.fairness.reveal_and_rotate_seed()
+    now = time.time()
+    state.store.record_season_reveal(old_season, now)
+    state.store.record_season_start(state.fairness.season, now)
+    await state.store.barrier()
+    # Other workers re-read the open season when they see the new generation.
+    state.season_generation = await state.backend.bump_season_generation()
 
     text = (
         f"reveal_server_seed: {old_seed}\n"
@@ -240,94 +504,500 @@ async def handle_reveal_seed(update: Update, context: ContextTypes.DEFAULT_TYPE)
     log_incoming(update, "handled_reveal_seed")
 
 
+def _verify_user(commit_prefix: str, user_id: int) -> list:
+    # numpy is imported with the verifier on the first /verify, not at startup.
+    from verifier import verify_from_db
+
+    return verify_from_db(STATE_DB_PATH, commit_prefix, user_id, VERIFY_MAX_SEASONS)
+
+
+async def handle_verify(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """`/verify [commit-prefix]`: recompute the caller's spins in revealed seasons."""
+    user = update.effective_user
+    if not user:
+        log_incoming(update, "ignored")
+        return
+
+    commit_prefix = context.args[0].lower() if context.args else ""
+    try:
+        reports = await asyncio.to_thread(_verify_user, commit_prefix, user.id)
+    except Exception as exc:
+        logging.exception("verify failed")
+        await update.effective_message.reply_text(f"verify failed: {exc}")
+        log_incoming(update, "verify_failed")
+        return
+
+    if not reports:
+        text = "no spins of yours in revealed seasons yet (see /reveal_seed)"
+    else:
+        lines = [report.summary() for report in reports]
+        for report in reports:
+            lines.extend(
+                f"  nonce={m.spin.nonce}: announced {m.spin.item_id}, expected {m.expected_item_id} ({m.reason})"
+                for m in report.mismatches[:5]
+            )
+        text = "\n".join(lines)
+    await update.effective_message.reply_text(text)
+    log_incoming(update, "handled_verify")
+
+
+async def handle_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """`/stats`: the caller's drops over all chats, and this chat's totals."""
+    user = update.effective_user
+    chat = update.effective_chat
+    if not user:
+        log_incoming(update, "ignored")
+        return
+
+    stats: SpinStats = context.application.bot_data["state"].stats
+    entry = stats.users.get(user.id)
+    if entry is None or not entry.spins:
+        text = "no spins yet"
+    else:
+        most = sorted(entry.items.items(), key=lambda pair: -pair[1])[:3]
+        lines = [
+            f"spins: {entry.spins} | items: {len(entry.items)}/{len(stats.names)} | luck: {stats.luck(entry):+.2f} bits",
+            f"most pulled: {', '.join(f'{stats.item_name(item_id)} x{count}' for item_id, count in most)}",
+        ]
+        if entry.best is not None:
+            lines.insert(1, f"rarest pull: {stats.item_name(entry.best.item_id)} ({entry.best.score:.1f} bits, nonce {entry.best.nonce})")
+        text = "\n".join(lines)
+    chat_entry = stats.chats.get(chat.id) if chat and chat.type != "private" else None
+    if chat_entry is not None:
+        text += f"\nthis chat: {chat_entry.spins} spins, {len(chat_entry.items)} distinct items"
+    await update.effective_message.reply_text(text)
+    log_incoming(update, "handled_stats")
+
+
+async def handle_top(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """`/top`: rarest pulls in this group, or over all chats in a private chat."""
+    stats: SpinStats = context.application.bot_data["state"].stats
+    chat = update.effective_chat
+    in_group = chat is not None and chat.type != "private"
+    leaders = stats.leaders(chat.id if in_group else None)
+    if not leaders:
+        text = "no spins yet"
+    else:
+        title = "rarest pulls in this chat" if in_group else "rarest pulls overall"
+        text = "\n".join(
+            [title]
+            + [
+                f"{place}. {stats.item_name(pull.item_id)} ({pull.score:.1f} bits) - {stats.user_name(pull.user_id)}"
+                for place, pull in enumerate(leaders, start=1)
+            ]
+        )
+    await update.effective_message.reply_text(text)
+    log_incoming(update, "handled_top")
+
+
+async def reload_snapshot(state: BotState) -> Optional[TableDiff]:
+    """Rebuild the snapshot if any source file changed and swap it in; None when nothing changed.
+
+    A sheet that fails validation raises and leaves the current snapshot in place.
+    """
+    await state.snapshot_ready.wait()
+    if state.reloading:
+        raise RuntimeError("a reload is already running")
+    state.reloading = True
+    try:
+        previous = state.snapshot
+        snapshot, diff = await asyncio.to_thread(load_snapshot, previous)
+    except Exception:
+        RELOADS.inc(result="failed")
+        raise
+    finally:
+        state.reloading = False
+    if snapshot is previous or diff is None:
+        RELOADS.inc(result="unchanged")
+        return None
+    RELOADS.inc(result="changed")
+
+    state.store.record_loot_table(snapshot.table_hash, snapshot.table_manifest, time.time())
+    state.snapshot = snapshot
+    if prune_media_cache(state.media_cache, snapshot):
+        state.cache_writer.mark_dirty()
+    if state.stats.bind(snapshot.loot_table):
+        state.stats_writer.mark_dirty()
+    logging.info("loot_table_reload | %s | animations_reused=%s", diff.summary(), snapshot.animation_bank is previous.animation_bank)
+    # The files are rendered now, so the other workers only pick them up.
+    for link in state.worker_links:
+        link.send({"reload": snapshot.source_fingerprint})
+    return diff
+
+
+async def watch_sources(application: Application, state: BotState, interval: float) -> None:
+    """File-watcher mode: poll the source fingerprint and reload on change."""
+    while True:
+        await asyncio.sleep(interval)
+        if state.reloading:
+            continue
+        try:
+            if await reload_snapshot(state) is not None:
+                start_media_warmup(application, state)
+        except Exception:
+            logging.exception("automatic reload failed; keeping the current loot table")
+
+
+async def reload_from_owner(application: Application, state: BotState) -> None:
+    """A worker follows the owner's reload; the assets it needs are already rendered."""
+    if state.reloading:
+        logging.warning("reload requested by the owner worker while one is running; skipping")
+        return
+    try:
+        if await reload_snapshot(state) is not None:
+            start_media_warmup(application, state)
+    except Exception:
+        logging.exception("reload requested by the owner worker failed; keeping the current loot table")
+
+
 async def handle_reload(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     state: BotState = context.application.bot_data["state"]
     try:
-        new_table = load_loot_table(ITEMS_XLSX_PATH, ICONS_DIR)
+        diff = await reload_snapshot(state)
     except Exception as exc:
         await update.effective_message.reply_text(f"reload failed: {exc}")
         log_incoming(update, "reload_failed")
         return
 
-    async with STATE_LOCK:
-        state.loot_table = new_table
-
-    await update.effective_message.reply_text("reload ok")
+    if diff is None:
+        text = "reload ok: nothing changed"
+    else:
+        start_media_warmup(context.application, state)
+        text = "\n".join([f"reload ok: {diff.summary()}", *diff.details()])
+    await update.effective_message.reply_text(text)
     log_incoming(update, "handled_reload")
 
 
-async def _try_delete_message(bot_message: Message) -> None:
+async def _try_delete_message(bot: Bot, chat_id: int, message_id: int) -> None:
     try:
-        await bot_message.delete()
+        await bot.delete_message(chat_id=chat_id, message_id=message_id)
     except TelegramError as exc:
         logging.warning("cannot delete animation message: %s", exc)
 
 
-async def _send_item_result(update: Update, context: ContextTypes.DEFAULT_TYPE, item: Item, normalized_pct: float, nonce: int, client_seed: str, commit: str) -> None:
-    state: BotState = context.application.bot_data["state"]
-    caption = (
+async def _send_cached_media(
+    state: BotState,
+    kind: str,
+    path: Path,
+    send: Callable[[Any], Awaitable[Message]],
+) -> Message:
+    """Send a local file by cached file_id, uploading it only on a cache miss.
+
+    Hashing (for files outside the snapshot) and reading the upload run in a
+    worker thread; the cache file is rewritten later by `cache_writer`.
+    """
+    key = state.snapshot.media_keys.get(path) or await asyncio.to_thread(media_key, kind, path)
+    file_id = state.media_cache.get(key)
+    sent: Message | None = None
+    if file_id:
+        try:
+            sent = await send(file_id)
+            MEDIA_CACHE.inc(kind=kind, result="hit")
+        except BadRequest as exc:
+            if not is_stale_file_id_error(exc.message):
+                raise
+            logging.warning("cached file_id rejected for %s, re-uploading: %s", path, exc)
+            MEDIA_CACHE.inc(kind=kind, result="stale")
+            state.media_cache.discard(key)
+
+    if sent is None:
+        if not file_id:
+            MEDIA_CACHE.inc(kind=kind, result="miss")
+        data = await asyncio.to_thread(path.read_bytes)
+        sent = await send(InputFile(data, filename=path.name))
+
+    new_file_id = sent_file_id(sent, kind)
+    if new_file_id and state.media_cache.put(key, new_file_id):
+        state.cache_writer.mark_dirty()
+    return sent
+
+
+async def _send_cached_album(
+    state: BotState,
+    paths: list[Path],
+    caption: str,
+    send: Callable[[list[InputMediaPhoto]], Awaitable[tuple[Message, ...]]],
+) -> tuple[Message, ...]:
+    """Send photos as one media group captioned on the first, by cached file_id where there is one.
+
+    Telegram rejects the whole group for one stale file_id, so then every
+    photo of the group is uploaded again.
+    """
+    keys = [state.snapshot.media_keys.get(path) or await asyncio.to_thread(media_key, MEDIA_PHOTO, path) for path in paths]
+    file_ids = [state.media_cache.get(key) for key in keys]
+
+    async def media() -> list[InputMediaPhoto]:
+        uploads = await asyncio.to_thread(
+            lambda: {path: path.read_bytes() for path, file_id in zip(paths, file_ids) if not file_id}
+        )
+        return [
+            InputMediaPhoto(
+                media=file_id or InputFile(uploads[path], filename=path.name, attach=True),
+                caption=caption if idx == 0 else None,
+            )
+            for idx, (path, file_id) in enumerate(zip(paths, file_ids))
+        ]
+
+    try:
+        sent = await send(await media())
+        for file_id in file_ids:
+            MEDIA_CACHE.inc(kind=MEDIA_PHOTO, result="hit" if file_id else "miss")
+    except BadRequest as exc:
+        if not any(file_ids) or not is_stale_file_id_error(exc.message):
+            raise
+        logging.warning("cached file_id rejected in media group, re-uploading it: %s", exc)
+        for key, file_id in zip(keys, file_ids):
+            MEDIA_CACHE.inc(kind=MEDIA_PHOTO, result="stale" if file_id else "miss")
+            state.media_cache.discard(key)
+        file_ids = [None] * len(paths)
+        sent = await send(await media())
+
+    for key, message in zip(keys, sent):
+        new_file_id = sent_file_id(message, MEDIA_PHOTO)
+        if new_file_id and state.media_cache.put(key, new_file_id):
+            state.cache_writer.mark_dirty()
+    return sent
+
+
+def _result_caption(item: Item, normalized_pct: float, nonce: int, client_seed: str, commit: str) -> str:
+    return (
         f"{item.name}\n"
         f"ID: {item.item_id}\n"
         f"Шанс (норм.): {normalized_pct:.6f}%\n"
         f"fairness: commit={commit}, nonce={nonce}, client_seed={client_seed}"
     )
 
-    file_id = state.file_id_cache.get(item.item_id)
-    sent: Message
-    if file_id:
-        sent = await update.effective_message.reply_photo(photo=file_id, caption=caption)
-    else:
-        with item.icon_path.open("rb") as f:
-            sent = await update.effective_message.reply_photo(photo=f, caption=caption)
 
-    if sent.photo:
-        new_file_id = sent.photo[-1].file_id
-        if state.file_id_cache.get(item.item_id) != new_file_id:
-            state.file_id_cache[item.item_id] = new_file_id
-            save_file_id_cache(FILE_ID_CACHE_PATH, state.file_id_cache)
+def _multi_result_caption(picks: list[tuple[int, Item]], client_seed: str, commit: str) -> str:
+    """Items won by count, rarest first, the fairness inputs, then the item each nonce drew."""
+    counts: dict[str, int] = {}
+    items: dict[str, Item] = {}
+    for _, item in picks:
+        counts[item.item_id] = counts.get(item.item_id, 0) + 1
+        items[item.item_id] = item
+    lines = [f"Мульти-спин x{len(picks)}"]
+    lines.extend(
+        f"{items[item_id].name} (ID: {item_id}) x{count}"
+        for item_id, count in sorted(counts.items(), key=lambda entry: items[entry[0]].weight)
+    )
+    lines.append(f"fairness: commit={commit}, client_seed={client_seed}")
+    # Last, so the length limit cuts this line rather than the commit; /verify covers every nonce anyway.
+    lines.append("nonces: " + ", ".join(f"{nonce}={item.item_id}" for nonce, item in picks))
+    caption = "\n".join(lines)
+    return caption if len(caption) <= CAPTION_LIMIT else caption[: CAPTION_LIMIT - 1] + "…"
+
+
+async def deliver_reveal(application: Application, reveal: PendingReveal) -> None:
+    """Scheduled second half of a spin: remove the animation, post the won item (or items), count the drops."""
+    state: BotState = application.bot_data["state"]
+    bot = application.bot
+    await state.snapshot_ready.wait()
+    SPIN_STAGE_SECONDS.observe(max(0.0, time.time() - reveal.due), stage="reveal_lateness")
+    if reveal.animation_message_id is not None:
+        await _try_delete_message(bot, reveal.chat_id, reveal.animation_message_id)
+        # A retry after a failed result send must not delete it again.
+        reveal.animation_message_id = None
+
+    reply_parameters = (
+        ReplyParameters(message_id=reveal.reply_to_message_id, allow_sending_without_reply=True)
+        if reveal.reply_to_message_id is not None
+        else None
+    )
 
+    def current_photo(item_id: str, path: str) -> Path:
+        photo_path = Path(path)
+        if photo_path.exists():
+            return photo_path
+        # Queued before a reload replaced the prepared photos.
+        return state.snapshot.result_photos.get(item_id, photo_path)
 
-async def spin_once(update: Update, context: ContextTypes.DEFAULT_TYPE, trigger: str) -> None:
+    # Items sharing an icon share a photo; a media group needs at least two.
+    album = list(dict.fromkeys(current_photo(item_id, path) for item_id, path in reveal.album))
+    try:
+        with SPIN_STAGE_SECONDS.time(stage="result"):
+            if len(album) > 1:
+                await _send_cached_album(
+                    state,
+                    album,
+                    reveal.caption,
+                    lambda media: bot.send_media_group(
+                        chat_id=reveal.chat_id,
+                        media=media,
+                        reply_parameters=reply_parameters,
+                    ),
+                )
+            else:
+                await _send_cached_media(
+                    state,
+                    MEDIA_PHOTO,
+                    current_photo(reveal.item_id, reveal.icon_path),
+                    lambda photo: bot.send_photo(
+                        chat_id=reveal.chat_id,
+                        photo=photo,
+                        caption=reveal.caption,
+                        reply_parameters=reply_parameters,
+                    ),
+                )
+    except TelegramError as exc:
+        TELEGRAM_ERRORS.inc(type=type(exc).__name__)
+        raise
+    if reveal.pulls:
+        drops = [reveal.chat_id, reveal.user_id, reveal.pulls, reveal.spun_at, reveal.user_name]
+        if state.owner_link is not None:
+            state.owner_link.send({"drops": drops})
+        else:
+            record_drops(state, drops)
+
+
+def record_drops(state: BotState, drops: list) -> None:
+    """Count [chat_id, user_id, pulls, spun_at, user_name] of one posted result."""
+    chat_id, user_id, pulls, spun_at, user_name = drops
+    state.stats.record(chat_id, user_id, pulls, spun_at, user_name)
+    state.stats_writer.mark_dirty()
+
+
+def parse_spin_count(words: list[str]) -> Optional[int]:
+    """Spin count from the words after the command: none means 1, else an integer in 1..MAX_MULTI_SPIN."""
+    if not words:
+        return 1
+    if len(words) > 1 or not words[0].isdigit():
+        return None
+    count = int(words[0])
+    return count if 1 <= count <= MAX_MULTI_SPIN else None
+
+
+async def spin_once(update: Update, context: ContextTypes.DEFAULT_TYPE, trigger: str, count: int = 1) -> None:
+    """One spin, or with `count` > 1 a multi-spin: one nonce range, one animation, one media group.
+
+    A multi-spin takes `count` cooldowns at once, so it never beats the rate of
+    single spins; every outcome is its own (client_seed, nonce) pair and is
+    recorded and verified exactly like a single spin.
+    """
     user = update.effective_user
     if not user:
         log_incoming(update, "ignored")
         return
 
     state: BotState = context.application.bot_data["state"]
-    now = time.monotonic()
-
-    async with STATE_LOCK:
-        last = state.cooldown_by_user.get(user.id, 0.0)
-        left = COOLDOWN_SECONDS - (now - last)
-        if left > 0:
-            await update.effective_message.reply_text(f"Cooldown: {int(left) + 1}s")
-            log_incoming(update, "cooldown")
-            return
-
-        state.cooldown_by_user[user.id] = now
-        nonce = state.fairness.next_nonce(user.id)
-        client_seed = build_client_seed(update)
-        digest = state.fairness.digest_for_spin(client_seed, nonce)
-        r = state.fairness.digest_to_unit_float(digest)
-        item = state.loot_table.choose_by_r(r)
-        normalized_pct = (item.weight / state.loot_table.sum_weights) * 100
-        commit = state.fairness.commit
-        sum_weights = state.loot_table.sum_weights
-
-    log_spin(update, trigger, nonce, item, sum_weights, commit)
-    log_incoming(update, "handled_spin")
-
-    with GENERATED_SPIN_PATH.open("rb") as anim_file:
-        anim_message = await update.effective_message.reply_animation(animation=anim_file)
-
-    await asyncio.sleep(DURATION_SECONDS)
-    await _try_delete_message(anim_message)
+    await state.snapshot_ready.wait()
+    now = time.time()
+    chat = update.effective_chat
+    cooldown = state.cooldown_policy.seconds_for(user.id, chat.id if chat else None) * count
+
+    with SPIN_STAGE_SECONDS.time(stage="cooldown"):
+        left = await state.backend.take_cooldown(user.id, now, cooldown)
+    if left > 0:
+        COOLDOWN_REJECTIONS.inc()
+        await update.effective_message.reply_text(f"Cooldown: {int(left) + 1}s")
+        log_incoming(update, "cooldown")
+        return
 
-    await _send_item_result(update, context, item, normalized_pct, nonce, client_seed, commit)
+    with SPIN_STAGE_SECONDS.time(stage="nonce"):
+        first_nonce, generation = await state.backend.next_nonces(user.id, count)
+        if generation != state.season_generation:
+            await sync_season(state, generation)
+    pick_started = time.perf_counter()
+    snapshot = state.snapshot
+    season = state.fairness.season
+    client_seed = build_client_seed(update)
+    nonces = range(first_nonce, first_nonce + count)
+    rs = season.unit_floats((client_seed, nonce) for nonce in nonces)
+    picks = [(nonce, snapshot.loot_table.choose(r, SPIN_SAMPLER)) for nonce, r in zip(nonces, rs)]
+    # The animation stops on the rarest item drawn.
+    nonce, item = min(picks, key=lambda pick: pick[1].weight)
+    commit = season.commit
+    reveals: RevealScheduler = context.application.bot_data["reveals"]
+    profile = snapshot.animation_policy.choose(chat.type if chat else None, len(reveals))
+    animation_path = snapshot.animation_bank.paths[profile.name][item.item_id]
+    state.store.record_spins(
+        [
+            SpinRecord(
+                commit=commit,
+                user_id=user.id,
+                nonce=spin_nonce,
+                client_seed=client_seed,
+                item_id=spin_item.item_id,
+                table_hash=snapshot.table_hash,
+                sampler=SPIN_SAMPLER,
+                spun_at=now,
+            )
+            for spin_nonce, spin_item in picks
+        ],
+        now + cooldown,
+    )
+    SPIN_STAGE_SECONDS.observe(time.perf_counter() - pick_started, stage="pick")
+    SPINS.inc(count)
+
+    for spin_nonce, spin_item in picks:
+        state.events.emit(
+            SpinEvent(
+                ts=now,
+                chat_id=chat.id if chat else 0,
+                user_id=user.id,
+                nonce=spin_nonce,
+                item_id=spin_item.item_id,
+                commit=commit,
+                trigger=trigger,
+            )
+        )
+    log_incoming(update, "handled_spin" if count == 1 else "handled_multi_spin")
+
+    # The nonce must be durable before anything derived from it reaches the chat.
+    with SPIN_STAGE_SECONDS.time(stage="durable"):
+        await state.store.barrier()
+    message = update.effective_message
+    ANIMATION_PROFILES.inc(profile=profile.name)
+    # The spin is recorded and charged: its result is scheduled even if the animation cannot be sent.
+    animation_message_id: Optional[int] = None
+    due = time.time()
+    try:
+        with SPIN_STAGE_SECONDS.time(stage="animation"):
+            anim_message = await _send_cached_media(
+                state,
+                MEDIA_ANIMATION,
+                animation_path,
+                lambda animation: message.reply_animation(animation=animation),
+            )
+        animation_message_id = anim_message.message_id
+        due = time.time() + profile.duration_seconds
+    except (TelegramError, OSError) as exc:
+        TELEGRAM_ERRORS.inc(type=type(exc).__name__)
+        logging.warning("spin animation failed, sending the result without it | chat_id=%s | error=%r", message.chat_id, exc)
+
+    if count == 1:
+        normalized_pct = (item.weight / snapshot.loot_table.sum_weights) * 100
+        caption = _result_caption(item, normalized_pct, nonce, client_seed, commit)
+        album: list[list[str]] = []
+    else:
+        caption = _multi_result_caption(picks, client_seed, commit)
+        album = [[spin_item.item_id, str(snapshot.result_photos[spin_item.item_id])] for _, spin_item in picks]
+    reveals.schedule(
+        PendingReveal(
+            due=due,
+            chat_id=message.chat_id,
+            chat_type=message.chat.type,
+            reply_to_message_id=message.message_id,
+            animation_message_id=animation_message_id,
+            item_id=item.item_id,
+            icon_path=str(snapshot.result_photos[item.item_id]),
+            caption=caption,
+            album=album,
+            user_id=user.id,
+            user_name=user.username or user.first_name or "",
+            spun_at=now,
+            pulls=[[spin_nonce, spin_item.item_id] for spin_nonce, spin_item in picks],
+        )
+    )
 
 
 async def handle_spin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    await spin_once(update, context, trigger="/spin")
+    """`/spin [N]`: N outcomes at once, up to MAX_MULTI_SPIN."""
+    count = parse_spin_count(context.args or [])
+    if count is None:
+        await update.effective_message.reply_text(f"usage: /spin [1-{MAX_MULTI_SPIN}]")
+        log_incoming(update, "invalid_spin_count")
+        return
+    await spin_once(update, context, trigger="/spin", count=count)
 
 
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -337,27 +1007,15 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         log_incoming(update, "handled_help_text")
         return
 
-    if text in SPIN_ALIASES:
-        await spin_once(update, context, trigger=text)
-        return
+    words = (text or "").split()
+    if words and words[0] in SPIN_ALIASES:
+        count = parse_spin_count(words[1:])
+        if count is not None:
+            await spin_once(update, context, trigger=words[0], count=count)
+            return
 
     log_incoming(update, "ignored")
 
-async def handle_help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    await update.effective_message.reply_text(HELP_TEXT)
-    log_update(update, "handled_help_command")
-
-
-async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    message = update.effective_message
-    if message and message.text == "хелп":
-        await message.reply_text(HELP_TEXT)
-        log_update(update, "handled_help_text")
-        return
-
-    log_update(update, "ignored")
-main
-
 
 def get_token() -> str:
     load_dotenv()
@@ -367,34 +1025,325 @@ def get_token() -> str:
     return token
 
 
-def main() -> None:
-    setup_logging()
-codex/create-telegram-bot-with-long-polling-f8zdnd
-    ensure_required_files()
-    state = build_state()
-    ensure_animation(state)
-    token = get_token()
-
-    app = Application.builder().token(token).build()
+def get_reload_watch_seconds() -> float:
+    """`RELOAD_WATCH_SECONDS` > 0 turns on automatic reloads; call after load_dotenv."""
+    return float(os.getenv("RELOAD_WATCH_SECONDS", "0") or 0)
+
+
+def get_api_base_url() -> str | None:
+    """`TELEGRAM_API_BASE_URL` points the bot at a local Bot API server or a stand-in, e.g. http://127.0.0.1:8081/bot."""
+    return os.getenv("TELEGRAM_API_BASE_URL") or None
+
+
+def get_webhook_config() -> WebhookConfig | None:
+    """Webhook settings from the environment, or None for long polling (`BOT_MODE`, default polling)."""
+    mode = os.getenv("BOT_MODE", MODE_POLLING).strip().lower()
+    if mode == MODE_POLLING:
+        return None
+    if mode != MODE_WEBHOOK:
+        raise RuntimeError(f"BOT_MODE must be {MODE_POLLING!r} or {MODE_WEBHOOK!r}, got {mode!r}")
+    url = os.getenv("WEBHOOK_URL")
+    if not url:
+        raise RuntimeError("WEBHOOK_URL is not set in .env (public https URL Telegram posts updates to)")
+    return WebhookConfig(
+        url=url,
+        listen=os.getenv("WEBHOOK_LISTEN", "127.0.0.1"),
+        port=int(os.getenv("WEBHOOK_PORT", "8443")),
+        path=os.getenv("WEBHOOK_PATH", "telegram").strip("/"),
+        # Telegram echoes it in X-Telegram-Bot-Api-Secret-Token; without one set, use a fresh one per start.
+        secret_token=os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32),
+    )
+
+
+async def handle_error(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    TELEGRAM_ERRORS.inc(type=type(context.error).__name__)
+    logging.error("update handling failed", exc_info=context.error)
+
+
+def get_metrics_address() -> tuple[str, int] | None:
+    """`METRICS_PORT` (plus the worker index) turns on /metrics on `METRICS_HOST` (default 127.0.0.1)."""
+    port = int(os.getenv("METRICS_PORT", "0") or 0)
+    if port <= 0:
+        return None
+    return os.getenv("METRICS_HOST", "127.0.0.1"), port + (worker_index() or 0)
+
+
+def register_gauges(application: Application, state: BotState) -> None:
+    REGISTRY.gauge("roulette_pending_reveals", "Spins waiting for their result message.", lambda: len(application.bot_data["reveals"]))
+    REGISTRY.gauge("roulette_state_entries", "Entries in the state backend's in-process maps.", state.backend.stats, label="map")
+    REGISTRY.gauge("roulette_media_cache_entries", "Cached Telegram file_ids.", lambda: len(state.media_cache.entries))
+    REGISTRY.gauge(
+        "roulette_spin_stats_entries",
+        "Users and chats with drop statistics.",
+        lambda: {"users": len(state.stats.users), "chats": len(state.stats.chats)},
+        label="scope",
+    )
+    REGISTRY.gauge("roulette_loot_table_items", "Items in the active loot table.", lambda: len(state.snapshot.loot_table.items) if state.snapshot else 0)
+    processor = application.update_processor
+    if isinstance(processor, KeyedUpdateProcessor):
+        REGISTRY.gauge(
+            "roulette_updates_in_flight",
+            "Updates being handled (running) or queued behind the same user or the concurrency limit (waiting).",
+            lambda: {"running": processor.running, "waiting": processor.waiting},
+            label="state",
+        )
+
+
+def get_update_concurrency() -> int:
+    """`BOT_CONCURRENT_UPDATES`: updates handled at once (default 32); 1 handles them one by one."""
+    return max(1, int(os.getenv("BOT_CONCURRENT_UPDATES", "32") or 32))
+
+
+def get_http_config(concurrency: int) -> HttpConfig:
+    """`TELEGRAM_POOL_SIZE` (default: one connection per running update plus 8 for reveals) and `TELEGRAM_*_TIMEOUT`."""
+    return HttpConfig(
+        pool_size=int(os.getenv("TELEGRAM_POOL_SIZE") or concurrency + 8),
+        connect_timeout=float(os.getenv("TELEGRAM_CONNECT_TIMEOUT") or 5),
+        read_timeout=float(os.getenv("TELEGRAM_READ_TIMEOUT") or 10),
+        write_timeout=float(os.getenv("TELEGRAM_WRITE_TIMEOUT") or 10),
+        # Animation uploads on a file_id cache miss are the largest requests.
+        media_write_timeout=float(os.getenv("TELEGRAM_MEDIA_WRITE_TIMEOUT") or 60),
+        pool_timeout=float(os.getenv("TELEGRAM_POOL_TIMEOUT") or 5),
+    )
+
+
+def get_warmup_config() -> tuple[int, int, float] | None:
+    """`MEDIA_CACHE_CHAT_ID` turns on the upload warm-up: (chat id, concurrency, seconds between uploads)."""
+    chat_id = os.getenv("MEDIA_CACHE_CHAT_ID")
+    if not chat_id:
+        return None
+    return (
+        int(chat_id),
+        max(1, int(os.getenv("MEDIA_WARMUP_CONCURRENCY", "3") or 3)),
+        float(os.getenv("MEDIA_WARMUP_INTERVAL", "1") or 1),
+    )
+
+
+def start_media_warmup(application: Application, state: BotState) -> None:
+    """Upload the snapshot's media without file_ids in the background; restarts a running warm-up."""
+    config = get_warmup_config()
+    if config is None:
+        return
+    chat_id, concurrency, interval = config
+    running = application.bot_data.get("warmup")
+    if running is not None and not running.done():
+        running.cancel()
+    application.bot_data["warmup"] = asyncio.create_task(
+        warm_up_media(
+            application.bot,
+            state.media_cache,
+            state.snapshot.warmup_media(),
+            chat_id,
+            concurrency,
+            interval,
+            on_cached=state.cache_writer.mark_dirty,
+        )
+    )
+
+
+def get_worker_count() -> int:
+    """`BOT_WORKERS` > 1 runs a router plus that many worker processes (polling mode only)."""
+    return max(1, int(os.getenv("BOT_WORKERS", "1") or 1))
+
+
+def _api_urls() -> dict[str, str]:
+    api_base_url = get_api_base_url()
+    if not api_base_url:
+        return {}
+    return {"base_url": api_base_url, "base_file_url": api_base_url.replace("/bot", "/file/bot", 1)}
+
+
+async def finish_snapshot_load(application: Application, state: BotState) -> None:
+    """Adopt the snapshot `build_state` started loading, then let spins through; a broken sheet stops the bot."""
+    try:
+        snapshot, _ = await asyncio.wrap_future(state.snapshot_loading)
+    except Exception:
+        logging.exception("Loot table failed to load; stopping")
+        application.stop_running()
+        return
+    state.snapshot = snapshot
+    state.store.record_loot_table(snapshot.table_hash, snapshot.table_manifest, time.time())
+    if prune_media_cache(state.media_cache, snapshot):
+        state.cache_writer.mark_dirty()
+    if state.stats.bind(snapshot.loot_table):
+        state.stats_writer.mark_dirty()
+    state.snapshot_ready.set()
+    STARTUP.mark("spins_ready")
+    STARTUP.log("loot table")
+    start_media_warmup(application, state)
+
+
+def build_application(state: BotState, token: str) -> Application:
+    # The other workers reload when the owner tells them to.
+    watch_seconds = get_reload_watch_seconds() if is_owner() else 0
+
+    async def start_metrics(application: Application) -> None:
+        metrics_address = get_metrics_address()
+        if metrics_address is not None:
+            application.bot_data["metrics"] = await serve_metrics(
+                *metrics_address, profiling=os.getenv("METRICS_PROFILER", "0") == "1"
+            )
+
+    async def adopt_season_generation() -> None:
+        state.season_generation = await state.backend.season_generation()
+
+    async def on_startup(application: Application) -> None:
+        STARTUP.mark("telegram_initialized")
+        await asyncio.gather(adopt_season_generation(), start_metrics(application))
+        application.bot_data["reveals"].start()
+        application.bot_data["maintenance"] = asyncio.create_task(maintain_state_maps(state))
+        application.bot_data["snapshot_loader"] = asyncio.create_task(finish_snapshot_load(application, state))
+        if watch_seconds > 0:
+            application.bot_data["watcher"] = asyncio.create_task(watch_sources(application, state, watch_seconds))
+            logging.info("Watching loot table sources every %ss", watch_seconds)
+        STARTUP.mark("answering")
+        STARTUP.log("commands")
+
+    async def on_stop(application: Application) -> None:
+        # Runs while the bot's HTTP client is still open: a reveal due now is sent, the rest saved.
+        if "warmup" in application.bot_data:
+            application.bot_data["warmup"].cancel()
+        await application.bot_data["reveals"].stop()
+        links = [state.owner_link] if state.owner_link is not None else state.worker_links
+        await asyncio.gather(*(link.close(PEER_CLOSE_SECONDS) for link in links))
+
+    async def on_shutdown(application: Application) -> None:
+        application.bot_data["maintenance"].cancel()
+        for name in ("snapshot_loader", "watcher"):
+            if name in application.bot_data:
+                application.bot_data[name].cancel()
+        if "metrics" in application.bot_data:
+            application.bot_data["metrics"].close()
+        await state.cache_writer.close()
+        await state.stats_writer.close()
+        await state.backend.close()
+        await asyncio.to_thread(state.store.close)
+        await asyncio.to_thread(state.events.close)
+
+    concurrency = get_update_concurrency()
+    http = get_http_config(concurrency)
+    processor = KeyedUpdateProcessor(concurrency, max_per_key=MAX_QUEUED_PER_USER, on_drop=log_dropped_update)
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(processor)
+        .connection_pool_size(http.pool_size)
+        .connect_timeout(http.connect_timeout)
+        .read_timeout(http.read_timeout)
+        .write_timeout(http.write_timeout)
+        .media_write_timeout(http.media_write_timeout)
+        .pool_timeout(http.pool_timeout)
+        .post_init(on_startup)
+        .post_stop(on_stop)
+        .post_shutdown(on_shutdown)
+    )
+    urls = _api_urls()
+    if urls:
+        builder = builder.base_url(urls["base_url"]).base_file_url(urls["base_file_url"])
+    app = builder.build()
     app.bot_data["state"] = state
+    app.bot_data["reveals"] = RevealScheduler(PENDING_REVEALS_PATH, partial(deliver_reveal, app))
 
     app.add_handler(CommandHandler("help", handle_help))
     app.add_handler(CommandHandler("spin", handle_spin))
     app.add_handler(CommandHandler("reload", handle_reload))
     app.add_handler(CommandHandler("fair", handle_fair))
     app.add_handler(CommandHandler("reveal_seed", handle_reveal_seed))
+    app.add_handler(CommandHandler("verify", handle_verify))
+    app.add_handler(CommandHandler("stats", handle_stats))
+    app.add_handler(CommandHandler("top", handle_top))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
+    app.add_error_handler(handle_error)
+    register_gauges(app, state)
+    logging.info("Update concurrency: %s | http pool: %s", concurrency, http.pool_size)
+    return app
+
+
+async def warm_up_shared_cache(bot: Bot, snapshot: SpinSnapshot, chat_id: int, concurrency: int, interval: float) -> None:
+    cache = MediaCache.load(SHARED_FILE_ID_CACHE_PATH)
+    prune_media_cache(cache, snapshot)
+    async with bot:
+        await warm_up_media(bot, cache, snapshot.warmup_media(), chat_id, concurrency, interval)
+    cache.save()
+
+
+def run_router(token: str, workers: int) -> None:
+    """Prepare what the workers share, start them and route updates to them by user."""
+    if not os.getenv("STATE_BACKEND_URL"):
+        raise RuntimeError("BOT_WORKERS > 1 needs STATE_BACKEND_URL (e.g. redis://127.0.0.1:6390)")
+    if get_webhook_config() is not None:
+        raise RuntimeError("BOT_WORKERS > 1 is only supported with BOT_MODE=polling")
+
+    store = StateStore(STATE_DB_PATH)
+    if store.load(time.time()).season is None:
+        store.record_season_start(FairnessSeason.from_seed(secrets.token_hex(32)), time.time())
+    store.close()
+    # Render the animation bank once here rather than in every worker at the same time.
+    snapshot, _ = load_snapshot()
+    warmup = get_warmup_config()
+    if warmup is not None:
+        # Upload once into the shared file_id cache; each worker adopts it on start.
+        asyncio.run(warm_up_shared_cache(Bot(token, **_api_urls()), snapshot, *warmup))
+
+    ports = [WORKER_BASE_PORT + index for index in range(workers)]
+    # systemd and docker stop with SIGTERM; the workers must not outlive the router.
+    interrupt_on_sigterm()
+    processes = spawn_workers(Path(__file__).resolve(), workers, WORKER_BASE_PORT)
+    logging.info("Router started with %s workers on ports %s", workers, ports)
+    try:
+        pinned = {command: OWNER_WORKER for command in OWNER_COMMANDS}
+        asyncio.run(route_until_stopped(Bot(token, **_api_urls()), ports, ALLOWED_UPDATES, pinned))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_workers(processes)
+
+
+def main() -> None:
+    with STARTUP.stage("config"):
+        load_dotenv()
+        setup_logging()
+        ensure_required_files()
+        token = get_token()
+    if worker_index() is None and get_worker_count() > 1:
+        run_router(token, get_worker_count())
+        return
 
-    token = get_token()
+    with STARTUP.stage("state"):
+        state = build_state(STARTUP)
+    with STARTUP.stage("application"):
+        app = build_application(state, token)
 
-    app = Application.builder().token(token).build()
+    if worker_index() is not None:
+        port = int(os.environ["BOT_WORKER_PORT"])
+        logging.info("Bot worker %s started", worker_index())
 
-    app.add_handler(CommandHandler("help", handle_help_command))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_message))
-main
+        async def on_peer(message: dict) -> None:
+            # Drops are scored with the loot table, and a reload starts from it: wait for it first.
+            await state.snapshot_ready.wait()
+            if "drops" in message:
+                record_drops(state, message["drops"])
+            elif "reload" in message:
+                await reload_from_owner(app, state)
 
-    logging.info("Bot started with long polling")
-    app.run_polling(allowed_updates=Update.ALL_TYPES)
+        asyncio.run(serve_worker(app, port, on_peer))
+        return
+
+    webhook = get_webhook_config()
+    if webhook is None:
+        logging.info("Bot started with long polling")
+        app.run_polling(allowed_updates=ALLOWED_UPDATES)
+        return
+
+    logging.info("Bot started with webhook | listen=%s:%s | path=/%s", webhook.listen, webhook.port, webhook.path)
+    app.run_webhook(
+        listen=webhook.listen,
+        port=webhook.port,
+        url_path=webhook.path,
+        webhook_url=f"{webhook.url.rstrip('/')}/{webhook.path}",
+        secret_token=webhook.secret_token,
+        allowed_updates=ALLOWED_UPDATES,
+    )
 
 
 if __name__ == "__main__":
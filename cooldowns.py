@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class CooldownPolicy:
+    """Cooldown length per spin: a per-user override wins over a per-chat one, then the default."""
+
+    default_seconds: float
+    per_chat: dict[int, float] = field(default_factory=dict)
+    per_user: dict[int, float] = field(default_factory=dict)
+
+    def seconds_for(self, user_id: int, chat_id: Optional[int]) -> float:
+        if user_id in self.per_user:
+            return self.per_user[user_id]
+        if chat_id is not None and chat_id in self.per_chat:
+            return self.per_chat[chat_id]
+        return self.default_seconds
+
+    @classmethod
+    def load(cls, path: Path, default_seconds: float) -> "CooldownPolicy":
+        """Read `{"default": 20, "chats": {"<chat_id>": 60}, "users": {"<user_id>": 0}}`; missing file = defaults."""
+        if not path.exists():
+            return cls(default_seconds=default_seconds)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            return cls(
+                default_seconds=float(data.get("default", default_seconds)),
+                per_chat={int(k): float(v) for k, v in data.get("chats", {}).items()},
+                per_user={int(k): float(v) for k, v in data.get("users", {}).items()},
+            )
+        except (json.JSONDecodeError, AttributeError, TypeError, ValueError) as exc:
+            raise ValueError(f"invalid cooldown policy {path}: {exc}") from exc
+
+
+class CooldownWheel:
+    """TTL map user_id -> cooldown expiry that forgets users once their cooldown is over.
+
+    Keys are also filed in one-second buckets by expiry; `sweep` drops whole
+    buckets that are in the past, so each entry is visited once after it expires
+    (amortized O(1) per `take`).
+    """
+
+    def __init__(self, bucket_seconds: float = 1.0) -> None:
+        self.bucket_seconds = bucket_seconds
+        self._expiry: dict[int, float] = {}
+        self._buckets: dict[int, set[int]] = {}
+        self._swept_to: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def _bucket(self, at: float) -> int:
+        return math.floor(at / self.bucket_seconds)
+
+    def set_expiry(self, key: int, expires_at: float) -> None:
+        self._expiry[key] = expires_at
+        self._buckets.setdefault(self._bucket(expires_at), set()).add(key)
+
+    def take(self, key: int, now: float, seconds: float) -> float:
+        """Start a cooldown of `seconds` and return 0, or return the seconds left on the running one."""
+        self.sweep(now)
+        left = self._expiry.get(key, now) - now
+        if left > 0:
+            return left
+        if seconds > 0:
+            self.set_expiry(key, now + seconds)
+        return 0.0
+
+    def sweep(self, now: float) -> int:
+        """Forget every expired entry; return how many were dropped."""
+        current = self._bucket(now)
+        start = min(self._buckets, default=current) if self._swept_to is None else self._swept_to
+        # After a long idle gap it is cheaper to pick the past buckets than to walk every index.
+        due = [b for b in self._buckets if b < current] if current - start > len(self._buckets) else range(start, current)
+        dropped = 0
+        for bucket in due:
+            for key in self._buckets.pop(bucket, ()):
+                expires_at = self._expiry.get(key)
+                # A key filed again under a later bucket has a newer expiry; keep it.
+                if expires_at is not None and expires_at <= now:
+                    del self._expiry[key]
+                    dropped += 1
+        self._swept_to = current
+        return dropped
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._expiry),
+            "buckets": len(self._buckets),
+            "approx_bytes": sys.getsizeof(self._expiry)
+            + sys.getsizeof(self._buckets)
+            + sum(sys.getsizeof(keys) for keys in self._buckets.values()),
+        }
+
+
+class BoundedNonceMap(OrderedDict):
+    """LRU cache of user_id -> last nonce, capped at `capacity` entries.
+
+    The state store stays the source of truth: an evicted user's nonce is
+    fetched again before their next spin.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        super().__init__()
+        self.capacity = capacity
+        self.evictions = 0
+
+    def __setitem__(self, key: int, value: int) -> None:
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.capacity:
+            self.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self), "capacity": self.capacity, "evictions": self.evictions}
+
+
+def log_map_stats(cooldowns: CooldownWheel, nonces: BoundedNonceMap) -> None:
+    cooldown_stats = cooldowns.stats()
+    nonce_stats = nonces.stats()
+    logging.info(
+        "state_maps | cooldowns=%s | cooldown_buckets=%s | cooldown_bytes~%s | nonces=%s/%s | nonce_evictions=%s",
+        cooldown_stats["entries"],
+        cooldown_stats["buckets"],
+        cooldown_stats["approx_bytes"],
+        nonce_stats["entries"],
+        nonce_stats["capacity"],
+        nonce_stats["evictions"],
+    )
@@ -4,29 +4,69 @@ import hashlib
 import hmac
 import secrets
 from dataclasses import dataclass, field
+from typing import Iterable
+
+
+@dataclass(frozen=True)
+class FairnessSeason:
+    """Immutable server seed + commit; a spin that captured it keeps a consistent pair across rotation."""
+
+    server_seed: str
+    commit: str
+
+    @classmethod
+    def from_seed(cls, server_seed: str) -> "FairnessSeason":
+        return cls(server_seed=server_seed, commit=hashlib.sha256(server_seed.encode("utf-8")).hexdigest())
+
+    def digest_for_spin(self, client_seed: str, nonce: int) -> str:
+        message = f"{client_seed}:{nonce}".encode("utf-8")
+        digest = hmac.new(self.server_seed.encode("utf-8"), message, hashlib.sha256).hexdigest()
+        return digest
+
+    def unit_floats(self, spins: Iterable[tuple[str, int]]) -> list[float]:
+        """r for many (client_seed, nonce) pairs; same values as digest_to_unit_float(digest_for_spin(...)).
+
+        The keyed HMAC state is built once and copied per message.
+        """
+        keyed = hmac.new(self.server_seed.encode("utf-8"), digestmod=hashlib.sha256)
+        scale = float(1 << 64)
+        values: list[float] = []
+        for client_seed, nonce in spins:
+            mac = keyed.copy()
+            mac.update(f"{client_seed}:{nonce}".encode("utf-8"))
+            values.append(int.from_bytes(mac.digest()[:8], "big") / scale)
+        return values
 
 
 @dataclass
 class FairnessEngine:
-    server_seed: str = field(default_factory=lambda: secrets.token_hex(32))
+    season: FairnessSeason = field(default_factory=lambda: FairnessSeason.from_seed(secrets.token_hex(32)))
     user_nonces: dict[int, int] = field(default_factory=dict)
 
+    @property
+    def server_seed(self) -> str:
+        return self.season.server_seed
+
     @property
     def commit(self) -> str:
-        return hashlib.sha256(self.server_seed.encode("utf-8")).hexdigest()
+        return self.season.commit
 
     def next_nonce(self, user_id: int) -> int:
-        nonce = self.user_nonces.get(user_id, 0) + 1
-        self.user_nonces[user_id] = nonce
-        return nonce
+        return self.reserve_nonces(user_id, 1)
+
+    def reserve_nonces(self, user_id: int, count: int) -> int:
+        """Take `count` consecutive nonces in one step; returns the first of them."""
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        first = self.user_nonces.get(user_id, 0) + 1
+        self.user_nonces[user_id] = first + count - 1
+        return first
 
     def current_nonce(self, user_id: int) -> int:
         return self.user_nonces.get(user_id, 0)
 
     def digest_for_spin(self, client_seed: str, nonce: int) -> str:
-        message = f"{client_seed}:{nonce}".encode("utf-8")
-        digest = hmac.new(self.server_seed.encode("utf-8"), message, hashlib.sha256).hexdigest()
-        return digest
+        return self.season.digest_for_spin(client_seed, nonce)
 
     @staticmethod
     def digest_to_unit_float(digest_hex: str) -> float:
@@ -34,7 +74,6 @@ class FairnessEngine:
         return value / float(1 << 64)
 
     def reveal_and_rotate_seed(self) -> tuple[str, str, str]:
-        old_seed = self.server_seed
-        old_commit = self.commit
-        self.server_seed = secrets.token_hex(32)
-        return old_seed, old_commit, self.commit
+        old = self.season
+        self.season = FairnessSeason.from_seed(secrets.token_hex(32))
+        return old.server_seed, old.commit, self.commit
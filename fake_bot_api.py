@@ -0,0 +1,308 @@
+"""Local stand-in for the Telegram Bot API, for load tests of the spin path.
+
+Answers getMe, getUpdates (long polling), sendMessage, sendAnimation, sendPhoto,
+sendMediaGroup and deleteMessage with configurable latency and 429 responses; other methods
+return `true`. Updates are injected in-process (`FakeBotApi.inject`) or over
+HTTP (`POST /_inject` with a JSON list of `{"user_id", "chat_id", "chat_type", "text"}`).
+Point the bot at it with TELEGRAM_API_BASE_URL=http://127.0.0.1:8081/bot.
+
+It also measures what a load test needs: the time from an update being
+handed out to the bot's first reply (animation or text) and to the result
+photo that replies to it.
+
+    python fake_bot_api.py --port 8081 --latency-ms 40 --error-rate 0.01
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from email.policy import HTTP
+from typing import Optional
+from urllib.parse import parse_qsl, urlparse
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Fake Bot", "username": "fake_roulette_bot"}
+SEND_METHODS = {"sendmessage", "sendanimation", "sendphoto", "sendmediagroup"}
+
+
+@dataclass
+class ApiConfig:
+    latency_ms: float = 30.0
+    jitter_ms: float = 10.0
+    # Extra time per MiB of uploaded file (multipart requests).
+    upload_ms_per_mib: float = 200.0
+    # Probability that a send* call is refused with 429, and the retry_after it carries.
+    error_rate: float = 0.0
+    retry_after: int = 1
+
+
+@dataclass
+class ApiStats:
+    calls: Counter = field(default_factory=Counter)
+    rejected: Counter = field(default_factory=Counter)
+    uploads: int = 0
+    upload_bytes: int = 0
+    # Seconds from an update being handed out to the bot's reply, by reply kind.
+    first_reply: dict[str, list[float]] = field(default_factory=lambda: {"animation": [], "text": []})
+    result: list[float] = field(default_factory=list)
+    result_times: list[float] = field(default_factory=list)
+
+
+class FakeBotApi:
+    def __init__(self, config: ApiConfig, seed: int = 0) -> None:
+        self.config = config
+        self.stats = ApiStats()
+        self._rng = random.Random(seed)
+        self._updates: deque[dict] = deque()
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._new_updates = asyncio.Event()
+        # (chat_id, message_id) -> monotonic time the update was handed to the bot.
+        self._delivered: dict[tuple[int, int], float] = {}
+        # Per chat, user messages still waiting for their first reply, in order.
+        self._awaiting_reply: dict[int, deque[int]] = {}
+
+    def _message_id(self) -> int:
+        self._next_message_id += 1
+        return self._next_message_id
+
+    def inject(self, user_id: int, chat_id: int, chat_type: str, text: str) -> int:
+        """Queue a text message update; returns its message id."""
+        message_id = self._message_id()
+        chat: dict = {"id": chat_id, "type": chat_type}
+        if chat_type == "private":
+            chat["first_name"] = f"user{user_id}"
+        else:
+            chat["title"] = f"group{chat_id}"
+        self._updates.append(
+            {
+                "update_id": self._next_update_id,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": chat,
+                    "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "username": f"user{user_id}"},
+                    "text": text,
+                    **({"entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]} if text.startswith("/") else {}),
+                },
+            }
+        )
+        self._next_update_id += 1
+        self._new_updates.set()
+        return message_id
+
+    @property
+    def backlog(self) -> int:
+        return len(self._updates)
+
+    async def _get_updates(self, params: dict) -> list[dict]:
+        offset = int(params.get("offset") or 0)
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout=float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                return []
+        limit = int(params.get("limit") or 100)
+        batch = [self._updates[i] for i in range(min(limit, len(self._updates)))]
+        now = time.monotonic()
+        for update in batch:
+            message = update["message"]
+            key = (message["chat"]["id"], message["message_id"])
+            if key not in self._delivered:
+                self._delivered[key] = now
+                self._awaiting_reply.setdefault(key[0], deque()).append(key[1])
+        return batch
+
+    def _record_reply(self, chat_id: int, reply_to: Optional[int], kind: str) -> None:
+        """First reply to a user message: quoted ones name it, unquoted ones answer the oldest in that chat."""
+        waiting = self._awaiting_reply.get(chat_id)
+        if not waiting:
+            return
+        if reply_to is None:
+            reply_to = waiting.popleft()
+        elif reply_to in waiting:
+            waiting.remove(reply_to)
+        else:
+            return
+        delivered = self._delivered.get((chat_id, reply_to))
+        if delivered is not None:
+            self.stats.first_reply[kind].append(time.monotonic() - delivered)
+
+    def _record_result(self, chat_id: int, reply_to: Optional[int]) -> None:
+        delivered = self._delivered.pop((chat_id, reply_to), None) if reply_to is not None else None
+        if delivered is not None:
+            now = time.monotonic()
+            self.stats.result.append(now - delivered)
+            self.stats.result_times.append(now)
+
+    def _sent_message(self, chat_id: int, extra: dict) -> dict:
+        return {
+            "message_id": self._message_id(),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "from": BOT_USER,
+            **extra,
+        }
+
+    async def call(self, method: str, params: dict, files: dict[str, bytes]) -> tuple[int, dict]:
+        name = method.lower()
+        self.stats.calls[method] += 1
+        if name == "getupdates":
+            return 200, {"ok": True, "result": await self._get_updates(params)}
+
+        config = self.config
+        delay = config.latency_ms + self._rng.uniform(-config.jitter_ms, config.jitter_ms)
+        upload_bytes = sum(len(data) for data in files.values())
+        delay += config.upload_ms_per_mib * upload_bytes / (1 << 20)
+        await asyncio.sleep(max(0.0, delay) / 1000)
+
+        if name in SEND_METHODS and config.error_rate > 0 and self._rng.random() < config.error_rate:
+            self.stats.rejected[method] += 1
+            return 429, {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {config.retry_after}",
+                "parameters": {"retry_after": config.retry_after},
+            }
+
+        if name == "getme":
+            return 200, {"ok": True, "result": BOT_USER}
+        if name not in SEND_METHODS:
+            return 200, {"ok": True, "result": True}
+
+        chat_id = int(params["chat_id"])
+        reply = json.loads(params["reply_parameters"]) if params.get("reply_parameters") else {}
+        reply_to = reply.get("message_id")
+        self.stats.uploads += len(files)
+        self.stats.upload_bytes += upload_bytes
+
+        if name == "sendmediagroup":
+            self._record_result(chat_id, reply_to)
+            album = []
+            for idx, entry in enumerate(json.loads(params["media"])):
+                ref = str(entry["media"])
+                content = files.get(ref.removeprefix("attach://")) or ref.encode("utf-8")
+                photo = [{**_file(content), "width": 512, "height": 512}]
+                extra = {"photo": photo, "media_group_id": "1", **({"caption": entry["caption"]} if entry.get("caption") else {})}
+                album.append(self._sent_message(chat_id, extra))
+            return 200, {"ok": True, "result": album}
+
+        content = b"".join(files.values()) or str(params.get("photo") or params.get("animation")).encode("utf-8")
+        media = _file(content)
+
+        if name == "sendmessage":
+            self._record_reply(chat_id, reply_to, "text")
+            return 200, {"ok": True, "result": self._sent_message(chat_id, {"text": params.get("text", "")})}
+        if name == "sendanimation":
+            self._record_reply(chat_id, reply_to, "animation")
+            animation = {**media, "width": 1280, "height": 720, "duration": 8}
+            return 200, {"ok": True, "result": self._sent_message(chat_id, {"animation": animation})}
+        self._record_result(chat_id, reply_to)
+        photo = [{**media, "width": 512, "height": 512}]
+        return 200, {"ok": True, "result": self._sent_message(chat_id, {"photo": photo, "caption": params.get("caption", "")})}
+
+
+def _file(content: bytes) -> dict:
+    """Fake file_id derived from the content, so a re-upload of the same file gets the same id."""
+    file_id = "fake-" + hashlib.sha1(content).hexdigest()[:20]
+    return {"file_id": file_id, "file_unique_id": file_id[-12:]}
+
+
+def _parse_body(content_type: str, body: bytes) -> tuple[dict, dict[str, bytes]]:
+    """Form fields and uploaded files of a Bot API request (urlencoded, multipart or JSON)."""
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=HTTP).parsebytes(b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+        params: dict = {}
+        files: dict[str, bytes] = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            payload = part.get_payload(decode=True) or b""
+            if part.get_filename():
+                files[name] = payload
+            else:
+                params[name] = payload.decode("utf-8")
+        return params, files
+    if content_type.startswith("application/json"):
+        return {key: value if isinstance(value, str) else json.dumps(value) for key, value in json.loads(body or b"{}").items()}, {}
+    return dict(parse_qsl(body.decode("utf-8"), keep_blank_values=True)), {}
+
+
+async def serve(api: FakeBotApi, host: str, port: int) -> asyncio.base_events.Server:
+    """HTTP/1.1 with keep-alive; `/bot<token>/<method>` calls the API, `POST /_inject` queues updates."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                path = urlparse(target)
+                params, files = _parse_body(headers.get("content-type", ""), body)
+                params.update(parse_qsl(path.query))
+
+                if path.path == "/_inject":
+                    ids = [api.inject(int(u["user_id"]), int(u["chat_id"]), u.get("chat_type", "private"), u["text"]) for u in json.loads(body)]
+                    status, payload = 200, {"ok": True, "result": ids}
+                elif path.path.startswith("/bot") and path.path.count("/") == 2:
+                    status, payload = await api.call(path.path.rsplit("/", 1)[1], params, files)
+                else:
+                    status, payload = 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+
+                data = json.dumps(payload).encode("utf-8")
+                reason = {200: "OK", 404: "Not Found", 429: "Too Many Requests"}[status]
+                writer.write(
+                    f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1")
+                    + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, KeyError) as exc:
+            logging.debug("fake api connection closed: %s", exc)
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    api = FakeBotApi(ApiConfig(args.latency_ms, args.jitter_ms, args.upload_ms_per_mib, args.error_rate, args.retry_after))
+    server = await serve(api, args.host, args.port)
+    logging.info("Fake Bot API on http://%s:%s/bot<token>/", args.host, args.port)
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--upload-ms-per-mib", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of send* calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
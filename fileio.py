@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Write via a sibling temp file and rename, so readers never see a half-written file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class DebouncedWriter:
+    """Coalesces writes: `mark_dirty` schedules one atomic write `delay` seconds later.
+
+    `dump` runs on the event loop (so it sees a consistent snapshot); the disk
+    write itself runs in a worker thread. With `encode`, `dump` only takes a
+    cheap snapshot and `encode` turns it into text in that thread too.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        dump: Callable[[], Any],
+        delay: float = 2.0,
+        encode: Optional[Callable[[Any], str]] = None,
+    ) -> None:
+        self.path = path
+        self.dump = dump
+        self.delay = delay
+        self.encode = encode
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+
+    def mark_dirty(self) -> None:
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.delay)
+        await self.flush()
+
+    async def flush(self) -> None:
+        if not self._dirty:
+            return
+        self._dirty = False
+        snapshot = self.dump()
+        try:
+            await asyncio.to_thread(self._write, snapshot)
+        except OSError:
+            self._dirty = True
+            logging.exception("background write failed: %s", self.path)
+
+    def _write(self, snapshot: Any) -> None:
+        atomic_write_text(self.path, self.encode(snapshot) if self.encode is not None else snapshot)
+
+    async def close(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        await self.flush()
@@ -0,0 +1,361 @@
+"""Load test of the spin path against the local Bot API stand-in (fake_bot_api.py).
+
+Starts the fake API, runs `bot.py` against it with throwaway data, log and
+generated-asset directories, replays a trace of user messages and reports
+spins/s, update->reply and update->result latency percentiles, queueing
+behind the update concurrency limit, and the bot's memory growth.
+
+    python loadtest.py --users 5000 --groups 200 --rate 150 --duration 60
+    python loadtest.py --trace logs/bot.log --speed 10      # replay real traffic, 10x faster
+    python loadtest.py --trace trace.jsonl --error-rate 0.02 --json > run.json
+
+Trace files: the bot's own log (`incoming_message` lines), JSON lines of
+Telegram updates, or JSON lines of `{"t", "user_id", "chat_id", "chat_type", "text"}`.
+Only messages the bot answers are replayed (spins and help).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from fake_bot_api import ApiConfig, FakeBotApi, serve
+
+BASE_DIR = Path(__file__).resolve().parent
+ANSWERED_TEXTS = {"/spin", "спин", "сп", "рулетка", "/help", "хелп"}
+SPIN_TEXTS = {"/spin", "спин", "сп", "рулетка"}
+_LOG_LINE = re.compile(
+    r"^(?P<ts>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)(?:,\d+)? \| \w+ \| [^|]+ \| incoming_message \| chat_id=(?P<chat>-?\d+) "
+    r"\| user_id=(?P<user>-?\d+) \| username=[^|]* \| text=(?P<text>.*) \| action="
+)
+_METRIC_LINE = re.compile(r'^(?P<name>[a-z_]+)(?:\{(?P<labels>[^}]*)\})? (?P<value>\S+)$')
+
+
+@dataclass(frozen=True)
+class TraceEvent:
+    t: float
+    user_id: int
+    chat_id: int
+    chat_type: str
+    text: str
+
+
+def _chat_type(chat_id: int) -> str:
+    return "private" if chat_id > 0 else "supergroup"
+
+
+def load_trace(path: Path) -> list[TraceEvent]:
+    """Events with `t` in seconds from the first one; unanswered messages are dropped."""
+    events: list[TraceEvent] = []
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            match = _LOG_LINE.match(line)
+            if match:
+                text = match["text"]
+                text = text[1:-1] if text[:1] in "'\"" else text
+                stamp = datetime.strptime(match["ts"], "%Y-%m-%d %H:%M:%S").timestamp()
+                chat_id = int(match["chat"])
+                events.append(TraceEvent(stamp, int(match["user"]), chat_id, _chat_type(chat_id), text))
+                continue
+            if not line.startswith("{"):
+                continue
+            record = json.loads(line)
+            message = record.get("message")
+            if message:
+                chat = message.get("chat", {})
+                events.append(
+                    TraceEvent(
+                        float(record.get("t", message.get("date", len(events)))),
+                        int(message.get("from", {}).get("id", chat.get("id", 0))),
+                        int(chat.get("id", 0)),
+                        chat.get("type", _chat_type(int(chat.get("id", 0)))),
+                        message.get("text", ""),
+                    )
+                )
+            elif "user_id" in record:
+                chat_id = int(record.get("chat_id", record["user_id"]))
+                events.append(
+                    TraceEvent(float(record.get("t", len(events))), int(record["user_id"]), chat_id, record.get("chat_type", _chat_type(chat_id)), record["text"])
+                )
+    events = [event for event in events if event.text in ANSWERED_TEXTS]
+    events.sort(key=lambda event: event.t)
+    start = events[0].t if events else 0.0
+    return [TraceEvent(event.t - start, event.user_id, event.chat_id, event.chat_type, event.text) for event in events]
+
+
+def synthetic_trace(users: int, groups: int, rate: float, duration: float, group_share: float, seed: int = 0) -> list[TraceEvent]:
+    """Poisson arrivals at `rate`/s; users take turns in a shuffled cycle, so each spins every `users / rate` s."""
+    rng = random.Random(seed)
+    order = list(range(1_000_000, 1_000_000 + users))
+    rng.shuffle(order)
+    events: list[TraceEvent] = []
+    t = 0.0
+    i = 0
+    while True:
+        t += rng.expovariate(rate)
+        if t >= duration:
+            return events
+        user_id = order[i % users]
+        i += 1
+        if groups and rng.random() < group_share:
+            chat_id = -1_000_000_000_000 - rng.randrange(groups)
+        else:
+            chat_id = user_id
+        text = "/help" if rng.random() < 0.02 else rng.choice(("/spin", "спин"))
+        events.append(TraceEvent(t, user_id, chat_id, _chat_type(chat_id), text))
+
+
+def _rss_mib(pid: int) -> Optional[float]:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def _scrape(url: str) -> dict[str, float]:
+    """`name{labels}` -> value from a Prometheus text page; empty if the bot is not serving metrics."""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            text = response.read().decode("utf-8")
+    except OSError:
+        return {}
+    samples = {}
+    for line in text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if match:
+            key = match["name"] + (f"{{{match['labels']}}}" if match["labels"] else "")
+            samples[key] = float(match["value"])
+    return samples
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {"p50": at(0.50), "p90": at(0.90), "p99": at(0.99), "max": ordered[-1], "count": len(ordered)}
+
+
+@dataclass
+class Samples:
+    rss_mib: list[float] = field(default_factory=list)
+    waiting_updates: list[float] = field(default_factory=list)
+    pending_reveals: list[float] = field(default_factory=list)
+    api_backlog: list[int] = field(default_factory=list)
+
+
+async def _sample(api: FakeBotApi, pid: Optional[int], metrics_url: Optional[str], samples: Samples, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        if pid is not None:
+            rss = _rss_mib(pid)
+            if rss is not None:
+                samples.rss_mib.append(rss)
+        if metrics_url:
+            metrics = await asyncio.to_thread(_scrape, metrics_url)
+            if 'roulette_updates_in_flight{state="waiting"}' in metrics:
+                samples.waiting_updates.append(metrics['roulette_updates_in_flight{state="waiting"}'])
+            if "roulette_pending_reveals" in metrics:
+                samples.pending_reveals.append(metrics["roulette_pending_reveals"])
+        samples.api_backlog.append(api.backlog)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+
+
+def spawn_bot(api_port: int, metrics_port: int, data_dir: Path, table: Path) -> subprocess.Popen:
+    generated = data_dir / "generated"
+    live_generated = BASE_DIR / "assets" / "generated"
+    if live_generated.is_dir():
+        # Start from copies of the rendered bank and photos instead of rendering them again.
+        shutil.copytree(live_generated, generated)
+    env = dict(
+        os.environ,
+        TELEGRAM_BOT_TOKEN="123456:LOADTEST",
+        TELEGRAM_API_BASE_URL=f"http://127.0.0.1:{api_port}/bot",
+        BOT_MODE="polling",
+        BOT_DATA_DIR=str(data_dir / "data"),
+        BOT_LOGS_DIR=str(data_dir / "logs"),
+        BOT_ANIMATION_BANK_DIR=str(generated / "bank"),
+        BOT_RESULT_PHOTOS_DIR=str(generated / "photos"),
+        LOOT_TABLE_PATH=str(table.resolve()),
+        METRICS_PORT=str(metrics_port),
+    )
+    return subprocess.Popen([sys.executable, str(BASE_DIR / "bot.py")], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def run(events: list[TraceEvent], args: argparse.Namespace) -> dict:
+    api = FakeBotApi(ApiConfig(args.latency_ms, args.jitter_ms, args.upload_ms_per_mib, args.error_rate, args.retry_after), seed=args.seed)
+    server = await serve(api, "127.0.0.1", args.api_port)
+    process: Optional[subprocess.Popen] = None
+    pid = args.pid
+    metrics_url = args.metrics_url
+    with tempfile.TemporaryDirectory(prefix="roulette-loadtest-") as tmp:
+        if not args.no_spawn:
+            process = spawn_bot(args.api_port, args.metrics_port, Path(tmp), args.table)
+            pid = process.pid
+            metrics_url = metrics_url or f"http://127.0.0.1:{args.metrics_port}/metrics"
+        try:
+            logging.info("Waiting for the bot to poll %s", f"http://127.0.0.1:{args.api_port}")
+            while not api.stats.calls["getUpdates"]:
+                if process is not None and process.poll() is not None:
+                    raise RuntimeError(f"bot exited with code {process.returncode}; run it by hand to see why")
+                await asyncio.sleep(0.1)
+            await asyncio.sleep(args.warmup)
+
+            samples = Samples()
+            stop = asyncio.Event()
+            sampler = asyncio.create_task(_sample(api, pid, metrics_url, samples, stop))
+            spins = sum(1 for event in events if event.text in SPIN_TEXTS)
+            logging.info("Replaying %s messages (%s spins) over %.0fs", len(events), spins, events[-1].t / args.speed if events else 0)
+            started = time.monotonic()
+            for event in events:
+                delay = started + event.t / args.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                api.inject(event.user_id, event.chat_id, event.chat_type, event.text)
+            injected_at = time.monotonic()
+
+            deadline = injected_at + args.drain_timeout
+            while time.monotonic() < deadline and len(api.stats.result) < spins:
+                await asyncio.sleep(0.2)
+            stop.set()
+            await sampler
+        finally:
+            if process is not None:
+                process.terminate()
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            server.close()
+
+    stats = api.stats
+    result_window = (stats.result_times[-1] - started) if stats.result_times else 0.0
+    rss = samples.rss_mib
+    return {
+        "messages": len(events),
+        "spins_sent": spins,
+        "results": len(stats.result),
+        "spins_per_second": len(stats.result) / result_window if result_window else 0.0,
+        "offered_per_second": len(events) / max(1e-9, injected_at - started),
+        "latency_seconds": {
+            "first_reply_animation": _percentiles(stats.first_reply["animation"]),
+            "first_reply_text": _percentiles(stats.first_reply["text"]),
+            "result": _percentiles(stats.result),
+        },
+        "contention": {
+            "waiting_updates_max": max(samples.waiting_updates, default=0),
+            "waiting_updates_mean": sum(samples.waiting_updates) / len(samples.waiting_updates) if samples.waiting_updates else 0,
+            "pending_reveals_max": max(samples.pending_reveals, default=0),
+            "api_backlog_max": max(samples.api_backlog, default=0),
+        },
+        "memory_mib": {
+            "start": rss[0] if rss else None,
+            "peak": max(rss) if rss else None,
+            "end": rss[-1] if rss else None,
+            "growth": (rss[-1] - rss[0]) if rss else None,
+        },
+        "api": {
+            "calls": dict(stats.calls),
+            "rejected_429": dict(stats.rejected),
+            "uploads": stats.uploads,
+            "upload_mib": stats.upload_bytes / (1 << 20),
+        },
+        "config": {key: str(value) for key, value in vars(args).items()},
+        "api_config": asdict(api.config),
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"messages {report['messages']} | spins {report['spins_sent']} | results {report['results']}")
+    print(f"throughput: {report['spins_per_second']:.1f} spins/s (offered {report['offered_per_second']:.1f} msg/s)")
+    for name, stats in report["latency_seconds"].items():
+        if stats:
+            print(
+                f"{name:<24} p50 {stats['p50'] * 1000:8.0f} ms | p90 {stats['p90'] * 1000:8.0f} ms | "
+                f"p99 {stats['p99'] * 1000:8.0f} ms | max {stats['max'] * 1000:8.0f} ms | n={stats['count']}"
+            )
+    contention = report["contention"]
+    print(
+        f"contention: waiting updates max {contention['waiting_updates_max']:.0f} mean {contention['waiting_updates_mean']:.1f} | "
+        f"pending reveals max {contention['pending_reveals_max']:.0f} | getUpdates backlog max {contention['api_backlog_max']}"
+    )
+    memory = report["memory_mib"]
+    if memory["start"] is not None:
+        print(f"memory: start {memory['start']:.1f} MiB | peak {memory['peak']:.1f} MiB | growth {memory['growth']:+.1f} MiB")
+    api = report["api"]
+    print(f"api: 429s {sum(api['rejected_429'].values())} | uploads {api['uploads']} ({api['upload_mib']:.1f} MiB) | calls {api['calls']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_argument_group("traffic")
+    source.add_argument("--trace", type=Path, help="replay this trace instead of synthetic traffic")
+    source.add_argument("--speed", type=float, default=1.0, help="trace time multiplier")
+    source.add_argument("--users", type=int, default=2000)
+    source.add_argument("--groups", type=int, default=50)
+    source.add_argument("--group-share", type=float, default=0.3)
+    source.add_argument("--rate", type=float, default=50.0, help="synthetic messages per second")
+    source.add_argument("--duration", type=float, default=30.0)
+    source.add_argument("--seed", type=int, default=0)
+    api = parser.add_argument_group("fake Bot API")
+    api.add_argument("--api-port", type=int, default=8081)
+    api.add_argument("--latency-ms", type=float, default=30.0)
+    api.add_argument("--jitter-ms", type=float, default=10.0)
+    api.add_argument("--upload-ms-per-mib", type=float, default=200.0)
+    api.add_argument("--error-rate", type=float, default=0.0)
+    api.add_argument("--retry-after", type=int, default=1)
+    bot = parser.add_argument_group("bot")
+    bot.add_argument("--table", type=Path, default=BASE_DIR / "data" / "items.xlsx", help="loot table the bot loads")
+    bot.add_argument("--metrics-port", type=int, default=9470)
+    bot.add_argument("--no-spawn", action="store_true", help="drive a bot that is already running against --api-port")
+    bot.add_argument("--pid", type=int, help="with --no-spawn: process to sample memory of")
+    bot.add_argument("--metrics-url", help="with --no-spawn: the bot's /metrics URL")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds between the first getUpdates and the load")
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="seconds to wait for results after the last message")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    if args.trace:
+        events = load_trace(args.trace)
+    else:
+        events = synthetic_trace(args.users, args.groups, args.rate, args.duration, args.group_share, args.seed)
+        if args.users / args.rate < 20:
+            logging.warning("users / rate < 20 s: users come back within the default cooldown and get cooldown replies")
+    if not events:
+        raise SystemExit("trace has no spin or help messages")
+
+    report = asyncio.run(run(events, args))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+from loot_table import LootTable
+from media_cache import assets_fingerprint
+
+
+def source_fingerprint(table_path: Path, icons_dir: Path, extra_paths: Iterable[Path] = ()) -> str:
+    """Hash of every file a snapshot is built from: the table, each icon and the reel assets.
+
+    Digests are memoized by (mtime, size), so an unchanged tree costs one stat per
+    file and a touched-but-identical file still fingerprints the same.
+    """
+    parts: list[tuple[str, Optional[Path]]] = [("table", table_path)]
+    if icons_dir.is_dir():
+        parts.extend((f"icon:{path.name}", path) for path in sorted(icons_dir.iterdir()) if path.is_file())
+    parts.extend((f"asset:{path.name}", path) for path in extra_paths)
+    return assets_fingerprint(parts)
+
+
+@dataclass
+class TableDiff:
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    reweighted: list[tuple[str, float, float]] = field(default_factory=list)
+    renamed: list[str] = field(default_factory=list)
+    icon_changed: list[str] = field(default_factory=list)
+    reordered: bool = False
+
+    def summary(self) -> str:
+        parts = [
+            f"added={len(self.added)}",
+            f"removed={len(self.removed)}",
+            f"reweighted={len(self.reweighted)}",
+            f"renamed={len(self.renamed)}",
+            f"icon_changed={len(self.icon_changed)}",
+        ]
+        if self.reordered:
+            parts.append("reordered")
+        return " | ".join(parts)
+
+    def details(self, limit: int = 10) -> list[str]:
+        lines = []
+        for label, ids in (("added", self.added), ("removed", self.removed), ("icon", self.icon_changed)):
+            if ids:
+                lines.append(f"{label}: {', '.join(ids[:limit])}{' ...' if len(ids) > limit else ''}")
+        lines.extend(f"weight {item_id}: {old:g} -> {new:g}" for item_id, old, new in self.reweighted[:limit])
+        return lines
+
+
+def diff_tables(
+    old: LootTable,
+    new: LootTable,
+    old_icons: dict[str, str],
+    new_icons: dict[str, str],
+) -> TableDiff:
+    """Compare two tables item by item; `*_icons` map item_id to the icon's content key."""
+    old_items = {item.item_id: item for item in old.items}
+    new_items = {item.item_id: item for item in new.items}
+    diff = TableDiff(
+        added=[item_id for item_id in new_items if item_id not in old_items],
+        removed=[item_id for item_id in old_items if item_id not in new_items],
+    )
+    for item_id, item in new_items.items():
+        before = old_items.get(item_id)
+        if before is None:
+            continue
+        if before.weight != item.weight:
+            diff.reweighted.append((item_id, before.weight, item.weight))
+        if before.name != item.name:
+            diff.renamed.append(item_id)
+        if old_icons.get(item_id) != new_icons.get(item_id):
+            diff.icon_changed.append(item_id)
+    kept_old = [item_id for item_id in old_items if item_id in new_items]
+    kept_new = [item_id for item_id in new_items if item_id in old_items]
+    diff.reordered = kept_old != kept_new
+    return diff
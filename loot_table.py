@@ -1,10 +1,28 @@
 from __future__ import annotations
 
+import argparse
+import csv
+import hashlib
+import json
+import mmap
+import struct
+import sys
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import TYPE_CHECKING, Iterator, List, Optional, Sequence
 
-from openpyxl import load_workbook
+if TYPE_CHECKING:
+    import numpy as np
+
+SAMPLER_PREFIX = "prefix"
+SAMPLER_ALIAS = "alias"
+SAMPLERS = (SAMPLER_PREFIX, SAMPLER_ALIAS)
+
+TABLE_SUFFIXES = (".xlsx", ".csv", ".json", ".lootbin")
+# Compiled table: header, then weights f64[n] | prefix sums f64[n] | alias prob f64[n]
+# | alias u32[n] | UTF-8 JSON [[id, name], ...], all little-endian.
+_COMPILED_MAGIC = b"LOOTBIN1"
+_COMPILED_HEADER = struct.Struct("<8sII")
 
 
 @dataclass(frozen=True)
@@ -15,14 +33,66 @@ class Item:
     icon_path: Path
 
 
+@dataclass(frozen=True)
+class AliasTable:
+    """Walker/Vose alias table; maps r in [0, 1) to an item index in O(1).
+
+    Public mapping (for verification): u = r * n, i = min(int(u), n - 1);
+    the pick is i if u - i < prob[i], else alias[i]. The table is built by
+    `build_alias_table` from the weights in sheet order, so anyone holding
+    the sheet can rebuild it bit for bit.
+    """
+
+    prob: List[float]
+    alias: List[int]
+
+    def index_for(self, r: float) -> int:
+        n = len(self.prob)
+        scaled = r * n
+        idx = min(int(scaled), n - 1)
+        return idx if scaled - idx < self.prob[idx] else self.alias[idx]
+
+
+def build_alias_table(weights: Sequence[float]) -> AliasTable:
+    """Vose's construction; worklists are processed LIFO in index order, so the result is deterministic."""
+    n = len(weights)
+    total = sum(weights)
+    scaled = [weight * n / total for weight in weights]
+    prob = [0.0] * n
+    alias = list(range(n))
+
+    small = [idx for idx, value in enumerate(scaled) if value < 1.0]
+    large = [idx for idx, value in enumerate(scaled) if value >= 1.0]
+    while small and large:
+        lesser = small.pop()
+        greater = large.pop()
+        prob[lesser] = scaled[lesser]
+        alias[lesser] = greater
+        scaled[greater] = (scaled[greater] + scaled[lesser]) - 1.0
+        (small if scaled[greater] < 1.0 else large).append(greater)
+
+    for idx in large + small:
+        prob[idx] = 1.0
+
+    return AliasTable(prob=prob, alias=alias)
+
+
 @dataclass
 class LootTable:
     items: List[Item]
     prefix_sums: List[float]
     sum_weights: float
+    alias_table: AliasTable
+
+    def __getstate__(self) -> dict:
+        # Compiled tables hold memoryviews into a mapped file; send plain lists to worker processes.
+        state = dict(self.__dict__)
+        state["prefix_sums"] = list(self.prefix_sums)
+        state["alias_table"] = AliasTable(prob=list(self.alias_table.prob), alias=list(self.alias_table.alias))
+        return state
 
     def choose_by_r(self, r: float) -> Item:
-        """Pick item by random value r in [0, 1)."""
+        """Pick item by random value r in [0, 1): first prefix sum above r * sum_weights."""
         if not 0 <= r < 1:
             raise ValueError("r must be in [0, 1)")
 
@@ -36,6 +106,39 @@ class LootTable:
                 lo = mid + 1
         return self.items[lo]
 
+    def choose_by_r_alias(self, r: float) -> Item:
+        """Pick item by random value r in [0, 1) through the alias table."""
+        if not 0 <= r < 1:
+            raise ValueError("r must be in [0, 1)")
+        return self.items[self.alias_table.index_for(r)]
+
+    def choose(self, r: float, sampler: str) -> Item:
+        if sampler == SAMPLER_ALIAS:
+            return self.choose_by_r_alias(r)
+        if sampler == SAMPLER_PREFIX:
+            return self.choose_by_r(r)
+        raise ValueError(f"unknown sampler: {sampler}")
+
+    def choose_indices(self, rs: "np.ndarray", sampler: str) -> "np.ndarray":
+        """Vectorized `choose`: map an array of r values to item indices, same mapping as the scalar path."""
+        import numpy as np
+
+        rs = np.asarray(rs, dtype=np.float64)
+        if rs.size and not (rs.min() >= 0 and rs.max() < 1):
+            raise ValueError("r must be in [0, 1)")
+
+        n = len(self.items)
+        if sampler == SAMPLER_PREFIX:
+            found = np.searchsorted(np.asarray(self.prefix_sums), rs * self.sum_weights, side="right")
+            return np.minimum(found, n - 1)
+        if sampler == SAMPLER_ALIAS:
+            scaled = rs * n
+            idx = np.minimum(scaled.astype(np.int64), n - 1)
+            prob = np.asarray(self.alias_table.prob)
+            alias = np.asarray(self.alias_table.alias, dtype=np.int64)
+            return np.where(scaled - idx < prob[idx], idx, alias[idx])
+        raise ValueError(f"unknown sampler: {sampler}")
+
 
 def _normalize_id(raw_id: object) -> str:
     if raw_id is None:
@@ -45,21 +148,54 @@ def _normalize_id(raw_id: object) -> str:
     return str(raw_id).strip()
 
 
-def load_loot_table(excel_path: Path, icons_dir: Path) -> LootTable:
-    if not excel_path.exists():
-        raise ValueError(f"Excel file is missing: {excel_path}")
+_Row = tuple[int, object, object, object]
+
 
-    wb = load_workbook(excel_path, data_only=True, read_only=True)
+def _xlsx_rows(path: Path) -> Iterator[_Row]:
+    # openpyxl is slow to import; only pay for it when a workbook is actually read.
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, data_only=True, read_only=True)
     ws = wb[wb.sheetnames[0]]
+    for row_idx, row in enumerate(ws.iter_rows(min_row=1, values_only=True), start=1):
+        yield row_idx, *(row[col] if len(row) > col else None for col in range(3))
+
+
+def _csv_rows(path: Path) -> Iterator[_Row]:
+    """`id,name,chance` per line; an optional header row starting with `id` is skipped."""
+    with path.open(newline="", encoding="utf-8-sig") as f:
+        for row_idx, row in enumerate(csv.reader(f), start=1):
+            if row_idx == 1 and row and row[0].strip().lower() == "id":
+                continue
+            cells = [cell if cell.strip() else None for cell in row]
+            yield row_idx, *(cells[col] if len(cells) > col else None for col in range(3))
+
+
+def _json_rows(path: Path) -> Iterator[_Row]:
+    """A list of `{"id", "name", "chance"}` objects or of `[id, name, chance]` rows."""
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: expected a JSON list of items")
+    for row_idx, row in enumerate(data, start=1):
+        if isinstance(row, dict):
+            yield row_idx, row.get("id"), row.get("name"), row.get("chance")
+        elif isinstance(row, list):
+            yield row_idx, *(row[col] if len(row) > col else None for col in range(3))
+        else:
+            raise ValueError(f"Row {row_idx}: expected an object or a list")
+
 
+def _icon_names(icons_dir: Path) -> set[str]:
+    # One directory listing instead of a stat per row.
+    return {path.name for path in icons_dir.iterdir()} if icons_dir.is_dir() else set()
+
+
+def _parse_items(rows: Iterator[_Row], icons_dir: Path) -> List[Item]:
     items: List[Item] = []
     seen_ids: set[str] = set()
+    icon_names = _icon_names(icons_dir)
 
-    for row_idx, row in enumerate(ws.iter_rows(min_row=1, values_only=True), start=1):
-        raw_id = row[0] if len(row) > 0 else None
-        raw_name = row[1] if len(row) > 1 else None
-        raw_chance = row[2] if len(row) > 2 else None
-
+    for row_idx, raw_id, raw_name, raw_chance in rows:
         if raw_id is None and raw_name is None and raw_chance is None:
             continue
 
@@ -86,18 +222,140 @@ def load_loot_table(excel_path: Path, icons_dir: Path) -> LootTable:
         seen_ids.add(item_id)
 
         icon_path = icons_dir / f"{item_id}.png"
-        if not icon_path.exists():
+        if icon_path.name not in icon_names:
             raise ValueError(f"Row {row_idx}: icon missing '{icon_path}'")
 
         items.append(Item(item_id=item_id, name=name, weight=weight, icon_path=icon_path))
 
     if not items:
-        raise ValueError("No items found in Excel")
+        raise ValueError("No items found in table")
+    return items
+
+
+def load_loot_table(path: Path, icons_dir: Path) -> LootTable:
+    """Load a table from `.xlsx`, `.csv`, `.json` or a compiled `.lootbin`, chosen by suffix."""
+    if not path.exists():
+        raise ValueError(f"Loot table file is missing: {path}")
+
+    suffix = path.suffix.lower()
+    if suffix == ".lootbin":
+        return load_compiled_table(path, icons_dir)
+    if suffix == ".xlsx":
+        rows = _xlsx_rows(path)
+    elif suffix == ".csv":
+        rows = _csv_rows(path)
+    elif suffix == ".json":
+        rows = _json_rows(path)
+    else:
+        raise ValueError(f"Unsupported loot table format '{path.suffix}', expected one of {TABLE_SUFFIXES}")
+    return build_loot_table(_parse_items(rows, icons_dir))
+
+
+def compile_loot_table(table: LootTable, output_path: Path) -> None:
+    """Write the table with its prefix sums and alias table precomputed, for `load_compiled_table`."""
+    n = len(table.items)
+    names = json.dumps([[item.item_id, item.name] for item in table.items], ensure_ascii=False).encode("utf-8")
+    body = b"".join(
+        [
+            _COMPILED_HEADER.pack(_COMPILED_MAGIC, n, len(names)),
+            struct.pack(f"<{n}d", *(item.weight for item in table.items)),
+            struct.pack(f"<{n}d", *table.prefix_sums),
+            struct.pack(f"<{n}d", *table.alias_table.prob),
+            struct.pack(f"<{n}I", *table.alias_table.alias),
+            names,
+        ]
+    )
+    tmp_path = output_path.with_name(f"{output_path.name}.tmp")
+    tmp_path.write_bytes(body)
+    tmp_path.replace(output_path)
+
+
+def load_compiled_table(path: Path, icons_dir: Optional[Path] = None) -> LootTable:
+    """Map a compiled table; prefix sums and alias arrays are views into the mapped file.
+
+    With `icons_dir`, every item must have its icon there, as with the text formats.
+    """
+    if sys.byteorder != "little":
+        raise ValueError("compiled loot tables can only be mapped on little-endian hosts")
+    with path.open("rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(data) < _COMPILED_HEADER.size:
+        raise ValueError(f"{path}: truncated compiled table")
+    magic, n, names_len = _COMPILED_HEADER.unpack_from(data, 0)
+    end = _COMPILED_HEADER.size + n * 28 + names_len
+    if magic != _COMPILED_MAGIC or len(data) != end or n == 0:
+        raise ValueError(f"{path}: not a compiled loot table")
+
+    view = memoryview(data)
+    offset = _COMPILED_HEADER.size
+    weights, prefix_sums, prob = (view[offset + k * n * 8 : offset + (k + 1) * n * 8].cast("d") for k in range(3))
+    alias = view[offset + n * 24 : offset + n * 28].cast("I")
+    names = json.loads(bytes(view[offset + n * 28 :]).decode("utf-8"))
+
+    icon_names = _icon_names(icons_dir) if icons_dir is not None else None
+    items: List[Item] = []
+    for (item_id, name), weight in zip(names, weights):
+        icon_path = (icons_dir or Path()) / f"{item_id}.png"
+        if icon_names is not None and icon_path.name not in icon_names:
+            raise ValueError(f"Item '{item_id}': icon missing '{icon_path}'")
+        items.append(Item(item_id=item_id, name=name, weight=weight, icon_path=icon_path))
+
+    return LootTable(
+        items=items,
+        prefix_sums=prefix_sums,  # type: ignore[arg-type]
+        sum_weights=prefix_sums[-1],
+        alias_table=AliasTable(prob=prob, alias=alias),  # type: ignore[arg-type]
+    )
 
+
+def build_loot_table(items: List[Item]) -> LootTable:
     prefix_sums: List[float] = []
     running = 0.0
     for item in items:
         running += item.weight
         prefix_sums.append(running)
 
-    return LootTable(items=items, prefix_sums=prefix_sums, sum_weights=running)
+    return LootTable(
+        items=items,
+        prefix_sums=prefix_sums,
+        sum_weights=running,
+        alias_table=build_alias_table([item.weight for item in items]),
+    )
+
+
+def table_manifest(table: LootTable) -> list[list]:
+    """Everything the r -> item mapping depends on: `[id, name, weight]` rows in sheet order."""
+    return [[item.item_id, item.name, item.weight] for item in table.items]
+
+
+def manifest_fingerprint(manifest: list[list]) -> str:
+    canonical = json.dumps(manifest, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def table_from_manifest(manifest: list[list]) -> LootTable:
+    """Rebuild a table for verification; icons are not needed and left empty."""
+    items = [Item(item_id=str(row[0]), name=str(row[1]), weight=float(row[2]), icon_path=Path()) for row in manifest]
+    if not items:
+        raise ValueError("Empty loot table manifest")
+    return build_loot_table(items)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compile a loot table into the mmap-able .lootbin format.")
+    parser.add_argument("source", type=Path, help=f"table in one of {TABLE_SUFFIXES}")
+    parser.add_argument("-o", "--output", type=Path, help="defaults to the source path with a .lootbin suffix")
+    parser.add_argument("--icons", type=Path, default=Path(__file__).resolve().parent / "assets" / "items")
+    args = parser.parse_args()
+
+    table = load_loot_table(args.source, args.icons)
+    output = args.output or args.source.with_suffix(".lootbin")
+    compile_loot_table(table, output)
+    if table_manifest(load_compiled_table(output)) != table_manifest(table):
+        raise SystemExit(f"{output}: round trip mismatch")
+    print(f"compiled {len(table.items)} items to {output} (table hash {manifest_fingerprint(table_manifest(table))[:16]})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+from fileio import atomic_write_text
+
+_CHUNK_SIZE = 1 << 20
+_DIGESTS: dict[Path, tuple[tuple[int, int], str]] = {}
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of file content, memoized by (mtime, size) so unchanged files are read once."""
+    stat = path.stat()
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _DIGESTS.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    _DIGESTS[path] = (stamp, value)
+    return value
+
+
+def assets_fingerprint(parts: Iterable[tuple[str, Optional[Path]]]) -> str:
+    """Combined hash of labelled assets; a missing path hashes as 'default'."""
+    digest = hashlib.sha256()
+    for label, path in parts:
+        content = file_digest(path) if path is not None and path.exists() else "default"
+        digest.update(f"{label}={content}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+# Lower-cased fragments of the Bot API errors that mean a cached file_id can no longer be sent.
+_STALE_FILE_ID_ERRORS = (
+    "wrong file identifier",
+    "wrong remote file identifier",
+    "wrong file_id",
+    "file reference expired",
+    "file_reference_expired",
+    "type of file mismatch",
+    "can't use file of type",
+    "media_empty",
+)
+
+
+def is_stale_file_id_error(message: str) -> bool:
+    """Whether a BadRequest message blames the file_id, so re-uploading the file can help."""
+    lowered = message.lower()
+    return any(fragment in lowered for fragment in _STALE_FILE_ID_ERRORS)
+
+
+def media_key(kind: str, path: Path) -> str:
+    """Cache key for a local file sent as `kind` (photo, animation, ...)."""
+    return f"{kind}:{file_digest(path)}"
+
+
+@dataclass
+class MediaCache:
+    """Telegram file_id cache keyed by `kind:sha256` of the uploaded file.
+
+    A regenerated or edited asset hashes differently, so stale file_ids are never
+    reused; `retain` drops entries for assets that are no longer live.
+    """
+
+    path: Path
+    entries: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> "MediaCache":
+        if not path.exists():
+            return cls(path=path)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except json.JSONDecodeError:
+            logging.warning("file_id cache is invalid JSON, reset cache")
+            return cls(path=path)
+        if not isinstance(data, dict):
+            return cls(path=path)
+
+        entries = {str(k): str(v) for k, v in data.items() if ":" in str(k)}
+        if len(entries) != len(data):
+            logging.info("file_id cache: dropped %s legacy entries without content hash", len(data) - len(entries))
+        return cls(path=path, entries=entries)
+
+    def get(self, key: str) -> Optional[str]:
+        return self.entries.get(key)
+
+    def put(self, key: str, file_id: str) -> bool:
+        if self.entries.get(key) == file_id:
+            return False
+        self.entries[key] = file_id
+        return True
+
+    def adopt(self, other: "MediaCache") -> int:
+        """Copy entries this cache lacks from `other`; return how many were copied."""
+        missing = {key: file_id for key, file_id in other.entries.items() if key not in self.entries}
+        self.entries.update(missing)
+        return len(missing)
+
+    def discard(self, key: str) -> bool:
+        return self.entries.pop(key, None) is not None
+
+    def retain(self, kind: str, live_keys: set[str]) -> int:
+        """Drop `kind` entries whose key is not in `live_keys`; return how many were dropped."""
+        prefix = f"{kind}:"
+        stale = [key for key in self.entries if key.startswith(prefix) and key not in live_keys]
+        for key in stale:
+            del self.entries[key]
+        return len(stale)
+
+    def dumps(self) -> str:
+        return json.dumps(self.entries, ensure_ascii=False, indent=2)
+
+    def save(self) -> None:
+        atomic_write_text(self.path, self.dumps())
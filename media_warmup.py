@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from telegram import Bot, InputFile, Message
+from telegram.error import RetryAfter, TelegramError
+
+from media_cache import MediaCache
+
+MEDIA_PHOTO = "photo"
+MEDIA_ANIMATION = "animation"
+MAX_ATTEMPTS = 3
+
+
+def sent_file_id(sent: Message, kind: str) -> str | None:
+    if kind == MEDIA_PHOTO:
+        return sent.photo[-1].file_id if sent.photo else None
+    if kind == MEDIA_ANIMATION:
+        return sent.animation.file_id if sent.animation else None
+    return None
+
+
+@dataclass
+class WarmupReport:
+    uploaded: int = 0
+    cached: int = 0
+    failed: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        return f"uploaded={self.uploaded} | cached={self.cached} | failed={len(self.failed)} | seconds={self.seconds:.1f}"
+
+
+class _Pacer:
+    """Spaces sends `interval` apart; a flood-wait from Telegram pauses every sender."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._next_at = 0.0
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        start_at = max(now, self._next_at)
+        self._next_at = start_at + self.interval
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+    def back_off(self, seconds: float) -> None:
+        self._next_at = max(self._next_at, time.monotonic() + seconds)
+
+
+async def warm_up_media(
+    bot: Bot,
+    cache: MediaCache,
+    media: Iterable[tuple[str, Path, str]],
+    chat_id: int,
+    concurrency: int = 3,
+    interval: float = 1.0,
+    on_cached: Optional[Callable[[], None]] = None,
+) -> WarmupReport:
+    """Upload every `(kind, path, key)` without a cached file_id to `chat_id` and cache the ids.
+
+    At most `concurrency` uploads run at once, started `interval` seconds apart;
+    RetryAfter pauses all of them for the time Telegram asks. The same key is
+    uploaded once even if several paths share it. `on_cached` runs after each
+    new cache entry (e.g. to schedule a debounced save).
+    """
+    started = time.perf_counter()
+    report = WarmupReport()
+    pending: dict[str, tuple[str, Path]] = {}
+    for kind, path, key in media:
+        if cache.get(key):
+            report.cached += 1
+        else:
+            pending.setdefault(key, (kind, path))
+    if not pending:
+        return report
+
+    logging.info("media_warmup | to_upload=%s | cached=%s | chat_id=%s", len(pending), report.cached, chat_id)
+    pacer = _Pacer(interval)
+    slots = asyncio.Semaphore(concurrency)
+
+    async def upload(key: str, kind: str, path: Path) -> None:
+        async with slots:
+            data = await asyncio.to_thread(path.read_bytes)
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                if cache.get(key):
+                    # A live spin uploaded it meanwhile.
+                    return
+                await pacer.wait()
+                upload_file = InputFile(data, filename=path.name)
+                try:
+                    if kind == MEDIA_ANIMATION:
+                        sent = await bot.send_animation(chat_id=chat_id, animation=upload_file, disable_notification=True)
+                    else:
+                        sent = await bot.send_photo(chat_id=chat_id, photo=upload_file, disable_notification=True)
+                except RetryAfter as exc:
+                    retry_after = exc.retry_after
+                    seconds = retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+                    logging.warning("media_warmup | flood wait %.0fs (attempt %s)", seconds, attempt)
+                    pacer.back_off(seconds)
+                    continue
+                except TelegramError as exc:
+                    logging.warning("media_warmup | upload failed | path=%s | error=%s", path, exc)
+                    break
+                file_id = sent_file_id(sent, kind)
+                if file_id and cache.put(key, file_id):
+                    report.uploaded += 1
+                    if on_cached is not None:
+                        on_cached()
+                return
+            report.failed.append(path.name)
+
+    await asyncio.gather(*(upload(key, kind, path) for key, (kind, path) in pending.items()))
+    report.seconds = time.perf_counter() - started
+    logging.info("media_warmup | %s", report.summary())
+    return report
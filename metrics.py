@@ -0,0 +1,247 @@
+"""Prometheus-style metrics without a client library, and an optional sampling profiler.
+
+Metrics are plain in-process objects updated from the event loop (and from
+worker threads for counters). `serve_metrics` answers:
+
+    GET /metrics                    text exposition format 0.0.4
+    GET /debug/profile?seconds=10   collapsed stacks of the event-loop thread
+                                    (flamegraph.pl / speedscope input), when enabled
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+from urllib.parse import parse_qs, urlparse
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in key) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class CounterMetric:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help = help_text
+        self._values: dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[tuple[str, LabelKey, float]]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}_total", key, value
+
+
+class GaugeMetric:
+    """A set value, or a callback read at scrape time.
+
+    `fn` returns a number, or a dict whose keys become values of the `label` label.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn: Optional[Callable[[], object]] = None, label: str = "name") -> None:
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+        self.label = label
+        self._values: dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: object) -> None:
+        self._values[_label_key(labels)] = value
+
+    def samples(self) -> Iterator[tuple[str, LabelKey, float]]:
+        values = dict(self._values)
+        if self.fn is not None:
+            try:
+                current = self.fn()
+            except Exception:
+                logging.exception("gauge callback failed: %s", self.name)
+                current = {}
+            if isinstance(current, dict):
+                values.update({((self.label, str(key)),): float(value) for key, value in current.items()})
+            else:
+                values[()] = float(current)  # type: ignore[arg-type]
+        for key, value in values.items():
+            yield self.name, key, value
+
+
+class HistogramMetric:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., sum, count]
+        self._series: dict[LabelKey, list[float]] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        series = self._series.setdefault(_label_key(labels), [0.0] * (len(self.buckets) + 2))
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[idx] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        """Observe the wall time of the block, also when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Iterator[tuple[str, LabelKey, float]]:
+        for key, series in list(self._series.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket", key + (("le", _format_value(bound)),), cumulative
+            yield f"{self.name}_bucket", key + (("le", "+Inf"),), series[-1]
+            yield f"{self.name}_sum", key, series[-2]
+            yield f"{self.name}_count", key, series[-1]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, CounterMetric | GaugeMetric | HistogramMetric] = {}
+
+    def _add(self, metric: CounterMetric | GaugeMetric | HistogramMetric):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str) -> CounterMetric:
+        return self._add(CounterMetric(name, help_text))
+
+    def gauge(self, name: str, help_text: str, fn: Optional[Callable[[], object]] = None, label: str = "name") -> GaugeMetric:
+        return self._add(GaugeMetric(name, help_text, fn, label))
+
+    def histogram(self, name: str, help_text: str, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> HistogramMetric:
+        return self._add(HistogramMetric(name, help_text, buckets))
+
+    def get(self, name: str) -> CounterMetric | GaugeMetric | HistogramMetric:
+        return self._metrics[name]
+
+    def exposition(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, key, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SPIN_STAGE_SECONDS = REGISTRY.histogram(
+    "roulette_spin_stage_seconds",
+    "Time spent per spin stage (cooldown, nonce, pick, durable, animation, reveal_lateness, result).",
+)
+SPINS = REGISTRY.counter("roulette_spins", "Spins that produced a result.")
+COOLDOWN_REJECTIONS = REGISTRY.counter("roulette_cooldown_rejections", "Spin requests refused by a running cooldown.")
+MEDIA_CACHE = REGISTRY.counter("roulette_media_cache", "file_id cache lookups by media kind and result (hit, miss, stale).")
+RELOADS = REGISTRY.counter("roulette_reloads", "Loot table reloads by result (changed, unchanged, failed).")
+TELEGRAM_ERRORS = REGISTRY.counter("roulette_telegram_errors", "Errors raised by Bot API calls and handlers, by type.")
+ANIMATION_PROFILES = REGISTRY.counter("roulette_animation_profiles", "Spin animations sent, by render profile.")
+UPDATES = REGISTRY.counter("roulette_updates", "Handled updates by action.")
+
+
+class SamplingProfiler:
+    """Samples one thread's stack `hz` times per second into collapsed-stack counts.
+
+    Runs only while a profile is requested; cost when idle is zero.
+    """
+
+    def __init__(self, thread_id: int, hz: float = 100.0, max_depth: int = 64) -> None:
+        self.thread_id = thread_id
+        self.interval = 1.0 / hz
+        self.max_depth = max_depth
+
+    def sample_for(self, seconds: float) -> _Tally:
+        stacks: _Tally = _Tally()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None and len(names) < self.max_depth:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                stacks[";".join(reversed(names))] += 1
+            time.sleep(self.interval)
+        return stacks
+
+
+async def serve_metrics(host: str, port: int, registry: Registry = REGISTRY, profiling: bool = False) -> asyncio.base_events.Server:
+    """Minimal HTTP/1.0 endpoint on the running loop; bind it to localhost."""
+    profiler = SamplingProfiler(threading.get_ident()) if profiling else None
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            target = urlparse(request_line[1]) if len(request_line) > 1 else urlparse("/")
+            status, body = "404 Not Found", "not found\n"
+            if target.path == "/metrics":
+                status, body = "200 OK", registry.exposition()
+            elif target.path == "/debug/profile" and profiler is not None:
+                seconds = min(60.0, float(parse_qs(target.query).get("seconds", ["10"])[0]))
+                stacks = await asyncio.to_thread(profiler.sample_for, seconds)
+                status, body = "200 OK", "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+            payload = body.encode("utf-8")
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1")
+                + payload
+            )
+            await writer.drain()
+        except (ConnectionError, ValueError) as exc:
+            logging.warning("metrics request failed: %s", exc)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logging.info("Metrics on http://%s:%s/metrics%s", host, port, " (profiler on)" if profiling else "")
+    return server
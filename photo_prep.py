@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+from typing import Iterable
+
+from loot_table import Item
+from media_cache import file_digest
+
+# Bump when the output of `_prepare` changes so every prepared photo is rebuilt.
+PREP_VERSION = 1
+# Icons are shown in a chat bubble; Telegram keeps photos up to 1280 px, more is wasted upload.
+MAX_SIDE = 512
+JPEG_QUALITY = 88
+BACKGROUND = (22, 24, 35)
+
+
+def _prepare(source: Path, output: Path) -> None:
+    from PIL import Image
+
+    image = Image.open(source)
+    image.thumbnail((MAX_SIDE, MAX_SIDE), Image.Resampling.LANCZOS)
+    flat = Image.new("RGB", image.size, BACKGROUND)
+    rgba = image.convert("RGBA")
+    flat.paste(rgba, mask=rgba.getchannel("A"))
+    tmp_path = output.with_name(f"{output.stem}.{os.getpid()}.tmp{output.suffix}")
+    flat.save(tmp_path, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    tmp_path.replace(output)
+
+
+def prepare_result_photos(items: Iterable[Item], out_dir: Path, prune: bool = True) -> dict[str, Path]:
+    """Item id -> upload-ready copy of its icon: at most MAX_SIDE px, alpha flattened, JPEG.
+
+    Files are named by the source content hash, so items sharing an icon share
+    one file (and one upload), and an unchanged icon is never reprocessed.
+    With `prune`, files no item points to are removed; only prune where no
+    other process may still send from `out_dir`.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    photos: dict[str, Path] = {}
+    created = 0
+    for item in items:
+        output = out_dir / f"{file_digest(item.icon_path)[:24]}-v{PREP_VERSION}.jpg"
+        if not output.exists():
+            _prepare(item.icon_path, output)
+            created += 1
+        photos[item.item_id] = output
+
+    live = set(photos.values())
+    if prune:
+        for stale in out_dir.glob("*.jpg"):
+            if stale not in live:
+                stale.unlink(missing_ok=True)
+    logging.info("Result photos: %s items, %s files, %s prepared", len(photos), len(live), created)
+    return photos
@@ -0,0 +1,46 @@
+"""Output variants of the spin animation; importable without the rendering stack."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+# The master reel every profile is derived from.
+WIDTH = 1280
+HEIGHT = 720
+DURATION_SECONDS = 8
+FPS = 24
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    """One output variant of the reel: frame size, frame rate, length and container.
+
+    Every profile shows the same eased spin; a shorter `duration_seconds` plays it
+    faster. `format` is "mp4" (H.264, what Telegram animations are) or "gif"
+    (palette-reduced, for clients that autoplay GIFs only).
+    """
+
+    name: str
+    width: int
+    height: int
+    fps: int
+    duration_seconds: float
+    format: str = "mp4"
+    quality: float = 8
+    colors: int = 64
+
+    @property
+    def frames(self) -> int:
+        return max(2, round(self.duration_seconds * self.fps))
+
+    @property
+    def suffix(self) -> str:
+        return f".{self.format}"
+
+
+PROFILES = {
+    "full": RenderProfile("full", WIDTH, HEIGHT, FPS, DURATION_SECONDS),
+    "lite": RenderProfile("lite", 854, 480, 15, DURATION_SECONDS, quality=6),
+    "preview": RenderProfile("preview", 640, 360, 15, 3, quality=6),
+    "gif": RenderProfile("gif", 480, 270, 10, 4, format="gif", colors=64),
+}
+PROFILE_FORMATS = ("mp4", "gif")
@@ -0,0 +1,179 @@
+"""Minimal Redis-protocol (RESP2) server for local runs and tests of the shared state backend.
+
+Implements only what `state_backend.RespBackend` uses: PING, GET, SET (NX/XX,
+EX/PX), INCR, INCRBY, PTTL, DEL, EXISTS, FLUSHALL. One event loop owns the
+data, so every command is atomic. Nothing is persisted; point
+STATE_BACKEND_URL at a real Redis for production.
+
+    python resp_server.py --port 6390
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Optional
+
+
+class RespError(Exception):
+    pass
+
+
+def encode_reply(value: object) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return f"-ERR {value}\r\n".encode("utf-8")
+    if isinstance(value, bool):
+        return b":1\r\n" if value else b":0\r\n"
+    if isinstance(value, int):
+        return f":{value}\r\n".encode("ascii")
+    if isinstance(value, str):
+        return f"+{value}\r\n".encode("utf-8")
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    raise TypeError(f"cannot encode {type(value).__name__}")
+
+
+class KeyValueStore:
+    """Strings with optional expiry (monotonic deadline), expired lazily on access."""
+
+    def __init__(self) -> None:
+        self._data: dict[bytes, bytes] = {}
+        self._expires: dict[bytes, float] = {}
+
+    def _alive(self, key: bytes) -> bool:
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def execute(self, args: list[bytes]) -> object:
+        if not args:
+            return RespError("empty command")
+        name = args[0].upper().decode("ascii", "replace")
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            return RespError(f"unknown command '{name}'")
+        try:
+            return handler(*args[1:])
+        except (TypeError, ValueError) as exc:
+            return RespError(f"wrong arguments for '{name}': {exc}")
+
+    def cmd_ping(self, message: Optional[bytes] = None) -> object:
+        return message if message is not None else "PONG"
+
+    def cmd_get(self, key: bytes) -> Optional[bytes]:
+        return self._data[key] if self._alive(key) else None
+
+    def cmd_set(self, key: bytes, value: bytes, *options: bytes) -> object:
+        ttl: Optional[float] = None
+        only_new = only_existing = False
+        opts = [option.upper() for option in options]
+        i = 0
+        while i < len(opts):
+            if opts[i] == b"NX":
+                only_new = True
+            elif opts[i] == b"XX":
+                only_existing = True
+            elif opts[i] in (b"EX", b"PX"):
+                amount = int(opts[i + 1])
+                ttl = amount if opts[i] == b"EX" else amount / 1000
+                i += 1
+            else:
+                return RespError("syntax error")
+            i += 1
+        exists = self._alive(key)
+        if (only_new and exists) or (only_existing and not exists):
+            return None
+        self._data[key] = value
+        if ttl is None:
+            self._expires.pop(key, None)
+        else:
+            self._expires[key] = time.monotonic() + ttl
+        return "OK"
+
+    def cmd_incrby(self, key: bytes, amount: bytes) -> object:
+        current = int(self._data[key]) if self._alive(key) else 0
+        value = current + int(amount)
+        self._data[key] = str(value).encode("ascii")
+        return value
+
+    def cmd_incr(self, key: bytes) -> object:
+        return self.cmd_incrby(key, b"1")
+
+    def cmd_pttl(self, key: bytes) -> int:
+        if not self._alive(key):
+            return -2
+        deadline = self._expires.get(key)
+        return -1 if deadline is None else max(0, int((deadline - time.monotonic()) * 1000))
+
+    def cmd_del(self, *keys: bytes) -> int:
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self._data[key]
+                self._expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def cmd_exists(self, *keys: bytes) -> int:
+        return sum(1 for key in keys if self._alive(key))
+
+    def cmd_flushall(self) -> str:
+        self._data.clear()
+        self._expires.clear()
+        return "OK"
+
+
+async def _read_command(reader: asyncio.StreamReader) -> Optional[list[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()  # inline command, e.g. from `redis-cli` or telnet
+    args = []
+    for _ in range(int(line[1:])):
+        header = await reader.readline()
+        if not header.startswith(b"$"):
+            raise RespError("expected bulk string")
+        payload = await reader.readexactly(int(header[1:]) + 2)
+        args.append(payload[:-2])
+    return args
+
+
+async def serve(host: str, port: int, store: Optional[KeyValueStore] = None) -> asyncio.base_events.Server:
+    store = store or KeyValueStore()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                args = await _read_command(reader)
+                if args is None:
+                    break
+                writer.write(encode_reply(store.execute(args)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, RespError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def _main(host: str, port: int) -> None:
+    server = await serve(host, port)
+    logging.info("RESP stand-in listening on %s:%s", host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main(args.host, args.port))
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from fileio import atomic_write_text
+
+TICK_SECONDS = 0.25
+# Telegram limits: about one message per second in a private chat, 20 per minute
+# in a group, and 30 per second across all chats.
+PRIVATE_CHAT_INTERVAL = 1.0
+GROUP_CHAT_INTERVAL = 3.0
+GLOBAL_PER_SECOND = 30
+# Failed sends are retried with exponential backoff (or Telegram's retry_after), then given up.
+MAX_DELIVERY_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 2.0
+RETRY_MAX_SECONDS = 120.0
+
+
+@dataclass
+class PendingReveal:
+    """Work left after the animation was sent: delete it, then post the result.
+
+    A multi-spin posts `album` ([item_id, photo path] pairs) as one media group
+    captioned with `caption`; `item_id` and `icon_path` are then its featured item.
+    `pulls` ([nonce, item_id] pairs of `user_id`'s spin at `spun_at`) go to the
+    drop statistics once the result is posted.
+    """
+
+    due: float
+    chat_id: int
+    chat_type: str
+    reply_to_message_id: Optional[int]
+    animation_message_id: Optional[int]
+    item_id: str
+    icon_path: str
+    caption: str
+    album: list[list[str]] = field(default_factory=list)
+    user_id: int = 0
+    user_name: str = ""
+    spun_at: float = 0.0
+    pulls: list[list] = field(default_factory=list)
+    attempts: int = 0
+
+
+@dataclass
+class _ChatThrottle:
+    next_allowed: dict[int, float] = field(default_factory=dict)
+    window_start: float = 0.0
+    window_count: int = 0
+
+    def reserve(self, reveal: PendingReveal, now: float) -> float:
+        """Return 0 and book a slot if the chat may be written to now, else the time to retry."""
+        ready_at = self.next_allowed.get(reveal.chat_id, 0.0)
+        if ready_at > now:
+            return ready_at
+
+        if now - self.window_start >= 1.0:
+            self.window_start = now
+            self.window_count = 0
+        # A media group counts as one message per photo.
+        messages = max(1, len({path for _, path in reveal.album}))
+        if self.window_count and self.window_count + messages > GLOBAL_PER_SECOND:
+            return self.window_start + 1.0
+
+        self.window_count += messages
+        interval = PRIVATE_CHAT_INTERVAL if reveal.chat_type == "private" else GROUP_CHAT_INTERVAL
+        self.next_allowed[reveal.chat_id] = now + interval * messages
+        return 0.0
+
+    def sweep(self, now: float) -> None:
+        expired = [chat_id for chat_id, ready_at in self.next_allowed.items() if ready_at <= now]
+        for chat_id in expired:
+            del self.next_allowed[chat_id]
+
+
+def _retry_delay(attempts: int, exc: BaseException) -> float:
+    """Telegram's `retry_after` (seconds or a timedelta) if the error carries one, else exponential backoff."""
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is not None:
+        seconds = retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+        return max(seconds, TICK_SECONDS)
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+class RevealScheduler:
+    """Heap of pending reveals, drained in per-tick batches by one background task.
+
+    The heap is mirrored to `path` after every tick that changed it, so reveals
+    scheduled before a restart are delivered by the next process (late ones at once).
+    Delivery is at-least-once: a reveal leaves the saved heap only once it was
+    sent, a failed send is pushed back with backoff, and a crash between sending
+    and the next save repeats it.
+    """
+
+    def __init__(self, path: Path, deliver: Callable[[PendingReveal], Awaitable[None]]) -> None:
+        self.path = path
+        self.deliver = deliver
+        self._heap: list[tuple[float, int, PendingReveal]] = []
+        # Taken off the heap but not sent yet; saved with the heap so a stop or crash keeps them.
+        self._in_flight: dict[int, PendingReveal] = {}
+        self._seq = 0
+        self._dirty = False
+        self._wake = asyncio.Event()
+        self._throttle = _ChatThrottle()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._heap) + len(self._in_flight)
+
+    def _push(self, reveal: PendingReveal) -> None:
+        self._seq += 1
+        heapq.heappush(self._heap, (reveal.due, self._seq, reveal))
+        self._dirty = True
+
+    def schedule(self, reveal: PendingReveal) -> None:
+        self._push(reveal)
+        self._wake.set()
+
+    def load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+            reveals = [PendingReveal(**entry) for entry in raw]
+        except (json.JSONDecodeError, TypeError) as exc:
+            logging.warning("pending reveals file is invalid, ignoring it: %s", exc)
+            return
+        for reveal in reveals:
+            self._push(reveal)
+        self._dirty = False
+        logging.info("Restored %s pending reveals", len(reveals))
+
+    def _dump(self) -> str:
+        self._dirty = False
+        reveals = [reveal for _, _, reveal in sorted(self._heap)] + list(self._in_flight.values())
+        return json.dumps([asdict(reveal) for reveal in reveals], ensure_ascii=False)
+
+    def save(self) -> None:
+        atomic_write_text(self.path, self._dump())
+
+    def start(self) -> None:
+        self.load()
+        self._task = asyncio.create_task(self._run(), name="reveal-scheduler")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.save()
+
+    def _take_due(self, now: float) -> list[PendingReveal]:
+        batch: list[PendingReveal] = []
+        deferred: list[PendingReveal] = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, reveal = heapq.heappop(self._heap)
+            retry_at = self._throttle.reserve(reveal, now)
+            if retry_at:
+                reveal.due = retry_at
+                deferred.append(reveal)
+            else:
+                batch.append(reveal)
+                self._in_flight[id(reveal)] = reveal
+        for reveal in deferred:
+            self._push(reveal)
+        if batch:
+            self._dirty = True
+        return batch
+
+    async def _deliver(self, reveal: PendingReveal) -> None:
+        try:
+            await self.deliver(reveal)
+        except Exception as exc:
+            reveal.attempts += 1
+            if reveal.attempts >= MAX_DELIVERY_ATTEMPTS:
+                logging.exception(
+                    "reveal delivery failed, giving up | chat_id=%s | item_id=%s | attempts=%s",
+                    reveal.chat_id,
+                    reveal.item_id,
+                    reveal.attempts,
+                )
+            else:
+                delay = _retry_delay(reveal.attempts, exc)
+                logging.warning(
+                    "reveal delivery failed, retrying | chat_id=%s | item_id=%s | attempts=%s | retry_in=%.1fs | error=%r",
+                    reveal.chat_id,
+                    reveal.item_id,
+                    reveal.attempts,
+                    delay,
+                    exc,
+                )
+                reveal.due = time.time() + delay
+                self._push(reveal)
+        # Not reached on cancellation: the reveal stays in flight and `stop` saves it.
+        del self._in_flight[id(reveal)]
+        self._dirty = True
+
+    async def _run(self) -> None:
+        while True:
+            now = time.time()
+            batch = self._take_due(now)
+            if batch:
+                await asyncio.gather(*(self._deliver(reveal) for reveal in batch))
+            self._throttle.sweep(now)
+            if self._dirty:
+                await asyncio.to_thread(atomic_write_text, self.path, self._dump())
+
+            timeout = max(TICK_SECONDS, self._heap[0][0] - time.time()) if self._heap else None
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
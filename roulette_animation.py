@@ -1,19 +1,26 @@
 from __future__ import annotations
 
+import logging
+import math
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator, Optional
 
 import imageio.v2 as imageio
 import numpy as np
 from PIL import Image, ImageDraw
 
 from loot_table import Item
+from render_profiles import DURATION_SECONDS, FPS, HEIGHT, PROFILE_FORMATS, PROFILES, WIDTH, RenderProfile
 
 
-WIDTH = 1280
-HEIGHT = 720
-DURATION_SECONDS = 8
-FPS = 24
+SLOT_W = 120
+SLOT_H = 120
+SLOT_SPACING = 18
+VISIBLE_SLOTS = 9
 
 
 def _fit_cover(image: Image.Image, w: int, h: int) -> Image.Image:
@@ -48,28 +55,46 @@ def _default_frame(slot_w: int, slot_h: int) -> Image.Image:
     return frame
 
 
-def generate_spin_animation(
-    items: Iterable[Item],
-    output_path: Path,
-    background_path: Path,
-    frame_path: Path,
-) -> None:
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+@dataclass
+class RenderTimings:
+    """Wall-clock seconds spent per stage; in pipeline mode compose/convert are summed across workers."""
 
-    slot_w, slot_h = 120, 120
-    lane_y = HEIGHT // 2 - slot_h // 2
-    visible_slots = 9
-    spacing = 18
-    step = slot_w + spacing
+    compose: float = 0.0
+    convert: float = 0.0
+    encode: float = 0.0
+    total: float = 0.0
 
-    item_list = list(items)
-    if not item_list:
+    def add(self, other: "RenderTimings") -> None:
+        self.compose += other.compose
+        self.convert += other.convert
+        self.encode += other.encode
+
+
+@dataclass
+class _Reel:
+    icons: list[Image.Image]
+    background: Image.Image
+    frame_img: Image.Image
+    frames: int
+    end_offset: float
+
+
+def _load_reel(
+    items: list[Item],
+    background_path: Path,
+    frame_path: Path,
+    stop_index: Optional[int],
+) -> _Reel:
+    if not items:
         raise ValueError("No items provided for animation")
 
-    icon_cache: list[Image.Image] = []
-    for item in item_list:
+    if stop_index is not None and not 0 <= stop_index < len(items):
+        raise ValueError(f"stop_index out of range: {stop_index}")
+
+    icons: list[Image.Image] = []
+    for item in items:
         icon = Image.open(item.icon_path).convert("RGBA")
-        icon_cache.append(_fit_cover(icon, slot_w, slot_h))
+        icons.append(_fit_cover(icon, SLOT_W, SLOT_H))
 
     background = (
         Image.open(background_path).convert("RGB").resize((WIDTH, HEIGHT), Image.Resampling.LANCZOS)
@@ -80,29 +105,337 @@ def generate_spin_animation(
     frame_img = (
         Image.open(frame_path).convert("RGBA")
         if frame_path.exists()
-        else _default_frame(slot_w, slot_h)
+        else _default_frame(SLOT_W, SLOT_H)
+    )
+
+    end_slot = len(items) * 4 + 6
+    if stop_index is not None:
+        end_slot += (stop_index - end_slot) % len(items)
+
+    return _Reel(
+        icons=icons,
+        background=background.convert("RGBA"),
+        frame_img=frame_img,
+        frames=DURATION_SECONDS * FPS,
+        end_offset=(SLOT_W + SLOT_SPACING) * end_slot,
+    )
+
+
+def _reel_slots(reel: _Reel, idx: int) -> Iterator[tuple[int, int]]:
+    """Yield (icon index, x) for every slot of frame `idx` that overlaps the screen."""
+    step = SLOT_W + SLOT_SPACING
+    x_center = WIDTH // 2 - SLOT_W // 2
+    side_slots = VISIBLE_SLOTS // 2 + 2
+
+    t = idx / max(1, reel.frames - 1)
+    eased = 1 - (1 - t) ** 3
+    offset = reel.end_offset * eased
+
+    for pos in range(-side_slots, side_slots + 1):
+        lane_pos = pos * step - int(offset) % step
+        x = x_center + lane_pos
+        if x < -SLOT_W or x > WIDTH:
+            continue
+        yield (int((offset / step) + pos)) % len(reel.icons), x
+
+
+class _PilCompositor:
+    """Reference backend: composites each frame as a PIL image."""
+
+    reuses_buffer = False
+
+    def __init__(self, reel: _Reel) -> None:
+        self.reel = reel
+
+    def render(self, idx: int, timings: RenderTimings) -> np.ndarray:
+        reel = self.reel
+        lane_y = HEIGHT // 2 - SLOT_H // 2
+        started = time.perf_counter()
+        frame = reel.background.copy()
+
+        for icon_idx, x in _reel_slots(reel, idx):
+            frame.alpha_composite(reel.icons[icon_idx], (max(x, 0), lane_y), (max(-x, 0), 0))
+
+        frame_img = reel.frame_img
+        frame.alpha_composite(frame_img, (WIDTH // 2 - frame_img.width // 2, HEIGHT // 2 - frame_img.height // 2))
+        composed = time.perf_counter()
+
+        rgb = np.asarray(frame.convert("RGB"))
+        timings.compose += composed - started
+        timings.convert += time.perf_counter() - composed
+        return rgb
+
+
+def _premultiply(image: Image.Image) -> tuple[np.ndarray, np.ndarray]:
+    """(rgb * alpha, 255 - alpha) as uint16; both products of a blend then stay below 2**16."""
+    rgba = np.asarray(image.convert("RGBA"), dtype=np.uint16)
+    alpha = rgba[:, :, 3:4]
+    return rgba[:, :, :3] * alpha, 255 - alpha
+
+
+class _NumpyCompositor:
+    """Blends pre-multiplied layers into a reusable uint8 frame with uint16 integer math.
+
+    Only the band the reel and the frame overlay cover changes between frames,
+    so each `render` restores just that band from the background. The returned
+    array is overwritten by the next `render` call.
+    """
+
+    reuses_buffer = True
+
+    def __init__(self, reel: _Reel) -> None:
+        self.reel = reel
+        self.background = np.ascontiguousarray(np.asarray(reel.background.convert("RGB"), dtype=np.uint8))
+        self.icons = [_premultiply(icon) for icon in reel.icons]
+        self.overlay = _premultiply(reel.frame_img)
+        self.rgb = self.background.copy()
+
+        lane_y = HEIGHT // 2 - SLOT_H // 2
+        overlay_h, overlay_w = self.overlay[0].shape[:2]
+        self.overlay_xy = (WIDTH // 2 - overlay_w // 2, HEIGHT // 2 - overlay_h // 2)
+        self.band = slice(max(0, min(lane_y, self.overlay_xy[1])), min(HEIGHT, max(lane_y + SLOT_H, self.overlay_xy[1] + overlay_h)))
+        largest = max(layer[0].shape[:2] for layer in [*self.icons, self.overlay])
+        self._sum = np.empty((*largest, 3), dtype=np.uint16)
+        self._carry = np.empty((*largest, 3), dtype=np.uint16)
+
+    def _blend(self, layer: tuple[np.ndarray, np.ndarray], x: int, y: int) -> None:
+        premultiplied, inverse_alpha = layer
+        h, w = premultiplied.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, WIDTH), min(y + h, HEIGHT)
+        if x0 >= x1 or y0 >= y1:
+            return
+        src = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+        dst = self.rgb[y0:y1, x0:x1]
+        total = self._sum[: y1 - y0, : x1 - x0]
+        carry = self._carry[: y1 - y0, : x1 - x0]
+        # dst * (255 - a) + src * a, then an exact rounded division by 255.
+        np.multiply(dst, inverse_alpha[src], out=total)
+        total += premultiplied[src]
+        total += 128
+        np.right_shift(total, 8, out=carry)
+        total += carry
+        total >>= 8
+        np.copyto(dst, total, casting="unsafe")
+
+    def render(self, idx: int, timings: RenderTimings) -> np.ndarray:
+        lane_y = HEIGHT // 2 - SLOT_H // 2
+        started = time.perf_counter()
+        self.rgb[self.band] = self.background[self.band]
+
+        for icon_idx, x in _reel_slots(self.reel, idx):
+            self._blend(self.icons[icon_idx], x, lane_y)
+
+        self._blend(self.overlay, *self.overlay_xy)
+        timings.compose += time.perf_counter() - started
+        return self.rgb
+
+
+COMPOSITORS = {"pil": _PilCompositor, "numpy": _NumpyCompositor}
+
+
+def _make_compositor(reel: _Reel, backend: str) -> _PilCompositor | _NumpyCompositor:
+    if backend not in COMPOSITORS:
+        raise ValueError(f"unknown compositor backend: {backend}")
+    return COMPOSITORS[backend](reel)
+
+
+_WORKER_COMPOSITOR: Optional[_PilCompositor | _NumpyCompositor] = None
+
+
+def _init_frame_worker(
+    items: list[Item],
+    background_path: Path,
+    frame_path: Path,
+    stop_index: Optional[int],
+    backend: str,
+) -> None:
+    global _WORKER_COMPOSITOR
+    _WORKER_COMPOSITOR = _make_compositor(_load_reel(items, background_path, frame_path, stop_index), backend)
+
+
+def _render_frames(indices: list[int]) -> tuple[list[np.ndarray], RenderTimings]:
+    assert _WORKER_COMPOSITOR is not None, "frame worker is not initialized"
+    compositor = _WORKER_COMPOSITOR
+    timings = RenderTimings()
+    frames = []
+    for idx in indices:
+        rgb = compositor.render(idx, timings)
+        frames.append(rgb.copy() if compositor.reuses_buffer else rgb)
+    return frames, timings
+
+
+class _VideoOutput:
+    """H.264 writer that scales master frames down to the profile size."""
+
+    def __init__(self, profile: RenderProfile, path: Path) -> None:
+        self.profile = profile
+        self.writer = imageio.get_writer(
+            path.as_posix(),
+            fps=profile.fps,
+            codec="libx264",
+            quality=profile.quality,
+            pixelformat="yuv420p",
+            macro_block_size=2,
+        )
+
+    def append(self, rgb: np.ndarray) -> None:
+        self.writer.append_data(_scaled(rgb, self.profile))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class _GifOutput:
+    """Looping GIF with a per-frame palette of `profile.colors`; frames are written on close."""
+
+    def __init__(self, profile: RenderProfile, path: Path) -> None:
+        self.profile = profile
+        self.path = path
+        self.frames: list[Image.Image] = []
+
+    def append(self, rgb: np.ndarray) -> None:
+        image = Image.fromarray(_scaled(rgb, self.profile))
+        self.frames.append(image.quantize(colors=self.profile.colors, method=Image.Quantize.MEDIANCUT))
+
+    def close(self) -> None:
+        if not self.frames:
+            return
+        first, *rest = self.frames
+        first.save(
+            self.path,
+            format="GIF",
+            save_all=True,
+            append_images=rest,
+            duration=round(1000 / self.profile.fps),
+            loop=0,
+            optimize=True,
+        )
+
+
+def _scaled(rgb: np.ndarray, profile: RenderProfile) -> np.ndarray:
+    if rgb.shape[1] == profile.width and rgb.shape[0] == profile.height:
+        return rgb
+    return np.asarray(Image.fromarray(rgb).resize((profile.width, profile.height), Image.Resampling.BILINEAR))
+
+
+def _open_output(profile: RenderProfile, path: Path) -> _VideoOutput | _GifOutput:
+    if profile.format not in PROFILE_FORMATS:
+        raise ValueError(f"unknown animation format: {profile.format}")
+    return _GifOutput(profile, path) if profile.format == "gif" else _VideoOutput(profile, path)
+
+
+def _frame_schedule(profiles: list[RenderProfile], master_frames: int) -> dict[int, list[int]]:
+    """Master frame index -> positions of the outputs that show it, once per output frame.
+
+    Output frame j of a profile with n frames is the master frame at the same point
+    of the eased timeline, so walking the keys in order feeds every output in order.
+    """
+    uses: dict[int, list[int]] = {}
+    for position, profile in enumerate(profiles):
+        for j in range(profile.frames):
+            idx = round(j * (master_frames - 1) / (profile.frames - 1))
+            uses.setdefault(idx, []).append(position)
+    return dict(sorted(uses.items()))
+
+
+def generate_spin_animations(
+    items: Iterable[Item],
+    outputs: dict[RenderProfile, Path],
+    background_path: Path,
+    frame_path: Path,
+    stop_index: int | None = None,
+    workers: int = 1,
+    backend: str = "numpy",
+) -> RenderTimings:
+    """Render the reel once and encode it into every profile in `outputs`.
+
+    Source assets are decoded once and each master frame is composited once, then
+    scaled into the outputs that need it; frames no profile shows are skipped.
+    With `stop_index` the reel decelerates onto that item, centered under the frame.
+
+    With `workers > 1` frames are composited in a process pool and streamed back to
+    the encoders in order, with at most `2 * workers` chunks in flight. `backend` selects
+    the compositor: "numpy" (default) or the "pil" reference; bench_compositor.py
+    compares their per-frame cost and output.
+    """
+    if not outputs:
+        raise ValueError("No animation outputs requested")
+    started = time.perf_counter()
+    item_list = list(items)
+    reel = _load_reel(item_list, background_path, frame_path, stop_index)
+    profiles = list(outputs)
+    schedule = _frame_schedule(profiles, reel.frames)
+    timings = RenderTimings()
+
+    writers = []
+    try:
+        for profile, path in outputs.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            writers.append(_open_output(profile, path))
+
+        def encode(idx: int, rgb: np.ndarray) -> None:
+            encode_started = time.perf_counter()
+            for position in schedule[idx]:
+                writers[position].append(rgb)
+            timings.encode += time.perf_counter() - encode_started
+
+        indices = list(schedule)
+        if workers <= 1:
+            compositor = _make_compositor(reel, backend)
+            for idx in indices:
+                encode(idx, compositor.render(idx, timings))
+        else:
+            chunk = max(1, math.ceil(len(indices) / (workers * 4)))
+            chunks = deque(indices[start:start + chunk] for start in range(0, len(indices), chunk))
+            pending: deque[tuple[list[int], Future]] = deque()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_frame_worker,
+                initargs=(item_list, background_path, frame_path, stop_index, backend),
+            ) as pool:
+                while chunks or pending:
+                    while chunks and len(pending) < workers * 2:
+                        batch = chunks.popleft()
+                        pending.append((batch, pool.submit(_render_frames, batch)))
+                    batch, future = pending.popleft()
+                    frames, chunk_timings = future.result()
+                    timings.add(chunk_timings)
+                    for idx, rgb in zip(batch, frames):
+                        encode(idx, rgb)
+    finally:
+        encode_started = time.perf_counter()
+        for writer in writers:
+            writer.close()
+        timings.encode += time.perf_counter() - encode_started
+
+    timings.total = time.perf_counter() - started
+    logging.info(
+        "Rendered %s (%s of %s master frames, profiles=%s, backend=%s, workers=%s): "
+        "compose=%.2fs convert=%.2fs encode=%.2fs total=%.2fs",
+        ", ".join(path.name for path in outputs.values()),
+        len(schedule),
+        reel.frames,
+        ",".join(profile.name for profile in profiles),
+        backend,
+        workers,
+        timings.compose,
+        timings.convert,
+        timings.encode,
+        timings.total,
     )
+    return timings
+
 
-    frames = DURATION_SECONDS * FPS
-    start_offset = 0.0
-    end_offset = step * (len(item_list) * 4 + 6)
-    x_center = WIDTH // 2 - slot_w // 2
-
-    with imageio.get_writer(output_path.as_posix(), fps=FPS, codec="libx264", quality=8, pixelformat="yuv420p") as writer:
-        for idx in range(frames):
-            t = idx / max(1, frames - 1)
-            eased = 1 - (1 - t) ** 3
-            offset = start_offset + (end_offset - start_offset) * eased
-
-            frame = background.copy().convert("RGBA")
-
-            for pos in range(-2, visible_slots + 4):
-                lane_pos = pos * step - int(offset)
-                x = x_center + lane_pos
-                if x < -slot_w or x > WIDTH:
-                    continue
-                icon_idx = (int((offset / step) + pos)) % len(icon_cache)
-                frame.alpha_composite(icon_cache[icon_idx], (x, lane_y))
-
-            frame.alpha_composite(frame_img, (WIDTH // 2 - frame_img.width // 2, HEIGHT // 2 - frame_img.height // 2))
-            writer.append_data(np.asarray(frame.convert("RGB")))
+def generate_spin_animation(
+    items: Iterable[Item],
+    output_path: Path,
+    background_path: Path,
+    frame_path: Path,
+    stop_index: int | None = None,
+    workers: int = 1,
+    backend: str = "numpy",
+    profile: RenderProfile = PROFILES["full"],
+) -> RenderTimings:
+    """Render one profile (default: full 720p) to `output_path`; see `generate_spin_animations`."""
+    return generate_spin_animations(items, {profile: output_path}, background_path, frame_path, stop_index, workers, backend)
@@ -0,0 +1,201 @@
+"""Monte Carlo check of the spin pipeline and a micro-benchmark of its hot path.
+
+Runs spins through the real mapping (HMAC-SHA256 -> digest_to_unit_float -> LootTable
+pick) and compares observed drops with the sheet weights:
+
+    python simulate.py --spins 10000000
+    python simulate.py --spins 2000000 --sampler prefix --workers 4
+    python simulate.py --bench-only --max-spin-us 25
+
+Exit status is 1 when the chi-square or KS p-value is below --alpha, or when a
+benchmarked spin is slower than --max-spin-us, so it can gate a deploy.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import secrets
+import sys
+import time
+import timeit
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from fairness import FairnessEngine, FairnessSeason
+from loot_table import SAMPLERS, SAMPLER_ALIAS, LootTable, load_loot_table
+
+BASE_DIR = Path(__file__).resolve().parent
+R_HISTOGRAM_BINS = 1 << 16
+CHUNK_SPINS = 200_000
+
+
+def unit_floats(server_seed: str, client_seed: str, first_nonce: int, count: int) -> np.ndarray:
+    """r values for nonces first_nonce.., bit-identical to FairnessEngine.digest_to_unit_float."""
+    season = FairnessSeason(server_seed=server_seed, commit="")
+    return np.array(season.unit_floats((client_seed, nonce) for nonce in range(first_nonce, first_nonce + count)))
+
+
+_TABLE: Optional[LootTable] = None
+
+
+def _init_worker(table: LootTable) -> None:
+    global _TABLE
+    _TABLE = table
+
+
+def _simulate_chunk(args: tuple[str, str, int, int, str]) -> tuple[np.ndarray, np.ndarray]:
+    server_seed, client_seed, first_nonce, count, sampler = args
+    assert _TABLE is not None
+    rs = unit_floats(server_seed, client_seed, first_nonce, count)
+    picks = _TABLE.choose_indices(rs, sampler)
+    item_counts = np.bincount(picks, minlength=len(_TABLE.items))
+    r_hist = np.bincount(np.minimum((rs * R_HISTOGRAM_BINS).astype(np.int64), R_HISTOGRAM_BINS - 1), minlength=R_HISTOGRAM_BINS)
+    return item_counts, r_hist
+
+
+def chi2_sf(statistic: float, dof: int) -> float:
+    """Upper tail of the chi-square distribution: Q(dof/2, statistic/2); 1.0 without degrees of freedom."""
+    a, x = dof / 2.0, statistic / 2.0
+    if dof <= 0 or x <= 0:
+        return 1.0
+    if x < a + 1:
+        term = total = 1.0 / a
+        for n in range(1, 1000):
+            term *= x / (a + n)
+            total += term
+            if abs(term) < abs(total) * 1e-15:
+                break
+        return max(0.0, 1.0 - total * math.exp(-x + a * math.log(x) - math.lgamma(a)))
+    # Lentz continued fraction for the upper incomplete gamma.
+    tiny = 1e-300
+    b = x + 1.0 - a
+    c = 1.0 / tiny
+    d = 1.0 / b
+    h = d
+    for n in range(1, 1000):
+        an = -n * (n - a)
+        b += 2.0
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 1e-15:
+            break
+    return math.exp(-x + a * math.log(x) - math.lgamma(a)) * h
+
+
+def ks_sf(statistic: float, n: int) -> float:
+    """Asymptotic Kolmogorov p-value with Stephens' small-sample correction."""
+    root = math.sqrt(n)
+    lam = (root + 0.12 + 0.11 / root) * statistic
+    if lam < 1e-3:
+        return 1.0
+    total = sum((-1) ** (k - 1) * math.exp(-2.0 * k * k * lam * lam) for k in range(1, 101))
+    return min(1.0, max(0.0, 2.0 * total))
+
+
+def ks_uniform(r_hist: np.ndarray) -> float:
+    """KS distance of the r sample from U[0, 1), evaluated at the histogram bin edges."""
+    n = int(r_hist.sum())
+    empirical = np.cumsum(r_hist) / n
+    edges = np.arange(1, len(r_hist) + 1) / len(r_hist)
+    return float(np.max(np.abs(empirical - edges)))
+
+
+def run_simulation(table: LootTable, spins: int, sampler: str, workers: int) -> tuple[np.ndarray, np.ndarray, float]:
+    server_seed = secrets.token_hex(32)
+    tasks = [
+        (server_seed, "simulate", first, min(CHUNK_SPINS, spins - first), sampler)
+        for first in range(0, spins, CHUNK_SPINS)
+    ]
+    item_counts = np.zeros(len(table.items), dtype=np.int64)
+    r_hist = np.zeros(R_HISTOGRAM_BINS, dtype=np.int64)
+    started = time.perf_counter()
+    with Pool(processes=workers, initializer=_init_worker, initargs=(table,)) as pool:
+        for counts, hist in pool.imap_unordered(_simulate_chunk, tasks):
+            item_counts += counts
+            r_hist += hist
+    return item_counts, r_hist, time.perf_counter() - started
+
+
+def bench_spin_path(table: LootTable, repeat: int = 5, number: int = 20_000) -> dict[str, float]:
+    """Best-of-`repeat` microseconds per spin for each sampler, measured on the live code path."""
+    engine = FairnessEngine(season=FairnessSeason.from_seed(secrets.token_hex(32)))
+    results: dict[str, float] = {}
+    for sampler in SAMPLERS:
+        def spin() -> None:
+            nonce = engine.next_nonce(1)
+            r = engine.digest_to_unit_float(engine.digest_for_spin("1:1:1", nonce))
+            table.choose(r, sampler)
+
+        best = min(timeit.repeat(spin, repeat=repeat, number=number))
+        results[sampler] = best / number * 1e6
+    return results
+
+
+def _check_batch_matches_engine(table: LootTable, sampler: str) -> None:
+    season = FairnessSeason.from_seed(secrets.token_hex(32))
+    rs = unit_floats(season.server_seed, "check", 1, 1000)
+    picks = table.choose_indices(rs, sampler)
+    for offset in range(1000):
+        r = FairnessEngine.digest_to_unit_float(season.digest_for_spin("check", 1 + offset))
+        if r != rs[offset] or table.choose(r, sampler) is not table.items[picks[offset]]:
+            raise AssertionError(f"batched path diverges from FairnessEngine at nonce {1 + offset}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=Path, default=BASE_DIR / "data" / "items.xlsx")
+    parser.add_argument("--icons", type=Path, default=BASE_DIR / "assets" / "items")
+    parser.add_argument("--spins", type=int, default=1_000_000)
+    parser.add_argument("--sampler", choices=SAMPLERS, default=SAMPLER_ALIAS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--alpha", type=float, default=1e-3, help="fail when a p-value is below this")
+    parser.add_argument("--bench-only", action="store_true", help="skip the simulation")
+    parser.add_argument("--max-spin-us", type=float, help="fail when a benchmarked spin is slower than this")
+    args = parser.parse_args()
+
+    table = load_loot_table(args.items, args.icons)
+    failed = False
+
+    if not args.bench_only:
+        _check_batch_matches_engine(table, args.sampler)
+        counts, r_hist, elapsed = run_simulation(table, args.spins, args.sampler, args.workers)
+        expected = np.array([item.weight for item in table.items]) / table.sum_weights * args.spins
+        chi2 = float(np.sum((counts - expected) ** 2 / expected))
+        chi2_p = chi2_sf(chi2, len(table.items) - 1)
+        ks = ks_uniform(r_hist)
+        ks_p = ks_sf(ks, args.spins)
+
+        print(f"spins: {args.spins:,} sampler={args.sampler} workers={args.workers}")
+        print(f"throughput: {args.spins / elapsed:,.0f} spins/s ({elapsed:.2f}s)")
+        print(f"chi-square: {chi2:.3f} (dof={len(table.items) - 1}, p={chi2_p:.4f})")
+        print(f"KS(r ~ U[0,1)): D={ks:.6f} (p={ks_p:.4f})")
+        print(f"{'id':>10} {'name':<24} {'expected %':>11} {'observed %':>11} {'z':>7}")
+        for item, observed, exp in zip(table.items, counts, expected):
+            p = exp / args.spins
+            z = (observed - exp) / math.sqrt(args.spins * p * (1 - p)) if 0 < p < 1 else 0.0
+            print(f"{item.item_id:>10} {item.name[:24]:<24} {p * 100:>11.5f} {observed / args.spins * 100:>11.5f} {z:>7.2f}")
+        if chi2_p < args.alpha or ks_p < args.alpha:
+            print(f"FAIL: p-value below alpha={args.alpha}")
+            failed = True
+
+    bench = bench_spin_path(table)
+    for sampler, micros in bench.items():
+        print(f"hot path ({sampler}): {micros:.2f} us/spin")
+        if args.max_spin_us is not None and micros > args.max_spin_us:
+            print(f"FAIL: {sampler} spin slower than {args.max_spin_us} us")
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""Spin event log: a queue-fed writer thread, size-rotated files, columnar binary chunks.
+
+Each chunk holds up to `flush_records` spins as one length-prefixed block:
+
+    header   <4sBII   magic b"SPNC", format version, record count n, dictionary length
+    dict     UTF-8 JSON list of the distinct strings used by the chunk
+    columns  ts f64[n] | chat_id i64[n] | user_id i64[n] | nonce i64[n]
+             | item_id u32[n] | commit u32[n] | trigger u32[n]   (string columns index dict)
+
+all little-endian. A reader maps whole columns with numpy instead of parsing
+lines, and stops cleanly at a chunk truncated by a crash:
+
+    python spin_events.py logs/spins --by item
+    python spin_events.py logs/spins --by chat --top 20
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import mmap
+import queue
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+
+MAGIC = b"SPNC"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sBII")
+NUMERIC_COLUMNS = (("ts", "d"), ("chat_id", "q"), ("user_id", "q"), ("nonce", "q"))
+STRING_COLUMNS = ("item_id", "commit", "trigger")
+_NUMPY_TYPES = {"d": "<f8", "q": "<i8", "I": "<u4"}
+_ITEMSIZE = {"d": 8, "q": 8, "I": 4}
+GROUPINGS = ("item", "chat", "season", "user")
+
+
+@dataclass(frozen=True)
+class SpinEvent:
+    ts: float
+    chat_id: int
+    user_id: int
+    nonce: int
+    item_id: str
+    commit: str
+    trigger: str
+
+
+def encode_chunk(events: list[SpinEvent]) -> bytes:
+    strings: dict[str, int] = {}
+    numeric = {name: array(code) for name, code in NUMERIC_COLUMNS}
+    coded = {name: array("I") for name in STRING_COLUMNS}
+    for event in events:
+        for name, _ in NUMERIC_COLUMNS:
+            numeric[name].append(getattr(event, name))
+        for name in STRING_COLUMNS:
+            coded[name].append(strings.setdefault(getattr(event, name), len(strings)))
+
+    dictionary = json.dumps(list(strings), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    parts = [_HEADER.pack(MAGIC, FORMAT_VERSION, len(events), len(dictionary)), dictionary]
+    for column in [*numeric.values(), *coded.values()]:
+        if sys.byteorder == "big":
+            column.byteswap()
+        parts.append(column.tobytes())
+    return b"".join(parts)
+
+
+def _chunk_body_size(count: int) -> int:
+    return count * (sum(_ITEMSIZE[code] for _, code in NUMERIC_COLUMNS) + _ITEMSIZE["I"] * len(STRING_COLUMNS))
+
+
+class SpinEventLog:
+    """Non-blocking sink for spin events.
+
+    `emit` only enqueues; a writer thread encodes up to `flush_records` events
+    (or whatever arrived within `flush_seconds`) into one chunk and appends it,
+    starting a new file once the current one reaches `max_bytes`. At most
+    `keep_files` files are kept.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        max_bytes: int = 64 * 1024 * 1024,
+        keep_files: int = 200,
+        flush_records: int = 4096,
+        flush_seconds: float = 1.0,
+        file_tag: str = "",
+    ) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.keep_files = keep_files
+        self.flush_records = flush_records
+        self.flush_seconds = flush_seconds
+        # Distinguishes the files of concurrent writers (one per bot worker) in one directory.
+        self.file_tag = file_tag
+        self._queue: queue.Queue[Optional[SpinEvent]] = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._sequence = 0
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._writer, name="spin-event-writer", daemon=True)
+        self._thread.start()
+
+    def emit(self, event: SpinEvent) -> None:
+        self._queue.put(event)
+
+    def close(self) -> None:
+        """Write everything queued and stop the writer; blocking."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open_next(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._sequence += 1
+        name = f"spins-{self.file_tag}{time.strftime('%Y%m%d-%H%M%S')}-{self._sequence:04d}.bin"
+        self._file = (self.directory / name).open("ab")
+        files = sorted(self.directory.glob(f"spins-{self.file_tag}*.bin")) if self.file_tag else log_files(self.directory)
+        for old in files[: max(0, len(files) - self.keep_files)]:
+            old.unlink(missing_ok=True)
+
+    def _write(self, events: list[SpinEvent]) -> None:
+        if self._file is None or self._file.tell() >= self.max_bytes:
+            self._open_next()
+        self._file.write(encode_chunk(events))
+        self._file.flush()
+
+    def _writer(self) -> None:
+        running = True
+        while running:
+            batch: list[SpinEvent] = []
+            event = self._queue.get()
+            deadline = time.monotonic() + self.flush_seconds
+            while event is not None:
+                batch.append(event)
+                if len(batch) >= self.flush_records:
+                    break
+                try:
+                    event = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            running = event is not None
+            if batch:
+                try:
+                    self._write(batch)
+                except OSError:
+                    logging.exception("spin event log: dropped %s events", len(batch))
+
+
+def log_files(directory: Path) -> list[Path]:
+    return sorted(directory.glob("spins-*.bin"))
+
+
+def iter_chunks(paths: Iterable[Path]) -> Iterator[tuple[list[str], dict[str, "np.ndarray"]]]:
+    """Yield (dictionary, columns) per chunk; string columns hold indices into the dictionary."""
+    import numpy as np
+
+    for path in paths:
+        if path.stat().st_size == 0:
+            continue
+        with path.open("rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                offset = 0
+                while offset + _HEADER.size <= len(data):
+                    magic, version, count, dict_len = _HEADER.unpack_from(data, offset)
+                    if magic != MAGIC or version != FORMAT_VERSION:
+                        logging.warning("spin event log: bad chunk header in %s at %s", path, offset)
+                        break
+                    start = offset + _HEADER.size
+                    end = start + dict_len + _chunk_body_size(count)
+                    if end > len(data):
+                        logging.warning("spin event log: truncated chunk in %s at %s", path, offset)
+                        break
+                    dictionary = json.loads(bytes(data[start : start + dict_len]).decode("utf-8"))
+                    columns: dict[str, np.ndarray] = {}
+                    position = start + dict_len
+                    for name, code in [*NUMERIC_COLUMNS, *((name, "I") for name in STRING_COLUMNS)]:
+                        # Copy out of the map so the arrays outlive it.
+                        columns[name] = np.frombuffer(data, dtype=_NUMPY_TYPES[code], count=count, offset=position).copy()
+                        position += count * _ITEMSIZE[code]
+                    yield dictionary, columns
+                    offset = end
+
+
+@dataclass
+class SpinAggregate:
+    spins: int = 0
+    by_item: Counter = field(default_factory=Counter)
+    by_chat: Counter = field(default_factory=Counter)
+    by_season: Counter = field(default_factory=Counter)
+    by_user: Counter = field(default_factory=Counter)
+
+
+def aggregate(paths: Iterable[Path], since: Optional[float] = None) -> SpinAggregate:
+    """Drop counts per item, chat, season and user, one vectorized pass per chunk."""
+    import numpy as np
+
+    result = SpinAggregate()
+    for dictionary, columns in iter_chunks(paths):
+        if since is not None:
+            keep = columns["ts"] >= since
+            columns = {name: values[keep] for name, values in columns.items()}
+        if not len(columns["ts"]):
+            continue
+        result.spins += len(columns["ts"])
+        for column, counter in (("item_id", result.by_item), ("commit", result.by_season)):
+            counts = np.bincount(columns[column], minlength=len(dictionary))
+            for code in np.flatnonzero(counts):
+                counter[dictionary[code]] += int(counts[code])
+        for column, counter in (("chat_id", result.by_chat), ("user_id", result.by_user)):
+            keys, counts = np.unique(columns[column], return_counts=True)
+            counter.update(dict(zip(keys.tolist(), counts.tolist())))
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", type=Path, nargs="?", default=Path(__file__).resolve().parent / "logs" / "spins")
+    parser.add_argument("--by", choices=GROUPINGS, default="item")
+    parser.add_argument("--top", type=int, default=50)
+    parser.add_argument("--since-hours", type=float, help="only spins from the last N hours")
+    args = parser.parse_args()
+
+    since = time.time() - args.since_hours * 3600 if args.since_hours is not None else None
+    started = time.perf_counter()
+    result = aggregate(log_files(args.directory), since)
+    elapsed = time.perf_counter() - started
+    counter = {"item": result.by_item, "chat": result.by_chat, "season": result.by_season, "user": result.by_user}[args.by]
+
+    print(f"spins: {result.spins:,} ({elapsed:.2f}s, {result.spins / max(elapsed, 1e-9):,.0f} spins/s)")
+    for key, count in counter.most_common(args.top):
+        share = count / result.spins * 100 if result.spins else 0.0
+        print(f"{str(key):>40} {count:>12,} {share:>9.4f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import math
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+from loot_table import LootTable
+
+STATS_VERSION = 1
+TOP_K = 10
+
+
+@dataclass(frozen=True, order=True)
+class Pull:
+    """One drop, ranked by rarity score; among equal scores the earlier pull ranks higher."""
+
+    score: float
+    neg_ts: float
+    user_id: int
+    nonce: int
+    chat_id: int = field(compare=False)
+    item_id: str = field(compare=False)
+
+    @property
+    def ts(self) -> float:
+        return -self.neg_ts
+
+    def to_json(self) -> list:
+        return [self.score, self.ts, self.user_id, self.nonce, self.chat_id, self.item_id]
+
+    @classmethod
+    def from_json(cls, raw: list) -> "Pull":
+        score, ts, user_id, nonce, chat_id, item_id = raw
+        return cls(float(score), -float(ts), int(user_id), int(nonce), int(chat_id), str(item_id))
+
+
+@dataclass
+class UserStats:
+    spins: int = 0
+    score_sum: float = 0.0
+    items: dict[str, int] = field(default_factory=dict)
+    best: Optional[Pull] = None
+    # Last seen username or first name, for leaderboards.
+    name: str = ""
+
+
+@dataclass
+class ChatStats:
+    """Counts of one chat and a min-heap of its `TOP_K` rarest pulls (`top[0]` is the weakest)."""
+
+    spins: int = 0
+    items: dict[str, int] = field(default_factory=dict)
+    top: list[Pull] = field(default_factory=list)
+
+
+class _SavedRows:
+    """JSON rows of the saved file, merged from `snapshot` deltas by the writer thread.
+
+    Every row carries the sequence number of the snapshot it came from, so a
+    delta encoded late never overwrites a newer row.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.users: dict[str, tuple[int, list]] = {}
+        self.chats: dict[str, tuple[int, list]] = {}
+        self.top: tuple[int, list] = (0, [])
+
+
+def _push_top(heap: list[Pull], pull: Pull, k: int) -> None:
+    if len(heap) < k:
+        heapq.heappush(heap, pull)
+    elif pull > heap[0]:
+        heapq.heapreplace(heap, pull)
+
+
+def _user_row(user: UserStats) -> list:
+    return [user.spins, user.score_sum, dict(user.items), user.best.to_json() if user.best else None, user.name]
+
+
+def _chat_row(chat: ChatStats) -> list:
+    return [chat.spins, dict(chat.items), [pull.to_json() for pull in chat.top]]
+
+
+class SpinStats:
+    """Per-user and per-chat drop counts plus top-K rarest pulls, updated on every spin.
+
+    Rarity is the surprise of a drop, `-log2(weight / sum_weights)` bits of the
+    loot table it was drawn from; a pull keeps the score it had when it happened.
+    `bind` switches to a reloaded table: counts and pulls of item ids that are
+    still in it survive, the others are dropped. Queries touch one user or chat
+    entry and at most `top_k` pulls, never the spin history. Saving copies only
+    the users and chats changed since the previous `snapshot`.
+    """
+
+    def __init__(self, top_k: int = TOP_K) -> None:
+        self.top_k = top_k
+        self.users: dict[int, UserStats] = {}
+        self.chats: dict[int, ChatStats] = {}
+        self.top: list[Pull] = []
+        self.rarity: dict[str, float] = {}
+        self.names: dict[str, str] = {}
+        # Mean rarity of a spin of the bound table (its entropy in bits); above it is luck.
+        self.expected_score = 0.0
+        self._dirty_users: set[int] = set()
+        self._dirty_chats: set[int] = set()
+        self._seq = 0
+        self._saved = _SavedRows()
+
+    def bind(self, loot_table: LootTable) -> int:
+        """Score spins with this table; returns how many item counts and pulls were dropped."""
+        total = loot_table.sum_weights
+        self.rarity = {item.item_id: -math.log2(item.weight / total) for item in loot_table.items if item.weight > 0}
+        self.names = {item.item_id: item.name for item in loot_table.items}
+        self.expected_score = sum(item.weight / total * self.rarity[item.item_id] for item in loot_table.items if item.weight > 0)
+
+        dropped = 0
+        for entries, dirty in ((self.users, self._dirty_users), (self.chats, self._dirty_chats)):
+            for key, entry in entries.items():
+                stale = [item_id for item_id in entry.items if item_id not in self.names]
+                for item_id in stale:
+                    del entry.items[item_id]
+                if stale:
+                    dropped += len(stale)
+                    dirty.add(key)
+        for user_id, user in self.users.items():
+            if user.best is not None and user.best.item_id not in self.names:
+                user.best = None
+                dropped += 1
+                self._dirty_users.add(user_id)
+        for chat_id, heap in [(None, self.top), *((chat_id, chat.top) for chat_id, chat in self.chats.items())]:
+            kept = [pull for pull in heap if pull.item_id in self.names]
+            if len(kept) != len(heap):
+                dropped += len(heap) - len(kept)
+                heap[:] = kept
+                heapq.heapify(heap)
+                if chat_id is not None:
+                    self._dirty_chats.add(chat_id)
+        if dropped:
+            logging.info("spin_stats | dropped %s entries of removed items", dropped)
+        return dropped
+
+    def record(self, chat_id: int, user_id: int, pulls: Iterable[tuple[int, str]], ts: float, user_name: str = "") -> None:
+        """Count (nonce, item_id) drops of one spin message; O(1) per drop plus O(log K) for the heaps."""
+        user = self.users.get(user_id)
+        if user is None:
+            user = self.users[user_id] = UserStats()
+        if user_name:
+            user.name = user_name
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            chat = self.chats[chat_id] = ChatStats()
+        self._dirty_users.add(user_id)
+        self._dirty_chats.add(chat_id)
+        for nonce, item_id in pulls:
+            score = self.rarity.get(item_id, 0.0)
+            pull = Pull(score, -ts, user_id, nonce, chat_id, item_id)
+            user.spins += 1
+            user.score_sum += score
+            user.items[item_id] = user.items.get(item_id, 0) + 1
+            if user.best is None or pull > user.best:
+                user.best = pull
+            chat.spins += 1
+            chat.items[item_id] = chat.items.get(item_id, 0) + 1
+            _push_top(chat.top, pull, self.top_k)
+            _push_top(self.top, pull, self.top_k)
+
+    def leaders(self, chat_id: Optional[int] = None) -> list[Pull]:
+        """Rarest pulls of a chat (or of all chats), rarest first; O(K log K)."""
+        heap = self.top if chat_id is None else self.chats.get(chat_id, ChatStats()).top
+        return sorted(heap, reverse=True)
+
+    def luck(self, user: UserStats) -> float:
+        """Mean rarity of the user's drops minus that of an average spin, in bits."""
+        return user.score_sum / user.spins - self.expected_score if user.spins else 0.0
+
+    def item_name(self, item_id: str) -> str:
+        return self.names.get(item_id, item_id)
+
+    def user_name(self, user_id: int) -> str:
+        user = self.users.get(user_id)
+        return user.name if user is not None and user.name else f"id{user_id}"
+
+    def snapshot(self) -> dict:
+        """Rows of the users and chats changed since the last call, taken on the event loop; `encode` it off the loop."""
+        self._seq += 1
+        delta = {
+            "seq": self._seq,
+            "users": {str(user_id): _user_row(self.users[user_id]) for user_id in self._dirty_users},
+            "chats": {str(chat_id): _chat_row(self.chats[chat_id]) for chat_id in self._dirty_chats},
+            "top": [pull.to_json() for pull in self.top],
+        }
+        self._dirty_users = set()
+        self._dirty_chats = set()
+        return delta
+
+    def encode(self, delta: dict) -> str:
+        """Merge a `snapshot` delta into the saved rows and serialize them; safe from any thread."""
+        saved = self._saved
+        seq = delta["seq"]
+        with saved.lock:
+            for rows, changed in ((saved.users, delta["users"]), (saved.chats, delta["chats"])):
+                for key, row in changed.items():
+                    if rows.get(key, (0, None))[0] < seq:
+                        rows[key] = (seq, row)
+            if saved.top[0] < seq:
+                saved.top = (seq, delta["top"])
+            return json.dumps(
+                {
+                    "version": STATS_VERSION,
+                    "users": {key: row for key, (_, row) in saved.users.items()},
+                    "chats": {key: row for key, (_, row) in saved.chats.items()},
+                    "top": saved.top[1],
+                },
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+
+    @classmethod
+    def load(cls, path: Path, top_k: int = TOP_K) -> "SpinStats":
+        """Read an `encode`d snapshot; a missing, invalid or older-version file starts empty."""
+        stats = cls(top_k)
+        if not path.exists():
+            return stats
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("version") != STATS_VERSION:
+                logging.warning("spin stats %s has version %s, starting empty", path, data.get("version"))
+                return stats
+            for user_id, (spins, score_sum, items, best, name) in data["users"].items():
+                stats.users[int(user_id)] = UserStats(
+                    int(spins),
+                    float(score_sum),
+                    {str(k): int(v) for k, v in items.items()},
+                    Pull.from_json(best) if best else None,
+                    str(name),
+                )
+            for chat_id, (spins, items, top) in data["chats"].items():
+                heap = [Pull.from_json(raw) for raw in top]
+                heapq.heapify(heap)
+                stats.chats[int(chat_id)] = ChatStats(int(spins), {str(k): int(v) for k, v in items.items()}, heap)
+            stats.top = [Pull.from_json(raw) for raw in data["top"]]
+            heapq.heapify(stats.top)
+            # The file as read is the baseline later deltas are merged into.
+            stats._saved.users = {key: (0, row) for key, row in data["users"].items()}
+            stats._saved.chats = {key: (0, row) for key, row in data["chats"].items()}
+            stats._saved.top = (0, data["top"])
+        except (json.JSONDecodeError, AttributeError, KeyError, TypeError, ValueError) as exc:
+            logging.warning("spin stats %s is invalid, starting empty: %s", path, exc)
+            return cls(top_k)
+        logging.info("Loaded spin stats: %s users, %s chats", len(stats.users), len(stats.chats))
+        return stats
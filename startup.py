@@ -0,0 +1,112 @@
+"""Startup timing: per-stage wall time in the bot, and a per-package summary of `-X importtime`.
+
+    python startup.py                # import cost of bot.py, grouped by top-level package
+    python startup.py --module verifier --top 15
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterator
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+class StartupTimer:
+    """Wall time of named startup stages, measured from `origin` (perf_counter seconds).
+
+    Stages may run concurrently in threads; each is recorded as (start, end)
+    relative to the origin, so the report shows what overlapped.
+    """
+
+    def __init__(self, origin: float | None = None) -> None:
+        self.origin = time.perf_counter() if origin is None else origin
+        self.stages: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, started: float, finished: float | None = None) -> None:
+        finished = time.perf_counter() if finished is None else finished
+        with self._lock:
+            self.stages[name] = (started - self.origin, finished - self.origin)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started)
+
+    def mark(self, name: str) -> None:
+        """Record a point in time, e.g. when the bot starts answering."""
+        now = time.perf_counter()
+        self.record(name, now, now)
+
+    def report(self) -> str:
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda entry: entry[1])
+        return " | ".join(
+            f"{name}={end * 1000:.0f}ms" if start == end else f"{name}={(end - start) * 1000:.0f}ms@{start * 1000:.0f}"
+            for name, (start, end) in stages
+        )
+
+    def log(self, label: str) -> None:
+        logging.info("startup | %s | %s", label, self.report())
+
+
+def summarize_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    """Top-level package -> (self µs summed over its modules, cumulative µs of its outermost imports)."""
+    lines = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            # One space after "|", then two per nesting level.
+            depth = (len(match[3]) - 1) // 2
+            lines.append((match[4].split(".")[0], int(match[1]), int(match[2]), depth))
+
+    self_us: dict[str, int] = defaultdict(int)
+    outermost: dict[str, int] = {}
+    for package, own, _, depth in lines:
+        self_us[package] += own
+        outermost[package] = min(depth, outermost.get(package, depth))
+    cumulative_us: dict[str, int] = defaultdict(int)
+    for package, _, cumulative, depth in lines:
+        if depth == outermost[package]:
+            cumulative_us[package] += cumulative
+    return {package: (self_us[package], cumulative_us[package]) for package in self_us}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="bot", help="module to import (default: bot)")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {args.module}"],
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1] if result.stderr else "import failed", file=sys.stderr)
+        raise SystemExit(result.returncode)
+
+    packages = summarize_importtime(result.stderr)
+    total_self = sum(own for own, _ in packages.values())
+    print(f"import {args.module}: {total_self / 1000:.1f} ms in module bodies, {wall * 1000:.0f} ms wall incl. interpreter start")
+    print(f"{'package':<28}{'self ms':>10}{'outermost cumulative ms':>24}")
+    for package, (own, cumulative) in sorted(packages.items(), key=lambda entry: -entry[1][0])[: args.top]:
+        print(f"{package:<28}{own / 1000:>10.1f}{cumulative / 1000:>24.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Optional
+from urllib.parse import urlparse
+
+from cooldowns import BoundedNonceMap, CooldownWheel, log_map_stats
+from fairness import FairnessEngine
+from state_store import StateStore
+
+
+class LocalBackend:
+    """Cooldowns and nonces in this process; enough for a single bot worker.
+
+    Each call finishes its bookkeeping without an `await` in between, so it is
+    atomic on the event loop. Nonces persisted in the state store are fetched
+    on a cache miss.
+    """
+
+    def __init__(self, store: StateStore, fairness: FairnessEngine, cooldowns: CooldownWheel) -> None:
+        self.store = store
+        self.fairness = fairness
+        self.cooldowns = cooldowns
+        self._season_generation = 0
+
+    async def take_cooldown(self, user_id: int, now: float, seconds: float) -> float:
+        return self.cooldowns.take(user_id, now, seconds)
+
+    async def _ensure_nonce_cached(self, user_id: int) -> None:
+        if user_id in self.fairness.user_nonces:
+            return
+        nonce = await self.store.fetch_nonce(user_id)
+        if user_id not in self.fairness.user_nonces:
+            self.fairness.user_nonces[user_id] = nonce
+
+    async def next_nonces(self, user_id: int, count: int) -> tuple[int, int]:
+        """First of `count` consecutive nonces reserved for the user, and the current season generation."""
+        await self._ensure_nonce_cached(user_id)
+        return self.fairness.reserve_nonces(user_id, count), self._season_generation
+
+    async def current_nonce(self, user_id: int) -> int:
+        await self._ensure_nonce_cached(user_id)
+        return self.fairness.current_nonce(user_id)
+
+    async def season_generation(self) -> int:
+        return self._season_generation
+
+    async def bump_season_generation(self) -> int:
+        self._season_generation += 1
+        return self._season_generation
+
+    def maintain(self, now: float) -> None:
+        self.cooldowns.sweep(now)
+        log_map_stats(self.cooldowns, self.fairness.user_nonces)
+
+    def stats(self) -> dict[str, int]:
+        return {"cooldowns": len(self.cooldowns), "nonces": len(self.fairness.user_nonces)}
+
+    async def close(self) -> None:
+        pass
+
+
+class RespError(Exception):
+    pass
+
+
+class RespClient:
+    """Pipelined RESP2 client on one connection.
+
+    A command is written immediately and its future queued; one reader task
+    resolves the futures in reply order, so concurrent callers need no lock.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._pending: deque[asyncio.Future] = deque()
+        self._reader_task = asyncio.get_running_loop().create_task(self._read_replies())
+
+    @classmethod
+    async def connect(cls, host: str, port: int) -> "RespClient":
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    @property
+    def closed(self) -> bool:
+        return self._reader_task.done()
+
+    def command(self, *args: object) -> asyncio.Future:
+        if self.closed:
+            raise ConnectionError("RESP connection is closed")
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(future)
+        self._writer.write(b"".join(parts))
+        return future
+
+    async def _read_reply(self) -> object:
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("RESP server closed the connection")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode("utf-8")
+        if kind == b"-":
+            return RespError(body.decode("utf-8"))
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            return None if size < 0 else (await self._reader.readexactly(size + 2))[:-2]
+        if kind == b"*":
+            size = int(body)
+            return None if size < 0 else [await self._read_reply() for _ in range(size)]
+        raise ConnectionError(f"unexpected RESP reply {line!r}")
+
+    async def _read_replies(self) -> None:
+        error: BaseException = ConnectionError("RESP connection closed")
+        try:
+            while True:
+                reply = await self._read_reply()
+                future = self._pending.popleft()
+                if future.done():
+                    continue
+                if isinstance(reply, RespError):
+                    future.set_exception(reply)
+                else:
+                    future.set_result(reply)
+        except (ConnectionError, asyncio.IncompleteReadError, IndexError) as exc:
+            error = exc
+        finally:
+            while self._pending:
+                future = self._pending.popleft()
+                if not future.done():
+                    future.set_exception(ConnectionError(str(error)))
+
+    async def close(self) -> None:
+        self._writer.close()
+        self._reader_task.cancel()
+
+
+class RespBackend:
+    """Cooldowns, nonces and the season generation in a Redis-compatible server shared by all workers.
+
+    `SET cooldown NX PX` and `INCR nonce` make the cooldown check and the nonce
+    increment atomic across processes. A user's counter is seeded from the
+    state store (`SET NX`) the first time this worker sees them, so a fresh
+    server never hands out a nonce that was already used. The worker also
+    remembers the last nonce it reserved per user: if a reservation comes back
+    below it, the server restarted or evicted the key, and the counter is
+    lifted past every nonce used so far before reserving again.
+    """
+
+    def __init__(self, url: str, store: StateStore, prefix: str = "roulette:", seeded_capacity: int = 100_000) -> None:
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.store = store
+        self.prefix = prefix
+        self._seeded = BoundedNonceMap(seeded_capacity)
+        self._client: Optional[RespClient] = None
+
+    async def _conn(self) -> RespClient:
+        if self._client is None or self._client.closed:
+            client = await RespClient.connect(self.host, self.port)
+            if self._client is not None and not self._client.closed:
+                # Another caller reconnected while this one was connecting.
+                await client.close()
+            else:
+                self._client = client
+        return self._client
+
+    def _key(self, kind: str, user_id: int) -> str:
+        return f"{self.prefix}{kind}:{user_id}"
+
+    async def take_cooldown(self, user_id: int, now: float, seconds: float) -> float:
+        client = await self._conn()
+        key = self._key("cooldown", user_id)
+        for _ in range(2):
+            millis = int(seconds * 1000)
+            if millis > 0 and await client.command("SET", key, 1, "PX", millis, "NX") == "OK":
+                return 0.0
+            left_ms = await client.command("PTTL", key)
+            if left_ms > 0:
+                return left_ms / 1000
+            if millis <= 0:
+                return 0.0
+            # The running cooldown expired between SET and PTTL; try once more.
+        return 0.0
+
+    async def _seed(self, client: RespClient, user_id: int) -> None:
+        if user_id in self._seeded:
+            return
+        stored = await self.store.fetch_nonce(user_id)
+        await client.command("SET", self._key("nonce", user_id), stored, "NX")
+        self._seeded[user_id] = stored
+
+    async def next_nonces(self, user_id: int, count: int) -> tuple[int, int]:
+        """`INCRBY count` reserves the whole range atomically; returns its first nonce."""
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        client = await self._conn()
+        await self._seed(client, user_id)
+        key = self._key("nonce", user_id)
+        generation = client.command("GET", f"{self.prefix}season_generation")
+        last = await client.command("INCRBY", key, count)
+        floor = self._seeded.get(user_id, 0)
+        if last - count < floor:
+            # Another worker lifting the same counter concurrently only leaves a gap.
+            floor = max(floor, await self.store.fetch_nonce(user_id))
+            logging.warning("state_backend | nonce counter reset | user=%s | got=%s | lifted_to=%s", user_id, last, floor)
+            if last < floor:
+                await client.command("INCRBY", key, floor - last)
+            last = await client.command("INCRBY", key, count)
+        self._seeded[user_id] = last
+        return last - count + 1, int(await generation or 0)
+
+    async def current_nonce(self, user_id: int) -> int:
+        client = await self._conn()
+        await self._seed(client, user_id)
+        current = int(await client.command("GET", self._key("nonce", user_id)) or 0)
+        return max(current, self._seeded.get(user_id, 0))
+
+    async def season_generation(self) -> int:
+        client = await self._conn()
+        return int(await client.command("GET", f"{self.prefix}season_generation") or 0)
+
+    async def bump_season_generation(self) -> int:
+        client = await self._conn()
+        return await client.command("INCR", f"{self.prefix}season_generation")
+
+    def maintain(self, now: float) -> None:
+        logging.info("state_backend | kind=resp | seeded_users=%s", len(self._seeded))
+
+    def stats(self) -> dict[str, int]:
+        return {"seeded_users": len(self._seeded), "pending_commands": len(self._client._pending) if self._client else 0}
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+
+
+def make_backend(
+    url: Optional[str],
+    store: StateStore,
+    fairness: FairnessEngine,
+    cooldowns: CooldownWheel,
+) -> LocalBackend | RespBackend:
+    """`redis://host:port` selects the shared backend; empty keeps everything in this process."""
+    if not url:
+        return LocalBackend(store, fairness, cooldowns)
+    if urlparse(url).scheme not in ("redis", "resp"):
+        raise ValueError(f"unsupported state backend url: {url}")
+    return RespBackend(url, store)
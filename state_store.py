@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from fairness import FairnessSeason
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seasons (
+    season_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    server_seed TEXT NOT NULL,
+    commit_hash TEXT NOT NULL UNIQUE,
+    started_at REAL NOT NULL,
+    revealed_at REAL
+);
+CREATE TABLE IF NOT EXISTS nonces (
+    user_id INTEGER PRIMARY KEY,
+    nonce INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cooldowns (
+    user_id INTEGER PRIMARY KEY,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS loot_tables (
+    table_hash TEXT PRIMARY KEY,
+    manifest TEXT NOT NULL,
+    first_seen REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS spins (
+    commit_hash TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    nonce INTEGER NOT NULL,
+    client_seed TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    table_hash TEXT NOT NULL,
+    sampler TEXT NOT NULL,
+    spun_at REAL NOT NULL,
+    PRIMARY KEY (commit_hash, user_id, nonce)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_NONCE = (
+    "INSERT INTO nonces (user_id, nonce) VALUES (?, ?) "
+    "ON CONFLICT(user_id) DO UPDATE SET nonce = excluded.nonce WHERE excluded.nonce > nonces.nonce"
+)
+_UPSERT_COOLDOWN = (
+    "INSERT INTO cooldowns (user_id, expires_at) VALUES (?, ?) "
+    "ON CONFLICT(user_id) DO UPDATE SET expires_at = excluded.expires_at"
+)
+_INSERT_SEASON = "INSERT OR IGNORE INTO seasons (server_seed, commit_hash, started_at) VALUES (?, ?, ?)"
+_REVEAL_SEASON = "UPDATE seasons SET revealed_at = ? WHERE commit_hash = ? AND revealed_at IS NULL"
+_INSERT_LOOT_TABLE = "INSERT OR IGNORE INTO loot_tables (table_hash, manifest, first_seen) VALUES (?, ?, ?)"
+_INSERT_SPIN = (
+    "INSERT OR IGNORE INTO spins (commit_hash, user_id, nonce, client_seed, item_id, table_hash, sampler, spun_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+@dataclass(frozen=True)
+class SpinRecord:
+    """Everything needed to recompute one spin once its season's server seed is revealed."""
+
+    commit: str
+    user_id: int
+    nonce: int
+    client_seed: str
+    item_id: str
+    table_hash: str
+    sampler: str
+    spun_at: float
+
+
+@dataclass
+class StoredState:
+    season: Optional[FairnessSeason]
+    cooldowns: dict[int, float] = field(default_factory=dict)
+
+
+class _Barrier:
+    """Resolves an event-loop future from the writer thread once its batch is committed.
+
+    With `query` set, the query runs after the commit and its first column is the result.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, query: Optional[tuple[str, tuple[Any, ...]]] = None) -> None:
+        self.loop = loop
+        self.query = query
+        self.future: asyncio.Future = loop.create_future()
+
+    def resolve(self, result: Any, error: Optional[BaseException]) -> None:
+        def _set() -> None:
+            if self.future.done():
+                return
+            if error is None:
+                self.future.set_result(result)
+            else:
+                self.future.set_exception(error)
+
+        self.loop.call_soon_threadsafe(_set)
+
+
+class StateStore:
+    """SQLite (WAL) store for seasons, per-user nonces and cooldowns.
+
+    Writes are queued and applied by one writer thread, many per transaction
+    (group commit). `barrier()` resolves once everything queued before it is
+    committed, so a caller can make a nonce durable before revealing its outcome
+    without paying one fsync per spin. `synchronous=FULL` fsyncs every commit,
+    so that holds across an OS crash or power loss too. Seeds are stored in
+    plain text: keep the database file private (it is git-ignored).
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path.as_posix(), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(SCHEMA)
+        self._queue: queue.Queue[Optional[tuple[str, tuple[Any, ...]] | _Barrier]] = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def load(self, now: float) -> StoredState:
+        """Read the open season and the cooldowns still running; call before `start`.
+
+        Nonces are not preloaded: `fetch_nonce` reads them on demand, so startup
+        cost does not grow with the number of users.
+        """
+        conn = self._conn
+        conn.execute("DELETE FROM cooldowns WHERE expires_at <= ?", (now,))
+        season = open_season(conn)
+        cooldowns = dict(conn.execute("SELECT user_id, expires_at FROM cooldowns"))
+        logging.info("State store loaded: %s active cooldowns", len(cooldowns))
+        return StoredState(season=season, cooldowns=cooldowns)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._writer, name="state-store-writer", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Drain pending writes and stop the writer; blocking."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        else:
+            self._apply(self._drain_nowait([]))
+        self._conn.close()
+
+    def record_spins(self, spins: list[SpinRecord], cooldown_expires_at: float) -> None:
+        """Spins of one user from one reserved nonce range: one nonce and cooldown write for all of them."""
+        if not spins:
+            return
+        user_id = spins[0].user_id
+        self._queue.put((_UPSERT_NONCE, (user_id, max(spin.nonce for spin in spins))))
+        self._queue.put((_UPSERT_COOLDOWN, (user_id, cooldown_expires_at)))
+        for spin in spins:
+            self._queue.put(
+                (
+                    _INSERT_SPIN,
+                    (
+                        spin.commit,
+                        spin.user_id,
+                        spin.nonce,
+                        spin.client_seed,
+                        spin.item_id,
+                        spin.table_hash,
+                        spin.sampler,
+                        spin.spun_at,
+                    ),
+                )
+            )
+
+    def record_loot_table(self, table_hash: str, manifest: list[list], seen_at: float) -> None:
+        """Keep the weights a spin was drawn from, so it stays verifiable after a /reload."""
+        self._queue.put((_INSERT_LOOT_TABLE, (table_hash, json.dumps(manifest, ensure_ascii=False), seen_at)))
+
+    def record_season_start(self, season: FairnessSeason, started_at: float) -> None:
+        self._queue.put((_INSERT_SEASON, (season.server_seed, season.commit, started_at)))
+
+    def record_season_reveal(self, season: FairnessSeason, revealed_at: float) -> None:
+        self._queue.put((_REVEAL_SEASON, (revealed_at, season.commit)))
+
+    async def barrier(self) -> None:
+        """Wait until every write queued so far is committed."""
+        barrier = _Barrier(asyncio.get_running_loop())
+        self._queue.put(barrier)
+        await barrier.future
+
+    async def fetch_nonce(self, user_id: int) -> int:
+        """Last persisted nonce of a user (0 if none), read after every write queued before the call."""
+        barrier = _Barrier(asyncio.get_running_loop(), ("SELECT nonce FROM nonces WHERE user_id = ?", (user_id,)))
+        self._queue.put(barrier)
+        return await barrier.future or 0
+
+    def _drain_nowait(self, batch: list) -> list:
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _apply(self, batch: list) -> bool:
+        """Commit one batch; return False once the stop sentinel was seen."""
+        statements = [entry for entry in batch if isinstance(entry, tuple)]
+        barriers = [entry for entry in batch if isinstance(entry, _Barrier)]
+        error: Optional[BaseException] = None
+        if statements:
+            try:
+                self._conn.execute("BEGIN")
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as exc:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                logging.exception("state store batch of %s writes failed", len(statements))
+                error = exc
+        for barrier in barriers:
+            result = None
+            if barrier.query is not None and error is None:
+                try:
+                    row = self._conn.execute(*barrier.query).fetchone()
+                    result = row[0] if row else None
+                except sqlite3.Error as exc:
+                    barrier.resolve(None, exc)
+                    continue
+            barrier.resolve(result, error)
+        return None not in batch
+
+    def _writer(self) -> None:
+        running = True
+        while running:
+            batch = self._drain_nowait([self._queue.get()])
+            running = self._apply(batch)
+
+
+def open_reader(path: Path) -> sqlite3.Connection:
+    """Read-only connection for audits; under WAL it never blocks (or is blocked by) the writer thread."""
+    return sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+
+
+def open_season(conn: sqlite3.Connection) -> Optional[FairnessSeason]:
+    """The newest season that has not been revealed yet."""
+    row = conn.execute(
+        "SELECT server_seed, commit_hash FROM seasons WHERE revealed_at IS NULL ORDER BY season_id DESC LIMIT 1"
+    ).fetchone()
+    return FairnessSeason(server_seed=row[0], commit=row[1]) if row else None
+
+
+def read_open_season(path: Path) -> Optional[FairnessSeason]:
+    """`open_season` through a short-lived reader, e.g. after another process rotated the seed; blocking."""
+    conn = open_reader(path)
+    try:
+        return open_season(conn)
+    finally:
+        conn.close()
+
+
+def revealed_seasons(conn: sqlite3.Connection, commit_prefix: str = "") -> list[FairnessSeason]:
+    """Revealed seasons, newest first, optionally narrowed to commits starting with `commit_prefix`."""
+    rows = conn.execute(
+        "SELECT server_seed, commit_hash FROM seasons WHERE revealed_at IS NOT NULL AND commit_hash LIKE ? "
+        "ORDER BY season_id DESC",
+        (f"{commit_prefix}%",),
+    )
+    return [FairnessSeason(server_seed=seed, commit=commit) for seed, commit in rows]
+
+
+def iter_spins(conn: sqlite3.Connection, commit: str, user_id: Optional[int] = None) -> Iterator[SpinRecord]:
+    sql = (
+        "SELECT commit_hash, user_id, nonce, client_seed, item_id, table_hash, sampler, spun_at "
+        "FROM spins WHERE commit_hash = ?"
+    )
+    params: tuple[Any, ...] = (commit,)
+    if user_id is not None:
+        sql += " AND user_id = ?"
+        params += (user_id,)
+    for row in conn.execute(sql, params):
+        yield SpinRecord(*row)
+
+
+def load_manifests(conn: sqlite3.Connection, table_hashes: set[str]) -> dict[str, list[list]]:
+    manifests: dict[str, list[list]] = {}
+    for table_hash in table_hashes:
+        row = conn.execute("SELECT manifest FROM loot_tables WHERE table_hash = ?", (table_hash,)).fetchone()
+        if row:
+            manifests[table_hash] = json.loads(row[0])
+    return manifests
@@ -0,0 +1,163 @@
+"""The r -> item mapping is a public commitment: these vectors must never change."""
+from __future__ import annotations
+
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from fairness import FairnessEngine, FairnessSeason
+from loot_table import (
+    SAMPLER_ALIAS,
+    SAMPLER_PREFIX,
+    SAMPLERS,
+    compile_loot_table,
+    load_compiled_table,
+    manifest_fingerprint,
+    table_from_manifest,
+    table_manifest,
+)
+
+MANIFEST = [
+    ["common", "Common", 60.0],
+    ["uncommon", "Uncommon", 25.0],
+    ["rare", "Rare", 10.0],
+    ["epic", "Epic", 4.0],
+    ["legendary", "Legendary", 1.0],
+]
+SERVER_SEED = "test-server-seed"
+CLIENT_SEED = "-100:42:7"
+# nonce, first 16 hex digits of HMAC-SHA256(server_seed, "client_seed:nonce"), r, alias pick, prefix pick
+VECTORS = [
+    (1, "59703eed85f27edc", 0.34936898516566295, "common", "common"),
+    (2, "598f615c82d7a268", 0.34984406002590035, "common", "common"),
+    (3, "77342b68c4ec0747", 0.4656397944244618, "rare", "common"),
+    (4, "25bfac32f8867e05", 0.14745594257740355, "common", "common"),
+    (5, "a2ed34e336bc9806", 0.6364319853516797, "epic", "uncommon"),
+    (6, "6cf9a954c806db03", 0.4256845314012269, "rare", "common"),
+    (7, "ecac768a97b798fe", 0.9245065773354483, "uncommon", "rare"),
+    (8, "3e271279bf6840fe", 0.2427836940036352, "uncommon", "common"),
+    (9, "cfdf23aa71cf3184", 0.811998585808223, "uncommon", "uncommon"),
+    (10, "f8fa09f4c9072ef1", 0.972565290700939, "uncommon", "epic"),
+    (11, "ac9434fc745e03bb", 0.6741364590019359, "common", "uncommon"),
+    (12, "479d924eb45a3419", 0.2797481004857694, "common", "common"),
+]
+
+
+@pytest.fixture
+def table():
+    return table_from_manifest(MANIFEST)
+
+
+def edge_rs(table) -> np.ndarray:
+    """Random r plus the values where either mapping switches items."""
+    n = len(table.items)
+    edges = [0.0, np.nextafter(1.0, 0.0)]
+    prefix_edges = [total / table.sum_weights for total in table.prefix_sums[:-1]]
+    alias_edges = [(idx + prob) / n for idx, prob in enumerate(table.alias_table.prob)]
+    for boundary in prefix_edges + alias_edges:
+        edges += [np.nextafter(boundary, 0.0), boundary, np.nextafter(boundary, 1.0)]
+    rs = np.concatenate([np.random.default_rng(5).random(20_000), edges])
+    return rs[(rs >= 0) & (rs < 1)]
+
+
+def test_season_commit_is_sha256_of_seed():
+    season = FairnessSeason.from_seed(SERVER_SEED)
+    assert season.commit == "941aece9e4c35a56286c2b2674219eb9f04ab96355b159302332a471c163e912"
+
+
+def test_hmac_vectors(table):
+    season = FairnessSeason.from_seed(SERVER_SEED)
+    batch = season.unit_floats((CLIENT_SEED, nonce) for nonce, *_ in VECTORS)
+    for (nonce, digest_prefix, r, alias_id, prefix_id), batch_r in zip(VECTORS, batch):
+        digest = season.digest_for_spin(CLIENT_SEED, nonce)
+        assert digest[:16] == digest_prefix
+        assert FairnessEngine.digest_to_unit_float(digest) == r == batch_r
+        assert table.choose(r, SAMPLER_ALIAS).item_id == alias_id
+        assert table.choose(r, SAMPLER_PREFIX).item_id == prefix_id
+
+
+def test_alias_table_is_pinned(table):
+    assert table.alias_table.prob == [1.0, 0.30000000000000004, 0.5, 0.2, 0.05]
+    assert table.alias_table.alias == [0, 0, 0, 0, 1]
+
+
+def test_alias_table_matches_weights(table):
+    """Each item's share of [0, 1) under the alias mapping equals its weight share."""
+    n = len(table.items)
+    shares = [Fraction(0)] * n
+    for idx, (prob, alias) in enumerate(zip(table.alias_table.prob, table.alias_table.alias)):
+        shares[idx] += Fraction(prob) / n
+        shares[alias] += (1 - Fraction(prob)) / n
+    for share, item in zip(shares, table.items):
+        assert float(share) == pytest.approx(item.weight / table.sum_weights, abs=1e-12)
+
+
+def test_prefix_boundaries(table):
+    assert table.choose(0.0, SAMPLER_PREFIX).item_id == "common"
+    assert table.choose(np.nextafter(0.6, 0.0), SAMPLER_PREFIX).item_id == "common"
+    assert table.choose(0.6, SAMPLER_PREFIX).item_id == "uncommon"
+    assert table.choose(np.nextafter(1.0, 0.0), SAMPLER_PREFIX).item_id == "legendary"
+
+
+@pytest.mark.parametrize("sampler", SAMPLERS)
+def test_choose_indices_matches_scalar_choose(table, sampler):
+    rs = edge_rs(table)
+    picks = table.choose_indices(rs, sampler)
+    assert [table.items[i].item_id for i in picks] == [table.choose(float(r), sampler).item_id for r in rs]
+
+
+@pytest.mark.parametrize("sampler", SAMPLERS)
+def test_samplers_draw_the_same_distribution(table, sampler):
+    rs = np.random.default_rng(11).random(200_000)
+    counts = np.bincount(table.choose_indices(rs, sampler), minlength=len(table.items))
+    for count, item in zip(counts, table.items):
+        assert count / len(rs) == pytest.approx(item.weight / table.sum_weights, abs=0.005)
+
+
+@pytest.mark.parametrize("sampler", SAMPLERS)
+@pytest.mark.parametrize("r", [-0.1, 1.0])
+def test_r_out_of_range(table, sampler, r):
+    with pytest.raises(ValueError):
+        table.choose(r, sampler)
+    with pytest.raises(ValueError):
+        table.choose_indices(np.array([0.5, r]), sampler)
+
+
+def test_lootbin_round_trip(table, tmp_path):
+    path = tmp_path / "items.lootbin"
+    compile_loot_table(table, path)
+    loaded = load_compiled_table(path)
+
+    assert table_manifest(loaded) == MANIFEST
+    assert manifest_fingerprint(table_manifest(loaded)) == manifest_fingerprint(MANIFEST)
+    assert list(loaded.prefix_sums) == table.prefix_sums
+    assert loaded.sum_weights == table.sum_weights
+    assert list(loaded.alias_table.prob) == table.alias_table.prob
+    assert list(loaded.alias_table.alias) == table.alias_table.alias
+    rs = edge_rs(table)
+    for sampler in SAMPLERS:
+        assert (loaded.choose_indices(rs, sampler) == table.choose_indices(rs, sampler)).all()
+        assert [loaded.choose(float(r), sampler).item_id for r in rs[:500]] == [
+            table.choose(float(r), sampler).item_id for r in rs[:500]
+        ]
+
+
+def test_lootbin_rejects_other_files(tmp_path):
+    path = tmp_path / "items.lootbin"
+    path.write_bytes(b"LOOTBIN0" + bytes(64))
+    with pytest.raises(ValueError):
+        load_compiled_table(path)
+
+
+def test_lootbin_checks_icons(table, tmp_path):
+    path = tmp_path / "items.lootbin"
+    compile_loot_table(table, path)
+    icons = tmp_path / "icons"
+    icons.mkdir()
+    for item in table.items[:-1]:
+        (icons / f"{item.item_id}.png").write_bytes(b"")
+    with pytest.raises(ValueError, match="legendary"):
+        load_compiled_table(path, icons)
+    (icons / "legendary.png").write_bytes(b"")
+    assert load_compiled_table(path, icons).items[-1].icon_path == icons / "legendary.png"
@@ -0,0 +1,133 @@
+"""The verifier must accept spins exactly as the bot recorded them and flag any that were altered."""
+from __future__ import annotations
+
+import dataclasses
+import json
+
+import pytest
+
+from fairness import FairnessSeason
+from loot_table import SAMPLER_ALIAS, SAMPLER_PREFIX, manifest_fingerprint
+from state_store import SpinRecord, StateStore
+from verifier import export_season, verify_export, verify_from_db
+
+SERVER_SEED = "test-server-seed"
+TABLE = [
+    ["common", "Common", 60.0],
+    ["uncommon", "Uncommon", 25.0],
+    ["rare", "Rare", 10.0],
+    ["epic", "Epic", 4.0],
+    ["legendary", "Legendary", 1.0],
+]
+# The same sheet after a mid-season /reload.
+RELOADED = [
+    ["common", "Common", 55.0],
+    ["uncommon", "Uncommon", 25.0],
+    ["rare", "Rare", 10.0],
+    ["epic", "Epic", 5.0],
+    ["mythic", "Mythic", 5.0],
+]
+# user_id, nonce, client_seed, item_id, table, sampler
+RECORDED = [
+    (42, 1, "-100:42:7", "common", TABLE, SAMPLER_ALIAS),
+    (42, 2, "-100:42:7", "common", TABLE, SAMPLER_ALIAS),
+    (42, 3, "-100:42:7", "rare", TABLE, SAMPLER_ALIAS),
+    (42, 4, "-100:42:7", "common", TABLE, SAMPLER_ALIAS),
+    (42, 5, "-100:42:7", "epic", TABLE, SAMPLER_ALIAS),
+    (42, 6, "-100:42:7", "rare", TABLE, SAMPLER_ALIAS),
+    (42, 7, "-100:42:7", "uncommon", RELOADED, SAMPLER_ALIAS),
+    (42, 8, "-100:42:7", "uncommon", RELOADED, SAMPLER_ALIAS),
+    (42, 9, "-100:42:7", "mythic", RELOADED, SAMPLER_ALIAS),
+    (42, 10, "-100:42:7", "uncommon", RELOADED, SAMPLER_ALIAS),
+    (7, 1, "7:7:3", "common", TABLE, SAMPLER_PREFIX),
+    (7, 2, "7:7:3", "common", TABLE, SAMPLER_PREFIX),
+    (7, 3, "7:7:3", "common", TABLE, SAMPLER_PREFIX),
+]
+
+
+def recorded_spins(commit: str) -> list[SpinRecord]:
+    return [
+        SpinRecord(commit, user_id, nonce, client_seed, item_id, manifest_fingerprint(table), sampler, 1000.0 + nonce)
+        for user_id, nonce, client_seed, item_id, table, sampler in RECORDED
+    ]
+
+
+def write_db(path, spins: list[SpinRecord], reveal: bool = True) -> FairnessSeason:
+    season = FairnessSeason.from_seed(SERVER_SEED)
+    store = StateStore(path)
+    store.record_season_start(season, 1000.0)
+    for table in (TABLE, RELOADED):
+        store.record_loot_table(manifest_fingerprint(table), table, 1000.0)
+    for user_id in sorted({spin.user_id for spin in spins}):
+        store.record_spins([spin for spin in spins if spin.user_id == user_id], 0.0)
+    if reveal:
+        store.record_season_reveal(season, 2000.0)
+    store.close()
+    return season
+
+
+@pytest.fixture
+def season():
+    return FairnessSeason.from_seed(SERVER_SEED)
+
+
+def test_recorded_spins_verify(tmp_path, season):
+    db_path = tmp_path / "state.sqlite3"
+    write_db(db_path, recorded_spins(season.commit))
+
+    (report,) = verify_from_db(db_path)
+    assert report.ok, report.mismatches
+    assert report.commit == season.commit
+    assert report.checked == len(RECORDED)
+
+    (report,) = verify_from_db(db_path, season.commit[:6], user_id=7)
+    assert report.ok and report.checked == 3
+
+
+def test_unrevealed_season_is_not_verified(tmp_path, season):
+    db_path = tmp_path / "state.sqlite3"
+    write_db(db_path, recorded_spins(season.commit), reveal=False)
+    assert verify_from_db(db_path) == []
+
+
+def test_altered_spins_are_reported(tmp_path, season):
+    spins = recorded_spins(season.commit)
+    spins[4] = dataclasses.replace(spins[4], item_id="legendary")
+    spins[8] = dataclasses.replace(spins[8], table_hash=manifest_fingerprint(TABLE))
+    spins[10] = dataclasses.replace(spins[10], sampler=SAMPLER_ALIAS)
+    spins[12] = dataclasses.replace(spins[12], table_hash="0" * 64)
+    db_path = tmp_path / "state.sqlite3"
+    write_db(db_path, spins)
+
+    (report,) = verify_from_db(db_path)
+    assert not report.ok
+    assert report.checked == len(RECORDED)
+    found = {(m.spin.user_id, m.spin.nonce): (m.expected_item_id, m.reason) for m in report.mismatches}
+    assert found == {
+        (42, 5): ("epic", "item differs"),
+        (42, 9): ("uncommon", "item differs"),
+        (7, 1): ("uncommon", "item differs"),
+        (7, 3): (None, "unknown loot table 0000000000000000"),
+    }
+
+
+def test_export_round_trip(tmp_path, season):
+    db_path = tmp_path / "state.sqlite3"
+    write_db(db_path, recorded_spins(season.commit))
+
+    document = json.loads(json.dumps(export_season(db_path, season.commit[:8])))
+    assert document["server_seed"] == SERVER_SEED
+    assert sorted(document["tables"].values()) == sorted([TABLE, RELOADED])
+    report = verify_export(document)
+    assert report.ok and report.checked == len(RECORDED)
+
+    wrong_seed = verify_export(document, server_seed="another-seed")
+    assert not wrong_seed.seed_matches_commit
+    assert not wrong_seed.ok
+
+
+def test_export_needs_one_season(tmp_path, season):
+    db_path = tmp_path / "state.sqlite3"
+    write_db(db_path, recorded_spins(season.commit))
+    with pytest.raises(ValueError):
+        export_season(db_path, "zz")
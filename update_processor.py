@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+def update_key(update: object) -> int:
+    """Ordering key of an update: the sender, then the chat; other updates get a key of their own."""
+    if isinstance(update, Update):
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        return -update.update_id
+    return id(update)
+
+
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    """Processes up to `max_running` updates at once, one at a time per `update_key`.
+
+    Updates of the same user queue on a per-key lock in arrival order (asyncio
+    locks wake waiters FIFO, and the application starts one task per update in
+    order), so a user's cooldown and nonce are still taken strictly one spin
+    after the other. The running slot is taken only after the key lock, so one
+    user flooding the bot queues behind themselves and does not occupy every slot.
+
+    The base class takes its own semaphore (how many updates wait at all) before
+    `do_process_update` sees the key, so a key's backlog is capped at
+    `max_per_key`: further updates of that key are dropped (`on_drop`) and give
+    their permit back at once, and one flooding user cannot hold every permit.
+    """
+
+    def __init__(
+        self,
+        max_running: int,
+        max_waiting: int = 0,
+        max_per_key: int = 8,
+        on_drop: Optional[Callable[[object], None]] = None,
+    ) -> None:
+        if max_running < 1:
+            raise ValueError("max_running must be a positive integer")
+        if max_per_key < 1:
+            raise ValueError("max_per_key must be a positive integer")
+        super().__init__(max(max_waiting, max_running * 16))
+        self.max_running = max_running
+        self.max_per_key = max_per_key
+        self.on_drop = on_drop
+        self.dropped = 0
+        self.running = 0
+        self._slots = asyncio.Semaphore(max_running)
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._queued: dict[int, int] = {}
+
+    @property
+    def waiting(self) -> int:
+        return self.current_concurrent_updates - self.running
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = update_key(update)
+        if self._queued.get(key, 0) >= self.max_per_key:
+            self.dropped += 1
+            if asyncio.iscoroutine(coroutine):
+                coroutine.close()
+            if self.on_drop is not None:
+                self.on_drop(update)
+            return
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._queued[key] = self._queued.get(key, 0) + 1
+        try:
+            async with lock, self._slots:
+                self.running += 1
+                try:
+                    await coroutine
+                finally:
+                    self.running -= 1
+        finally:
+            self._queued[key] -= 1
+            if not self._queued[key]:
+                del self._queued[key]
+                del self._locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
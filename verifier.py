@@ -0,0 +1,222 @@
+"""Recompute spins of revealed seasons and check them against what the bot announced.
+
+Each spin is stored with the hash of the loot table it was drawn from, and every
+table the bot served is kept, so a season stays verifiable across /reload:
+
+    python verifier.py db                              # every revealed season in data/state.sqlite3
+    python verifier.py db --commit 3fa9 --user 42      # one season, one user
+    python verifier.py export --commit 3fa9 -o season.json
+    python verifier.py file season.json [--seed SEED]  # offline, without the database
+
+Exit status is 1 when any spin does not match.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from fairness import FairnessSeason
+from loot_table import LootTable, table_from_manifest
+from state_store import SpinRecord, iter_spins, load_manifests, open_reader, revealed_seasons
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_DB_PATH = BASE_DIR / "data" / "state.sqlite3"
+# Below this many spins a process pool costs more than the HMACs it would spread.
+PARALLEL_MIN_SPINS = 50_000
+CHUNK_SPINS = 20_000
+
+
+@dataclass(frozen=True)
+class Mismatch:
+    spin: SpinRecord
+    expected_item_id: Optional[str]
+    reason: str
+
+
+@dataclass
+class VerificationReport:
+    commit: str
+    seed_matches_commit: bool
+    checked: int = 0
+    mismatches: list[Mismatch] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.seed_matches_commit and not self.mismatches
+
+    def summary(self) -> str:
+        status = "ok" if self.ok else "FAILED"
+        seed = "" if self.seed_matches_commit else " | server_seed does not hash to commit"
+        return f"{self.commit[:16]}: {status} | spins={self.checked} | mismatches={len(self.mismatches)}{seed}"
+
+
+def _unit_floats_chunk(args: tuple[str, list[tuple[str, int]]]) -> list[float]:
+    server_seed, spins = args
+    return FairnessSeason(server_seed=server_seed, commit="").unit_floats(spins)
+
+
+def batch_unit_floats(server_seed: str, spins: list[tuple[str, int]], workers: int = 1) -> np.ndarray:
+    """r for every (client_seed, nonce), spread over `workers` processes for large batches."""
+    if workers <= 1 or len(spins) < PARALLEL_MIN_SPINS:
+        return np.array(_unit_floats_chunk((server_seed, spins)), dtype=np.float64)
+    chunks = [(server_seed, spins[i : i + CHUNK_SPINS]) for i in range(0, len(spins), CHUNK_SPINS)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return np.concatenate([np.array(part, dtype=np.float64) for part in pool.map(_unit_floats_chunk, chunks)])
+
+
+def verify_season(
+    season: FairnessSeason,
+    spins: Iterable[SpinRecord],
+    tables: dict[str, LootTable],
+    workers: int = 1,
+) -> VerificationReport:
+    """Check the revealed seed against its commit and recompute every spin of the season.
+
+    Spins are grouped by (loot table, sampler) and each group is mapped with one
+    vectorized `choose_indices` call.
+    """
+    seed_ok = hashlib.sha256(season.server_seed.encode("utf-8")).hexdigest() == season.commit
+    report = VerificationReport(commit=season.commit, seed_matches_commit=seed_ok)
+
+    groups: dict[tuple[str, str], list[SpinRecord]] = defaultdict(list)
+    for spin in spins:
+        if spin.commit != season.commit:
+            report.mismatches.append(Mismatch(spin, None, "spin belongs to another season"))
+            continue
+        groups[(spin.table_hash, spin.sampler)].append(spin)
+
+    for (table_hash, sampler), group in groups.items():
+        report.checked += len(group)
+        table = tables.get(table_hash)
+        if table is None:
+            report.mismatches.extend(Mismatch(spin, None, f"unknown loot table {table_hash[:16]}") for spin in group)
+            continue
+        rs = batch_unit_floats(season.server_seed, [(spin.client_seed, spin.nonce) for spin in group], workers)
+        try:
+            picks = table.choose_indices(rs, sampler)
+        except ValueError as exc:
+            report.mismatches.extend(Mismatch(spin, None, str(exc)) for spin in group)
+            continue
+        expected_ids = [table.items[i].item_id for i in picks]
+        for spin, expected in zip(group, expected_ids):
+            if spin.item_id != expected:
+                report.mismatches.append(Mismatch(spin, expected, "item differs"))
+    return report
+
+
+def tables_from_manifests(manifests: dict[str, list[list]]) -> dict[str, LootTable]:
+    return {table_hash: table_from_manifest(manifest) for table_hash, manifest in manifests.items()}
+
+
+def verify_from_db(
+    db_path: Path,
+    commit_prefix: str = "",
+    user_id: Optional[int] = None,
+    max_seasons: Optional[int] = None,
+    workers: int = 1,
+) -> list[VerificationReport]:
+    """Verify revealed seasons (newest first) straight from the state database; blocking."""
+    conn = open_reader(db_path)
+    try:
+        reports = []
+        for season in revealed_seasons(conn, commit_prefix)[:max_seasons]:
+            spins = list(iter_spins(conn, season.commit, user_id))
+            if not spins and user_id is not None:
+                continue
+            tables = tables_from_manifests(load_manifests(conn, {spin.table_hash for spin in spins}))
+            reports.append(verify_season(season, spins, tables, workers))
+        return reports
+    finally:
+        conn.close()
+
+
+def export_season(db_path: Path, commit_prefix: str) -> dict:
+    """A self-contained JSON document of one revealed season, for `file` mode."""
+    conn = open_reader(db_path)
+    try:
+        seasons = revealed_seasons(conn, commit_prefix)
+        if len(seasons) != 1:
+            raise ValueError(f"commit prefix {commit_prefix!r} matches {len(seasons)} revealed seasons")
+        season = seasons[0]
+        spins = list(iter_spins(conn, season.commit))
+        return {
+            "server_seed": season.server_seed,
+            "commit": season.commit,
+            "tables": load_manifests(conn, {spin.table_hash for spin in spins}),
+            "spins": [
+                [spin.user_id, spin.nonce, spin.client_seed, spin.item_id, spin.table_hash, spin.sampler, spin.spun_at]
+                for spin in spins
+            ],
+        }
+    finally:
+        conn.close()
+
+
+def verify_export(document: dict, server_seed: Optional[str] = None, workers: int = 1) -> VerificationReport:
+    season = FairnessSeason(server_seed=server_seed or document["server_seed"], commit=document["commit"])
+    spins = [SpinRecord(season.commit, *row) for row in document["spins"]]
+    return verify_season(season, spins, tables_from_manifests(document["tables"]), workers)
+
+
+def _print_report(report: VerificationReport, verbose: bool) -> None:
+    print(report.summary())
+    for mismatch in report.mismatches[: None if verbose else 20]:
+        spin = mismatch.spin
+        print(
+            f"  user={spin.user_id} nonce={spin.nonce} client_seed={spin.client_seed} "
+            f"announced={spin.item_id} expected={mismatch.expected_item_id} ({mismatch.reason})"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--verbose", action="store_true", help="list every mismatch")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    db = sub.add_parser("db", help="verify revealed seasons from the state database")
+    db.add_argument("--db", type=Path, default=DEFAULT_DB_PATH)
+    db.add_argument("--commit", default="", help="commit hash or prefix")
+    db.add_argument("--user", type=int)
+
+    export = sub.add_parser("export", help="write one revealed season as JSON")
+    export.add_argument("--db", type=Path, default=DEFAULT_DB_PATH)
+    export.add_argument("--commit", required=True, help="commit hash or prefix")
+    export.add_argument("-o", "--output", type=Path, required=True)
+
+    offline = sub.add_parser("file", help="verify an exported season")
+    offline.add_argument("path", type=Path)
+    offline.add_argument("--seed", help="server seed from /reveal_seed (defaults to the one in the file)")
+
+    args = parser.parse_args()
+
+    if args.mode == "export":
+        document = export_season(args.db, args.commit)
+        args.output.write_text(json.dumps(document, ensure_ascii=False), encoding="utf-8")
+        print(f"exported {len(document['spins'])} spins of {document['commit']} to {args.output}")
+        return 0
+
+    if args.mode == "file":
+        reports = [verify_export(json.loads(args.path.read_text(encoding="utf-8")), args.seed, args.workers)]
+    else:
+        reports = verify_from_db(args.db, args.commit, args.user, workers=args.workers)
+        if not reports:
+            print("no revealed seasons to verify")
+
+    for report in reports:
+        _print_report(report, args.verbose)
+    return 0 if all(report.ok for report in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""Several bot processes behind one token.
+
+The router is the only process that talks to getUpdates. It sends each update
+to worker `route_key(update) % N` over a local TCP stream of newline-delimited
+JSON. Every update of one user therefore lands on the same worker, in order,
+and that worker handles its stream sequentially. The workers share cooldowns,
+nonces and the season through the state backend (STATE_BACKEND_URL) and the
+SQLite state store. Commands that need state owned by one worker are pinned
+to it instead, and workers send that worker `{"peer": ...}` lines through a
+`PeerLink` on the same port.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+from telegram import Bot, Update
+from telegram.error import TelegramError
+from telegram.ext import Application
+
+WORKER_HOST = "127.0.0.1"
+RECONNECT_SECONDS = 1.0
+POLL_TIMEOUT_SECONDS = 30
+
+
+def route_key(update: dict) -> int:
+    """The user id of an update (chat id, then update id as fallbacks)."""
+    for kind in ("message", "edited_message", "callback_query", "inline_query"):
+        payload = update.get(kind)
+        if isinstance(payload, dict):
+            sender = payload.get("from") or {}
+            if "id" in sender:
+                return int(sender["id"])
+            chat = payload.get("chat") or {}
+            if "id" in chat:
+                return int(chat["id"])
+    return int(update.get("update_id", 0))
+
+
+def command_of(update: dict) -> str:
+    """The bot command a message starts with, without the slash and @botname ("" if none)."""
+    message = update.get("message")
+    text = message.get("text") if isinstance(message, dict) else None
+    if not isinstance(text, str) or not text.startswith("/"):
+        return ""
+    words = text[1:].split(maxsplit=1)
+    return words[0].split("@", 1)[0].lower() if words else ""
+
+
+def worker_for(update: dict, workers: int, pinned: Optional[dict[str, int]] = None) -> int:
+    if pinned:
+        command = command_of(update)
+        if command in pinned:
+            return pinned[command] % workers
+    return route_key(update) % workers
+
+
+class _WorkerLink:
+    """Ordered stream of updates to one worker; reconnects until the worker is up."""
+
+    def __init__(self, index: int, port: int) -> None:
+        self.index = index
+        self.port = port
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def send(self, lines: list[bytes]) -> None:
+        while True:
+            try:
+                if self._writer is None or self._writer.is_closing():
+                    _, self._writer = await asyncio.open_connection(WORKER_HOST, self.port)
+                self._writer.write(b"".join(lines))
+                await self._writer.drain()
+                return
+            except OSError as exc:
+                logging.warning("worker %s unreachable (%s); retrying", self.index, exc)
+                self._writer = None
+                await asyncio.sleep(RECONNECT_SECONDS)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+class PeerLink:
+    """Fire-and-forget messages to another worker, sent in order by one background task."""
+
+    def __init__(self, index: int, port: int) -> None:
+        self._link = _WorkerLink(index, port)
+        self._lines: list[bytes] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def send(self, payload: object) -> None:
+        self._lines.append(json.dumps({"peer": payload}, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def _drain(self) -> None:
+        while self._lines:
+            lines, self._lines = self._lines, []
+            await self._link.send(lines)
+
+    async def close(self, timeout: float) -> None:
+        """Wait up to `timeout` for queued messages; whatever is left then is dropped."""
+        if self._task is not None and not self._task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+                logging.warning("worker %s unreachable; dropping its unsent peer messages", self._link.index)
+        self._link.close()
+
+
+async def route_updates(
+    bot: Bot, ports: list[int], allowed_updates: list[str], pinned: Optional[dict[str, int]] = None
+) -> None:
+    """Long-poll Telegram and fan updates out; an offset is confirmed only after its batch was handed over.
+
+    `pinned` sends messages starting with one of its commands to that worker rather than by user.
+    """
+    links = [_WorkerLink(index, port) for index, port in enumerate(ports)]
+    offset: Optional[int] = None
+    async with bot:
+        await bot.delete_webhook()
+        try:
+            while True:
+                try:
+                    updates = await bot.get_updates(
+                        offset=offset,
+                        timeout=POLL_TIMEOUT_SECONDS,
+                        allowed_updates=allowed_updates,
+                    )
+                except TelegramError as exc:
+                    logging.warning("getUpdates failed: %s", exc)
+                    await asyncio.sleep(RECONNECT_SECONDS)
+                    continue
+                if not updates:
+                    continue
+                batches: dict[int, list[bytes]] = {}
+                for update in updates:
+                    data = update.to_dict()
+                    line = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+                    batches.setdefault(worker_for(data, len(links), pinned), []).append(line)
+                await asyncio.gather(*(links[index].send(lines) for index, lines in batches.items()))
+                offset = updates[-1].update_id + 1
+        finally:
+            for link in links:
+                link.close()
+
+
+async def route_until_stopped(
+    bot: Bot, ports: list[int], allowed_updates: list[str], pinned: Optional[dict[str, int]] = None
+) -> None:
+    """`route_updates` until SIGINT or SIGTERM; returns normally so the caller can stop the workers."""
+    task = asyncio.create_task(route_updates(bot, ports, allowed_updates, pinned), name="router")
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, task.cancel)
+    try:
+        await task
+    except asyncio.CancelledError:
+        logging.info("Router stopping")
+
+
+def interrupt_on_sigterm() -> None:
+    """Turn SIGTERM into KeyboardInterrupt outside the event loop, so `finally` blocks run."""
+
+    def interrupt(signum: int, frame: object) -> None:
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, interrupt)
+
+
+async def serve_worker(
+    application: Application, port: int, on_peer: Optional[Callable[[Any], Awaitable[None]]] = None
+) -> None:
+    """Run `application` fed by the router's stream instead of its updater; stops on SIGINT/SIGTERM.
+
+    The application's post_init/post_stop/post_shutdown hooks run as they would under run_polling.
+    Messages of other workers' `PeerLink`s are awaited with `on_peer`, in the order each peer sent them.
+    """
+
+    async def ingest(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                data = json.loads(line)
+                if "peer" in data:
+                    if on_peer is not None:
+                        await on_peer(data["peer"])
+                    continue
+                update = Update.de_json(data, application.bot)
+                await application.update_queue.put(update)
+        except (ConnectionError, json.JSONDecodeError) as exc:
+            logging.warning("router stream broken: %s", exc)
+        finally:
+            writer.close()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        server = await asyncio.start_server(ingest, WORKER_HOST, port)
+        logging.info("Worker listening for routed updates on %s:%s", WORKER_HOST, port)
+        try:
+            await stop.wait()
+        finally:
+            server.close()
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+            if application.post_shutdown:
+                await application.post_shutdown(application)
+
+
+def spawn_workers(script: Path, count: int, base_port: int) -> list[subprocess.Popen]:
+    processes = []
+    for index in range(count):
+        env = dict(os.environ, BOT_WORKER_INDEX=str(index), BOT_WORKER_PORT=str(base_port + index))
+        processes.append(subprocess.Popen([sys.executable, str(script)], env=env))
+    return processes
+
+
+def stop_workers(processes: list[subprocess.Popen], timeout: float = 30.0) -> None:
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()